@@ -0,0 +1,284 @@
+"""
+Benchmark end-to-end publish -> persist tanpa infrastruktur eksternal.
+
+Yang dijalankan adalah kode aggregator yang asli (handler /publish,
+redis_worker, EventBatcher, persist_events, insert_events); hanya
+broker diganti fakeredis dan database diganti file SQLite sementara.
+
+Jalankan dari folder aggregator/:
+
+    python -m benchmarks.bench_pipeline --output baseline.json
+    python -m benchmarks.bench_pipeline --baseline baseline.json
+
+Baseline bergantung pada mesin, jadi buat dulu di mesin yang sama.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import fakeredis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import src.api.worker.processor.db as db
+import src.main as main
+from benchmarks import percentile
+from src.api.worker.batcher import EventBatcher
+from src.api.worker.dedup import DedupFilter
+from src.broker.sharding import consumer_shards, shard_channel
+
+# =====================================================
+# SCENARIOS
+# =====================================================
+DEFAULT_EVENTS = 5000
+DEFAULT_BATCH_SIZES = [1, 100, 1000]
+DEFAULT_DUPLICATE_RATIOS = [0.0, 0.2]
+DEFAULT_TOPIC_COUNTS = [1, 10]
+
+# Regresi kalau throughput turun lebih dari DEFAULT_TOLERANCE atau p99
+# naik lebih dari DEFAULT_LATENCY_TOLERANCE (latency jauh lebih berisik)
+DEFAULT_TOLERANCE = 0.30
+DEFAULT_LATENCY_TOLERANCE = 1.5
+# Setiap skenario diulang; yang dilaporkan run dengan throughput median
+DEFAULT_REPEAT = 3
+
+
+def build_events(total: int, duplicate_ratio: float, topic_count: int, seed: int = 42):
+    """Event unik + duplikat acak, sama seperti test_performance.py."""
+    rng = random.Random(seed)
+    topics = [f"bench_topic_{i}" for i in range(topic_count)]
+    unique_count = max(1, int(total * (1 - duplicate_ratio)))
+    timestamp = datetime.now(timezone.utc).isoformat()
+
+    unique = [
+        {
+            "topic": rng.choice(topics),
+            "event_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "timestamp": timestamp,
+            "source": "bench",
+            "payload": {"value": i},
+        }
+        for i in range(unique_count)
+    ]
+    events = unique + [rng.choice(unique) for _ in range(total - unique_count)]
+    rng.shuffle(events)
+    return events, unique_count
+
+
+# =====================================================
+# HARNESS
+# =====================================================
+class CommitClock:
+    """Catat waktu commit setiap event (dipasang di flush_fn batcher)."""
+
+    def __init__(self):
+        self.committed: Dict[Any, float] = {}
+        self.lock = threading.Lock()
+
+    def wrap(self, flush_fn):
+        def timed_flush(events):
+            result = flush_fn(events)
+            now = time.perf_counter()
+            with self.lock:
+                for event in events:
+                    self.committed.setdefault((event["topic"], event["event_id"]), now)
+            return result
+        return timed_flush
+
+
+def use_sqlite_file(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    db.engine = engine
+    # Reader terpisah (SQLITE_PROFILE=tuned) masih menunjuk database lama
+    db.read_engine = None
+    db.SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    db.init_db()
+    return engine
+
+
+def run_scenario(
+    total: int,
+    batch_size: int,
+    duplicate_ratio: float,
+    topic_count: int,
+    timeout: float = 120.0,
+) -> Dict[str, Any]:
+    events, unique_count = build_events(total, duplicate_ratio, topic_count)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = use_sqlite_file(os.path.join(tmp, "bench.db"))
+        main.redis_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        main.dedup_filter = DedupFilter()
+
+        clock = CommitClock()
+        batchers = []
+        for shard in consumer_shards():
+            batcher = EventBatcher(flush_fn=clock.wrap(main.persist_events))
+            batcher.start()
+            batchers.append(batcher)
+            threading.Thread(
+                target=main.redis_worker,
+                args=(batcher, shard_channel(main.CHANNEL_NAME, shard)),
+                daemon=True,
+            ).start()
+        time.sleep(0.1)  # tunggu subscribe
+
+        loop = asyncio.new_event_loop()
+        sent_at: Dict[Any, float] = {}
+        start = time.perf_counter()
+        for i in range(0, len(events), batch_size):
+            chunk = events[i:i + batch_size]
+            now = time.perf_counter()
+            for event in chunk:
+                sent_at.setdefault((event["topic"], event["event_id"]), now)
+            body = [main.EventSchema(**event) for event in chunk]
+            # Dipanggil langsung (bukan lewat FastAPI): default Query tidak di-resolve
+            loop.run_until_complete(main.publish_event(body if batch_size > 1 else body[0], ack="broker"))
+        publish_done = time.perf_counter()
+
+        deadline = time.monotonic() + timeout
+        while len(clock.committed) < unique_count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        end = time.perf_counter()
+
+        for batcher in batchers:
+            batcher.close()
+        loop.close()
+        stored = sum(count for _, count in db.get_stats())
+        engine.dispose()
+
+    latencies = sorted(
+        (clock.committed[key] - sent) * 1000
+        for key, sent in sent_at.items()
+        if key in clock.committed
+    )
+    elapsed = end - start
+    return {
+        "name": f"events={total},batch={batch_size},dup={duplicate_ratio},topics={topic_count}",
+        "events": total,
+        "unique": unique_count,
+        "stored": stored,
+        "batch_size": batch_size,
+        "duplicate_ratio": duplicate_ratio,
+        "topic_count": topic_count,
+        "publish_seconds": round(publish_done - start, 4),
+        "total_seconds": round(elapsed, 4),
+        "events_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def run_repeated(repeat: int, *args) -> Dict[str, Any]:
+    runs = sorted(
+        (run_scenario(*args) for _ in range(max(1, repeat))),
+        key=lambda r: r["events_per_second"],
+    )
+    return runs[len(runs) // 2]
+
+
+# =====================================================
+# BASELINE
+# =====================================================
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+) -> List[str]:
+    """Return daftar regresi (kosong = lolos)."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        if result["stored"] != result["unique"]:
+            regressions.append(f"{result['name']}: data loss ({result['stored']}/{result['unique']})")
+        base = previous.get(result["name"])
+        if base is None:
+            continue
+        if result["events_per_second"] < base["events_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}: throughput {result['events_per_second']} ev/s "
+                f"< baseline {base['events_per_second']} ev/s"
+            )
+        if result["latency_ms"]["p99"] > base["latency_ms"]["p99"] * (1 + latency_tolerance):
+            regressions.append(
+                f"{result['name']}: p99 {result['latency_ms']['p99']} ms "
+                f"> baseline {base['latency_ms']['p99']} ms"
+            )
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'scenario':<48} {'ev/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'stored':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["latency_ms"]
+        print(
+            f"{r['name']:<48} {r['events_per_second']:>10} {lat['p50']:>9} "
+            f"{lat['p95']:>9} {lat['p99']:>9} {r['stored']:>8}"
+        )
+
+
+def parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline publish-to-persist benchmark")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)))
+    parser.add_argument("--duplicate-ratios", default=",".join(map(str, DEFAULT_DUPLICATE_RATIOS)))
+    parser.add_argument("--topic-counts", default=",".join(map(str, DEFAULT_TOPIC_COUNTS)))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="tulis hasil (JSON) ke file ini")
+    parser.add_argument("--baseline", help="bandingkan dengan hasil JSON sebelumnya")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--latency-tolerance", type=float, default=DEFAULT_LATENCY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = [
+        run_repeated(args.repeat, args.events, batch_size, dup, topics)
+        for batch_size in parse_list(args.batch_sizes, int)
+        for dup in parse_list(args.duplicate_ratios, float)
+        for topics in parse_list(args.topic_counts, int)
+    ]
+    print_table(results)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.latency_tolerance)
+        if regressions:
+            print("\n❌ Regression against baseline:")
+            for line in regressions:
+                print(f" - {line}")
+            return 1
+        print("\n✅ No regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
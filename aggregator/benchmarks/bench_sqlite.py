@@ -0,0 +1,164 @@
+"""
+Benchmark profil SQLite: "default" vs "tuned" (SQLITE_PROFILE).
+
+Satu writer thread menulis event per batch lewat insert_events (seperti
+worker), sementara beberapa reader thread terus memanggil get_events dan
+get_stats (seperti /events dan /stats). Keduanya jalan bersamaan di file
+SQLite sementara, jadi yang diukur termasuk rebutan lock.
+
+Default-nya batch 1: satu commit per event, kasus di mana tuned terasa
+(WAL + synchronous=NORMAL). Dengan batch besar commit jarang, hasil kedua
+profil hampir sama.
+
+Jalankan dari folder aggregator/:
+
+    python -m benchmarks.bench_sqlite
+    python -m benchmarks.bench_sqlite --events 20000 --batch-size 500 --output sqlite.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import src.api.worker.processor.db as db
+from benchmarks import percentile
+
+DEFAULT_EVENTS = 2000
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_READERS = 4
+PROFILES = ["default", "tuned"]
+
+
+def use_profile(path: str, profile: str):
+    engine, read_engine = db.create_engines(f"sqlite:///{path}", profile)
+    db.engine = engine
+    db.read_engine = read_engine
+    db.SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    db.init_db()
+    return engine, read_engine
+
+
+def run_profile(profile: str, total: int, batch_size: int, readers: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, read_engine = use_profile(os.path.join(tmp, "bench.db"), profile)
+
+        done = threading.Event()
+        read_latencies: List[float] = []
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+
+        def reader():
+            i = 0
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    if i % 2:
+                        db.get_stats()
+                    else:
+                        db.get_events("bench_topic_0", limit=100)
+                except Exception:
+                    with lock:
+                        errors["read"] += 1
+                    continue
+                with lock:
+                    read_latencies.append((time.perf_counter() - started) * 1000)
+                i += 1
+
+        threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+        for t in threads:
+            t.start()
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            batch = [
+                {
+                    "topic": f"bench_topic_{i % 10}",
+                    "event_id": f"e{i}",
+                    "timestamp": timestamp,
+                    "payload": {"value": i},
+                }
+                for i in range(offset, min(total, offset + batch_size))
+            ]
+            try:
+                db.insert_events(batch)
+            except Exception:
+                errors["write"] += 1
+        write_seconds = time.perf_counter() - start
+
+        done.set()
+        for t in threads:
+            t.join()
+        stored = sum(count for _, count in db.get_stats())
+
+        engine.dispose()
+        if read_engine is not None:
+            read_engine.dispose()
+
+    latencies = sorted(read_latencies)
+    return {
+        "profile": profile,
+        "events": total,
+        "stored": stored,
+        "batch_size": batch_size,
+        "readers": readers,
+        "write_events_per_second": round(total / write_seconds, 1),
+        "reads_per_second": round(len(latencies) / write_seconds, 1),
+        "read_latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+        "errors": errors,
+    }
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SQLite profile benchmark (default vs tuned)")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--output", help="tulis hasil (JSON) ke file ini")
+    args = parser.parse_args(argv)
+
+    results = [
+        run_profile(profile, args.events, args.batch_size, args.readers)
+        for profile in args.profiles.split(",")
+    ]
+
+    header = f"{'profile':<10} {'write ev/s':>12} {'reads/s':>10} {'read p50':>10} {'read p99':>10} {'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["read_latency_ms"]
+        errors = r["errors"]["read"] + r["errors"]["write"]
+        print(
+            f"{r['profile']:<10} {r['write_events_per_second']:>12} {r['reads_per_second']:>10} "
+            f"{lat['p50']:>10} {lat['p99']:>10} {errors:>8}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "generated_at": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, NamedTuple, Optional, Tuple
+
+from src.api import metrics
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Jumlah response yang disimpan (LRU); 0 = cache mati
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+# Batas umur entry. Versi topic hanya tahu write di proses INI, jadi TTL
+# adalah batas basi untuk write dari replica lain.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+CACHE_REQUESTS = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_response_cache_requests_total",
+    "Response cache lookups (result: hit, miss).",
+    ["endpoint", "result"],
+))
+CACHE_ENTRIES = metrics.REGISTRY.register(metrics.Gauge(
+    "aggregator_response_cache_entries",
+    "Responses currently held in the response cache.",
+))
+
+
+# =====================================================
+# VERSI PER TOPIC
+# =====================================================
+class TopicVersions:
+    """
+    Counter per topic yang dinaikkan jalur insert setelah commit.
+    Versi "semua topic" (topic=None) naik setiap kali ada row baru.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._all = 0
+        # Naik saat row hilang tanpa tahu topic-nya (retensi partisi)
+        self._epoch = 0
+
+    def bump(self, topics: Iterable[str]):
+        changed = set(topics)
+        if not changed:
+            return
+        with self._lock:
+            for topic in changed:
+                self._versions[topic] = self._versions.get(topic, 0) + 1
+            self._all += 1
+
+    def invalidate_all(self):
+        with self._lock:
+            self._epoch += 1
+
+    def version(self, topic: Optional[str] = None) -> Tuple[int, int]:
+        if topic is None:
+            return self._epoch, self._all
+        return self._epoch, self._versions.get(topic, 0)
+
+
+# =====================================================
+# CACHE
+# =====================================================
+class CacheEntry(NamedTuple):
+    version: Tuple[int, int]
+    expires_at: float
+    value: Any
+    etag: Optional[str]
+
+
+class ResponseCache:
+    """
+    LRU berukuran tetap dengan TTL. Entry hanya valid selama versi topic
+    yang dipakainya belum berubah: topic yang tidak ditulis tetap dilayani
+    dari cache sampai TTL habis.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        versions: Optional[TopicVersions] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.versions = versions or TOPIC_VERSIONS
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, endpoint: str, key: Hashable, topic: Optional[str] = None) -> Tuple[Optional[CacheEntry], Tuple[int, int]]:
+        """
+        Return (entry atau None, versi sekarang). Versi dibaca SEBELUM query
+        ke DB; kalau ada write di tengah, entry yang disimpan langsung basi.
+        """
+        version = self.versions.version(topic)
+        entry = None
+        with self._lock:
+            if self.max_entries > 0:
+                entry = self._entries.get(key)
+                if entry is not None and (
+                    entry.version != version or entry.expires_at <= time.monotonic()
+                ):
+                    del self._entries[key]
+                    entry = None
+                elif entry is not None:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_REQUESTS.inc(endpoint, "miss" if entry is None else "hit")
+        return entry, version
+
+    def store(self, key: Hashable, version: Tuple[int, int], value: Any, etag: Optional[str] = None) -> CacheEntry:
+        entry = CacheEntry(version, time.monotonic() + self.ttl, value, etag)
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# =====================================================
+# ETAG
+# =====================================================
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match (boleh daftar / W/ / *) cocok dengan ETag response?"""
+    if not if_none_match or not etag:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+TOPIC_VERSIONS = TopicVersions()
+response_cache = ResponseCache()
+CACHE_ENTRIES.set_function(lambda: {(): len(response_cache)})
@@ -0,0 +1,287 @@
+import bisect
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter as TallyCounter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Label topic dibatasi supaya jumlah time series tidak meledak;
+# topic ke-(N+1) dan seterusnya dicatat sebagai "__other__"
+METRICS_MAX_TOPICS = int(os.getenv("METRICS_MAX_TOPICS", "1000"))
+OTHER_TOPIC = "__other__"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# =====================================================
+# METRIC TYPES
+# =====================================================
+# Recording = satu lock + satu operasi dict, tanpa dependency eksternal.
+# Format teks dibuat hanya saat /metrics di-scrape.
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Baris format teks Prometheus (HELP, TYPE, lalu sample)."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc_many(self, amounts: Dict[LabelValues, float]):
+        """Banyak label sekaligus dengan satu lock (misal hitungan per topic)."""
+        with self._lock:
+            for labels, amount in amounts.items():
+                key = self._key(labels)
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in items
+        ]
+
+
+class Gauge(_Metric):
+    """Nilai diisi saat scrape oleh callback (`set_function`) atau `set`."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn: Optional[Callable[[], Dict[LabelValues, float]]]):
+        """`fn` mengembalikan {label values: nilai}; dipanggil setiap scrape."""
+        self._function = fn
+
+    def collect(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                values.update(self._function())
+            except Exception as e:
+                print(f"⚠️ Failed to collect {self.name}: {e}")
+        return values
+
+    def render(self) -> List[str]:
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets: Sequence[float], labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label: [hitungan per bucket (non-kumulatif) + overflow, sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self, *labels: str) -> Tuple[int, float]:
+        """(count, sum) untuk satu label set."""
+        with self._lock:
+            series = self._series.get(tuple(labels))
+            if series is None:
+                return 0, 0.0
+            return sum(series[0]), series[1]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        lines = self._header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+# =====================================================
+# REGISTRY
+# =====================================================
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class _TopicLabels:
+    """Batasi kardinalitas label topic (lihat METRICS_MAX_TOPICS)."""
+
+    def __init__(self, limit: int = METRICS_MAX_TOPICS):
+        self.limit = limit
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, topic: str) -> str:
+        if topic in self._seen:
+            return topic
+        with self._lock:
+            if len(self._seen) < self.limit:
+                self._seen.add(topic)
+                return topic
+        return OTHER_TOPIC
+
+
+REGISTRY = Registry()
+topic_label = _TopicLabels()
+
+# =====================================================
+# PIPELINE METRICS
+# =====================================================
+EVENTS_RECEIVED = REGISTRY.register(Counter(
+    "aggregator_events_received_total",
+    "Events accepted by POST /publish.",
+    ["topic"],
+))
+EVENTS_PUBLISHED = REGISTRY.register(Counter(
+    "aggregator_events_published_total",
+    "Events sent to the broker by POST /publish.",
+    ["topic"],
+))
+EVENTS_INSERTED = REGISTRY.register(Counter(
+    "aggregator_events_inserted_total",
+    "New rows written to processed_events.",
+    ["topic"],
+))
+EVENTS_DEDUPLICATED = REGISTRY.register(Counter(
+    "aggregator_events_deduplicated_total",
+    "Duplicate events dropped (reason: request, edge, filter, db).",
+    ["topic", "reason"],
+))
+EVENTS_FAILED = REGISTRY.register(Counter(
+    "aggregator_events_failed_total",
+    "Events or messages that could not be processed (reason: decode, insert, publish).",
+    ["topic", "reason"],
+))
+
+DB_INSERT_SECONDS = REGISTRY.register(Histogram(
+    "aggregator_db_insert_seconds",
+    "Duration of one batch insert transaction.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "aggregator_batch_size_events",
+    "Events per batch handed to the DB writer.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+))
+DECODE_SECONDS = REGISTRY.register(Histogram(
+    "aggregator_message_decode_seconds",
+    "Time to decode one broker message.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+))
+
+CONSUMER_LAG = REGISTRY.register(Gauge(
+    "aggregator_consumer_lag_messages",
+    "Broker messages not yet processed by the consumer group (streams only).",
+    ["channel", "state"],
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "aggregator_queue_depth_events",
+    "Decoded events waiting in the worker batcher.",
+    ["channel"],
+))
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def count_by_topic(topics: Iterable[str], *extra: str) -> Dict[LabelValues, int]:
+    return {
+        (topic, *extra): n
+        for topic, n in TallyCounter(topic_label(t) for t in topics).items()
+    }
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,497 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from src.api import metrics
+from src.api.worker.processor.db import insert_events
+
+# =====================================================
+# CONFIG
+# =====================================================
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_LINGER_MS = int(os.getenv("BATCH_LINGER_MS", "50"))
+
+# Batas event yang menunggu di memori antara listener dan writer
+QUEUE_MAX_EVENTS = int(os.getenv("QUEUE_MAX_EVENTS", "50000"))
+# Kalau antrean penuh: block (listener menunggu), shed (event dibuang),
+# spill (event ditulis ke file lalu di-replay saat antrean longgar)
+QUEUE_POLICY = os.getenv("QUEUE_POLICY", "block")
+QUEUE_SPILL_DIR = os.getenv(
+    "QUEUE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "aggregator-spill")
+)
+# Jumlah writer thread per batcher. Lebih dari 1 = urutan insert
+# antar batch dalam satu shard tidak lagi dijamin.
+WRITER_THREADS = int(os.getenv("WRITER_THREADS", "1"))
+
+POLICIES = ("block", "shed", "spill")
+SPILL_RETRY_SECONDS = 1.0
+# Replay yang gagal (DB mati) dicoba lagi dengan jeda yang berlipat sampai batas ini
+SPILL_RETRY_MAX_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "aggregator_queue_wait_seconds",
+    "Time the oldest event of a batch waited in the worker queue.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    labelnames=["channel"],
+))
+EVENTS_SPILLED = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_events_spilled_total",
+    "Events written to the spill file because the worker queue was full.",
+    ["channel"],
+))
+FLUSH_FAILURES = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_batch_flush_failures_total",
+    "Batches whose flush raised; their events go to the spill file and are retried.",
+    ["channel"],
+))
+
+
+# =====================================================
+# SPILL FILE
+# =====================================================
+class SpillFile:
+    """
+    File NDJSON per channel untuk event yang belum bisa ditulis ke DB
+    (antrean penuh dengan policy "spill", atau flush gagal). Replay
+    memindah file ke `.replay` dulu supaya append baru masuk file lain.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.replay_path = path + ".replay"
+        self._lock = threading.Lock()
+
+    def append(self, events: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(e) + "\n" for e in events)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(lines)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.replay_path)
+
+    def claim(self) -> bool:
+        """Siapkan file .replay (yang lama, atau file spill sekarang). False kalau kosong."""
+        with self._lock:
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.path):
+                    return False
+                os.replace(self.path, self.replay_path)
+        return True
+
+    def batches(self, max_size: int) -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        with open(self.replay_path) as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= max_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def done(self):
+        os.remove(self.replay_path)
+
+
+class _RetryBackoff:
+    """Jeda replay setelah gagal: SPILL_RETRY_SECONDS, berlipat, maks SPILL_RETRY_MAX_SECONDS."""
+
+    def __init__(self):
+        self.delay = SPILL_RETRY_SECONDS
+        self.next_at = 0.0
+
+    def ready(self) -> bool:
+        return time.monotonic() >= self.next_at
+
+    def failed(self):
+        self.next_at = time.monotonic() + self.delay
+        self.delay = min(self.delay * 2, SPILL_RETRY_MAX_SECONDS)
+
+    def succeeded(self):
+        self.delay = SPILL_RETRY_SECONDS
+        self.next_at = 0.0
+
+
+def _spill_path(spill_dir: str, name: str) -> str:
+    return os.path.join(spill_dir, name.replace(":", "_") + ".ndjson")
+
+
+# =====================================================
+# BATCHER
+# =====================================================
+class EventBatcher:
+    """
+    Antrean terbatas antara listener broker dan pool writer thread.
+    Writer menulis event ke DB sebagai satu multi-row insert per transaksi.
+
+    Flush terjadi kalau buffer sudah mencapai `max_size` ATAU event paling
+    lama di buffer sudah menunggu `linger_ms`. `close()` selalu mem-flush
+    sisa buffer, jadi batch parsial tidak hilang saat shutdown.
+
+    Kalau buffer mencapai `max_pending`, `policy` menentukan nasib event
+    baru: "block" menahan listener, "shed" membuang event (dihitung di
+    aggregator_events_failed_total reason="shed"), "spill" menulis event ke
+    file NDJSON yang di-replay writer begitu antrean kosong lagi. Replay
+    aman diulang karena insert idempotent.
+
+    Batch yang flush-nya gagal juga masuk file spill (apa pun policy-nya)
+    dan di-replay dengan backoff, jadi event yang sudah diterima dari
+    broker tidak hilang saat DB bermasalah.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Any] = insert_events,
+        max_size: int = BATCH_MAX_SIZE,
+        linger_ms: int = BATCH_LINGER_MS,
+        name: str = "events",
+        max_pending: int = QUEUE_MAX_EVENTS,
+        policy: str = QUEUE_POLICY,
+        writers: int = WRITER_THREADS,
+        spill_dir: str = QUEUE_SPILL_DIR,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy {policy!r}, expected one of {POLICIES}")
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.linger = max(0, linger_ms) / 1000.0
+        self.max_pending = max(self.max_size, max_pending)
+        self.policy = policy
+        self.writers = max(1, writers)
+        self.spill_path = _spill_path(spill_dir, name)
+        self._spill_file = SpillFile(self.spill_path)
+        self._backoff = _RetryBackoff()
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._first_added: Optional[float] = None
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)
+        # Listener menunggu di sini kalau policy "block" dan buffer penuh
+        self._space = threading.Condition(lock)
+        self._replay_lock = threading.Lock()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for _ in range(self.writers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def add(self, event: Dict[str, Any]):
+        with self._cond:
+            while (
+                self.policy == "block"
+                and len(self._buffer) >= self.max_pending
+                and not self._closed
+            ):
+                self._space.wait()
+            closed = self._closed
+            if not closed and len(self._buffer) < self.max_pending:
+                if not self._buffer:
+                    # Bangunkan writer supaya mulai menghitung linger
+                    self._first_added = time.monotonic()
+                    self._cond.notify()
+                self._buffer.append(event)
+                if len(self._buffer) >= self.max_size:
+                    self._cond.notify()
+                return
+            if not closed and self.policy == "shed":
+                metrics.EVENTS_FAILED.inc(metrics.topic_label(event["topic"]), "shed")
+                return
+        if closed:
+            # Batcher sudah ditutup -> tulis langsung (di luar lock), jangan dibuang
+            self._write([event])
+            return
+        # Policy "spill" dan buffer penuh: tulis ke file di luar lock
+        self._spill([event])
+
+    def pending(self) -> int:
+        """Jumlah event yang menunggu di buffer (untuk metrics queue depth)."""
+        return len(self._buffer)
+
+    def has_spill(self) -> bool:
+        return self._spill_file.exists()
+
+    def flush(self):
+        """Flush seluruh buffer sekarang juga (dipanggil dari thread mana pun)."""
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: Optional[float] = None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._space.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        # Kalau writer thread tidak pernah jalan, flush sisa buffer di sini
+        self.flush()
+        self.replay_spill()
+
+    # -------------------------------------------------
+    # INTERNAL
+    # -------------------------------------------------
+    def _take(self) -> List[Dict[str, Any]]:
+        if self._buffer:
+            QUEUE_WAIT_SECONDS.observe(time.monotonic() - self._first_added, self.name)
+        batch = self._buffer[:self.max_size]
+        self._buffer = self._buffer[self.max_size:]
+        self._first_added = time.monotonic() if self._buffer else None
+        if batch:
+            self._space.notify_all()
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            self.flush_fn(batch)
+            return True
+        except Exception:
+            FLUSH_FAILURES.inc(self.name)
+            logger.warning("Flush of %d events on %s failed", len(batch), self.name, exc_info=True)
+            return False
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Flush batch; kalau gagal, batch di-spill untuk replay (tidak dibuang)."""
+        if batch and not self._flush(batch):
+            self._spill(batch)
+
+    # -------------------------------------------------
+    # SPILL
+    # -------------------------------------------------
+    def _spill(self, events: List[Dict[str, Any]]):
+        self._spill_file.append(events)
+        EVENTS_SPILLED.inc(self.name, amount=len(events))
+
+    def replay_spill(self):
+        """
+        Tulis ulang event dari file spill. File dipindah dulu ke .replay
+        supaya listener bisa terus spill ke file baru. Kalau satu batch
+        gagal, file .replay disimpan dan dicoba lagi setelah backoff
+        (duplikat dari batch yang sudah masuk diabaikan DB).
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return
+        try:
+            if not self._spill_file.claim():
+                return
+            for batch in self._spill_file.batches(self.max_size):
+                if not self._flush(batch):
+                    self._backoff.failed()
+                    return
+            self._spill_file.done()
+            self._backoff.succeeded()
+        finally:
+            self._replay_lock.release()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._buffer) >= self.max_size:
+                        break
+                    if self._buffer:
+                        waited = time.monotonic() - self._first_added
+                        remaining = self.linger - waited
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    elif self.has_spill():
+                        # Spill tertunda (atau replay sebelumnya gagal): cek berkala
+                        self._cond.wait(SPILL_RETRY_SECONDS)
+                        if not self._buffer:
+                            break
+                    else:
+                        self._cond.wait()
+                batch = self._take()
+                closed = self._closed
+                drained = not self._buffer
+
+            self._write(batch)
+            if closed:
+                self.flush()
+                return
+            # Antrean sudah kosong -> saatnya menulis ulang event yang di-spill
+            if drained and self._backoff.ready() and self.has_spill():
+                self.replay_spill()
+
+
+# =====================================================
+# BATCHER (ASYNCIO)
+# =====================================================
+class AsyncEventBatcher:
+    """
+    Versi asyncio dari EventBatcher untuk mode async: `flush_fn` adalah
+    coroutine function dan flusher berjalan sebagai task di event loop.
+    Batas antrean, policy block/shed/spill, dan spill untuk flush gagal
+    sama dengan EventBatcher; "block" membuat `add` menunggu (await).
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        max_size: int = BATCH_MAX_SIZE,
+        linger_ms: int = BATCH_LINGER_MS,
+        name: str = "events",
+        max_pending: int = QUEUE_MAX_EVENTS,
+        policy: str = QUEUE_POLICY,
+        spill_dir: str = QUEUE_SPILL_DIR,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy {policy!r}, expected one of {POLICIES}")
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.linger = max(0, linger_ms) / 1000.0
+        self.max_pending = max(self.max_size, max_pending)
+        self.policy = policy
+        self.spill_path = _spill_path(spill_dir, name)
+        self._spill_file = SpillFile(self.spill_path)
+        self._backoff = _RetryBackoff()
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._first_added: Optional[float] = None
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        # Di-set selama buffer < max_pending (listener "block" menunggu di sini)
+        self._space = asyncio.Event()
+        self._space.set()
+        self._replaying = False
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def add(self, event: Dict[str, Any]):
+        while self.policy == "block" and len(self._buffer) >= self.max_pending and not self._closed:
+            self._space.clear()
+            await self._space.wait()
+        if self._closed:
+            await self._write([event])
+            return
+        if len(self._buffer) < self.max_pending:
+            if not self._buffer:
+                self._first_added = time.monotonic()
+                self._has_items.set()
+            self._buffer.append(event)
+            if len(self._buffer) >= self.max_size:
+                self._full.set()
+            return
+        if self.policy == "shed":
+            metrics.EVENTS_FAILED.inc(metrics.topic_label(event["topic"]), "shed")
+            return
+        await self._spill([event])
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def has_spill(self) -> bool:
+        return self._spill_file.exists()
+
+    async def flush(self):
+        while self._buffer:
+            await self._write(self._take())
+
+    async def close(self):
+        self._closed = True
+        self._has_items.set()
+        self._full.set()
+        self._space.set()
+        if self._task:
+            await self._task
+        await self.flush()
+        await self.replay_spill()
+
+    # -------------------------------------------------
+    # INTERNAL
+    # -------------------------------------------------
+    def _take(self) -> List[Dict[str, Any]]:
+        if self._buffer:
+            QUEUE_WAIT_SECONDS.observe(time.monotonic() - self._first_added, self.name)
+        batch = self._buffer[:self.max_size]
+        self._buffer = self._buffer[self.max_size:]
+        self._first_added = time.monotonic() if self._buffer else None
+        if not self._buffer:
+            self._has_items.clear()
+        if len(self._buffer) < self.max_size:
+            self._full.clear()
+        if len(self._buffer) < self.max_pending:
+            self._space.set()
+        return batch
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            await self.flush_fn(batch)
+            return True
+        except Exception:
+            FLUSH_FAILURES.inc(self.name)
+            logger.warning("Flush of %d events on %s failed", len(batch), self.name, exc_info=True)
+            return False
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        if batch and not await self._flush(batch):
+            await self._spill(batch)
+
+    async def _spill(self, events: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._spill_file.append, events)
+        EVENTS_SPILLED.inc(self.name, amount=len(events))
+
+    async def replay_spill(self):
+        """Sama dengan EventBatcher.replay_spill; file dibaca di thread."""
+        if self._replaying:
+            return
+        self._replaying = True
+        try:
+            if not await asyncio.to_thread(self._spill_file.claim):
+                return
+            batches = self._spill_file.batches(self.max_size)
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                if not await self._flush(batch):
+                    batches.close()
+                    self._backoff.failed()
+                    return
+            await asyncio.to_thread(self._spill_file.done)
+            self._backoff.succeeded()
+        finally:
+            self._replaying = False
+
+    async def _wait_for_items(self):
+        if not self.has_spill():
+            await self._has_items.wait()
+            return
+        # Ada spill: bangun berkala untuk mencoba replay
+        try:
+            await asyncio.wait_for(self._has_items.wait(), SPILL_RETRY_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while not self._closed:
+            await self._wait_for_items()
+            while self._buffer and not self._closed and len(self._buffer) < self.max_size:
+                remaining = self.linger - (time.monotonic() - self._first_added)
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            await self._write(self._take())
+            if not self._buffer and self._backoff.ready() and self.has_spill():
+                await self.replay_spill()
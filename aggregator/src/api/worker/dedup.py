@@ -0,0 +1,106 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Jumlah key (topic, event_id) maksimum yang diingat worker
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))
+
+Key = Tuple[str, str]
+
+# Semua filter di proses ini (dikosongkan saat row/key dihapus dari DB)
+_FILTERS: "weakref.WeakSet[DedupFilter]" = weakref.WeakSet()
+
+
+# =====================================================
+# FILTER
+# =====================================================
+class DedupFilter:
+    """
+    LRU set berisi (topic, event_id) yang SUDAH pasti ada di DB.
+
+    Hit -> event pasti duplikat, tidak perlu ke DB sama sekali.
+    Miss -> belum tentu baru; DB (uq_topic_event_id) tetap penentu akhir.
+    Karena hanya key yang sudah di-commit yang dimasukkan, filter ini
+    exact (tidak ada false positive) selama row di DB tidak dihapus;
+    retention/pemangkasan key memanggil clear_all().
+    """
+
+    def __init__(self, capacity: int = DEDUP_CACHE_SIZE):
+        self.capacity = max(0, capacity)
+        self._keys: "OrderedDict[Key, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Miss yang ternyata ditolak DB sebagai duplikat
+        self.db_duplicates = 0
+        _FILTERS.add(self)
+
+    @staticmethod
+    def key(event: Dict[str, Any]) -> Key:
+        return (event["topic"], event["event_id"])
+
+    def filter(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return event yang belum dikenal (miss); hit langsung dibuang."""
+        fresh = []
+        with self._lock:
+            for event in events:
+                key = self.key(event)
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    fresh.append(event)
+        return fresh
+
+    def remember(self, events: List[Dict[str, Any]], inserted: int):
+        """
+        Tandai event sebagai tersimpan (panggil SETELAH commit).
+        `inserted` = jumlah row baru menurut DB, sisanya duplikat di DB.
+        """
+        with self._lock:
+            self.db_duplicates += len(events) - inserted
+            if not self.capacity:
+                return
+            for event in events:
+                key = self.key(event)
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, events: Iterable[Dict[str, Any]]):
+        """Lupakan key (misalnya karena row-nya dihapus dari DB)."""
+        with self._lock:
+            for event in events:
+                self._keys.pop(self.key(event), None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._keys),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "db_duplicates": self.db_duplicates,
+            }
+
+
+def clear_all():
+    """Kosongkan semua filter: key yang diingat mungkin sudah dihapus dari DB."""
+    for dedup_filter in list(_FILTERS):
+        dedup_filter.clear()
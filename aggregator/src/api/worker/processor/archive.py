@@ -0,0 +1,396 @@
+import asyncio
+import heapq
+import os
+import re
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+from urllib.parse import quote, unquote
+
+from sqlalchemy import column as sql_column, func, select, table as sql_table, text
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+from src.api.worker.processor import db
+from src.api.worker.processor.partitions import period_start
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Direktori arsip Parquet; kosong = arsip mati (dibaca di db, insert ikut memakainya)
+ARCHIVE_DIR = db.ARCHIVE_DIR
+# Hari UTC (waktu proses) yang lebih tua dari ini dipindah ke arsip
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "7"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+# Row per putaran job (dibaca, ditulis ke file, lalu dihapus dari tabel)
+ARCHIVE_CHUNK_ROWS = int(os.getenv("ARCHIVE_CHUNK_ROWS", "50000"))
+# Row group kecil = pruning lebih halus, file sedikit lebih besar
+ARCHIVE_ROW_GROUP_ROWS = int(os.getenv("ARCHIVE_ROW_GROUP_ROWS", "16384"))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+
+_FILE_PATTERN = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+_DELETE_CHUNK = 500
+
+
+def archive_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("topic", pa.string()),
+        ("event_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("source", pa.string()),
+        ("event_timestamp", pa.timestamp("us", tz="UTC")),
+        # Payload disimpan persis seperti di DB (header codec + body)
+        ("payload", pa.binary()),
+    ])
+
+
+class ArchiveFile(NamedTuple):
+    path: str
+    topic: str
+    day: date
+    min_id: int
+    max_id: int
+
+
+# =====================================================
+# ARSIP
+# =====================================================
+class EventArchive:
+    """
+    Row processed_events yang sudah "dingin" disimpan sebagai Parquet per
+    topic per hari: `<root>/topic=<topic>/day=YYYY-MM-DD/part-<min id>-<max id>.parquet`.
+    Setiap file terurut id. Rentang id ada di nama file, jadi file yang
+    tidak relevan dilewati tanpa dibuka. File dibaca lewat memory map,
+    hanya kolom yang diminta, dan row group yang seluruhnya <= after_id
+    dilewati berdasarkan statistik kolom id.
+    """
+
+    def __init__(
+        self,
+        root: str = ARCHIVE_DIR,
+        compression: str = ARCHIVE_COMPRESSION,
+        row_group_rows: int = ARCHIVE_ROW_GROUP_ROWS,
+    ):
+        self.root = root
+        self.compression = compression
+        self.row_group_rows = max(1, row_group_rows)
+        # Ringkasan dari job arsip terakhir; /stats tidak menelusuri direktori
+        self._summary: Optional[Dict[str, Any]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def check(self):
+        if self.enabled and pq is None:
+            raise RuntimeError("ARCHIVE_DIR is set but pyarrow is not installed")
+
+    # -------------------------------------------------
+    # FILE
+    # -------------------------------------------------
+    def _topic_dir(self, topic: str) -> str:
+        # Topic bebas isinya ("/", ".."), jadi di-quote untuk nama direktori
+        return os.path.join(self.root, "topic=" + quote(topic, safe=""))
+
+    def files(self, topic: Optional[str] = None) -> List[ArchiveFile]:
+        """File arsip (semua topic atau satu topic), urut min id."""
+        if not self.enabled or not os.path.isdir(self.root):
+            return []
+        if topic is not None:
+            topic_dirs = [(topic, self._topic_dir(topic))]
+        else:
+            topic_dirs = [
+                (unquote(entry.name[len("topic="):]), entry.path)
+                for entry in os.scandir(self.root)
+                if entry.is_dir() and entry.name.startswith("topic=")
+            ]
+
+        found = []
+        for name, path in topic_dirs:
+            if not os.path.isdir(path):
+                continue
+            for day_dir in os.scandir(path):
+                if not day_dir.is_dir() or not day_dir.name.startswith("day="):
+                    continue
+                day = date.fromisoformat(day_dir.name[len("day="):])
+                for entry in os.scandir(day_dir.path):
+                    match = _FILE_PATTERN.match(entry.name)
+                    if match:
+                        found.append(ArchiveFile(
+                            entry.path, name, day, int(match.group(1)), int(match.group(2))
+                        ))
+        return sorted(found, key=lambda f: (f.min_id, f.max_id))
+
+    def write(self, topic: str, day: date, rows: List[Dict[str, Any]]) -> ArchiveFile:
+        """Tulis satu file (row urut id). Atomic: tulis ke .tmp lalu rename."""
+        self.check()
+        rows = sorted(rows, key=itemgetter("id"))
+        schema = archive_schema()
+        table = pa.Table.from_pydict(
+            {name: [row.get(name) for row in rows] for name in schema.names}, schema=schema
+        )
+        directory = os.path.join(self._topic_dir(topic), f"day={day.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        min_id, max_id = rows[0]["id"], rows[-1]["id"]
+        path = os.path.join(directory, f"part-{min_id:012d}-{max_id:012d}.parquet")
+        tmp = path + ".tmp"
+        pq.write_table(
+            table, tmp, compression=self.compression, row_group_size=self.row_group_rows
+        )
+        os.replace(tmp, path)
+        return ArchiveFile(path, topic, day, min_id, max_id)
+
+    # -------------------------------------------------
+    # BACA
+    # -------------------------------------------------
+    def _read_file(self, entry: ArchiveFile, after_id: Optional[int], columns: List[str]) -> Iterator[Dict[str, Any]]:
+        parquet = pq.ParquetFile(entry.path, memory_map=True)
+        id_index = parquet.schema_arrow.get_field_index("id")
+        for group in range(parquet.num_row_groups):
+            stats = parquet.metadata.row_group(group).column(id_index).statistics
+            if after_id is not None and stats is not None and stats.has_min_max and stats.max <= after_id:
+                continue
+            for row in parquet.read_row_group(group, columns=columns).to_pylist():
+                if after_id is not None and row["id"] <= after_id:
+                    continue
+                if "payload" in row:
+                    row["payload"] = db.unpack_payload(row["payload"])
+                yield row
+
+    def iter_rows(
+        self,
+        topic: Optional[str] = None,
+        after_id: Optional[int] = None,
+        fields: Sequence[str] = (),
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Row arsip urut id (bentuk sama dengan db.get_events). Merge k-way
+        yang malas: file baru dibuka saat min id-nya bisa menjadi row
+        berikutnya, jadi satu halaman hanya menyentuh beberapa file.
+        """
+        self.check()
+        columns = ["id", "topic", "event_id", "timestamp"] + [
+            f for f in db.EXTRA_FIELDS if f in fields
+        ]
+        files = [f for f in self.files(topic) if after_id is None or f.max_id > after_id]
+        heap = []
+        opened = 0
+        while heap or opened < len(files):
+            while opened < len(files) and (not heap or files[opened].min_id <= heap[0][0]):
+                rows = self._read_file(files[opened], after_id, columns)
+                row = next(rows, None)
+                if row is not None:
+                    heapq.heappush(heap, (row["id"], opened, row, rows))
+                opened += 1
+            if not heap:
+                continue
+            _, index, row, rows = heapq.heappop(heap)
+            yield row
+            row = next(rows, None)
+            if row is not None:
+                heapq.heappush(heap, (row["id"], index, row, rows))
+
+    def merge_page(
+        self,
+        hot: List[Dict[str, Any]],
+        topic: Optional[str],
+        limit: Optional[int],
+        after_id: Optional[int],
+        fields: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """Halaman /events: `hot` (sudah dibatasi limit) digabung dengan arsip."""
+        rows = merge_by_id(hot, self.iter_rows(topic, after_id, fields))
+        return list(rows if limit is None else islice(rows, limit))
+
+    def stats(self) -> Dict[str, Any]:
+        """Ringkasan cache (dihitung refresh_stats); sebelum job pertama hanya `enabled`."""
+        if not self.enabled:
+            return {"enabled": False}
+        return self._summary or {"enabled": True}
+
+    def refresh_stats(self) -> Dict[str, Any]:
+        """Telusuri direktori sekali dan simpan ringkasannya (dipanggil job arsip)."""
+        files = self.files()
+        self._summary = {
+            "enabled": True,
+            "files": len(files),
+            "bytes": sum(os.path.getsize(f.path) for f in files),
+            "topics": len({f.topic for f in files}),
+            "oldest_day": min((f.day for f in files), default=None),
+            "newest_day": max((f.day for f in files), default=None),
+        }
+        return self._summary
+
+
+# =====================================================
+# MERGE HOT + ARSIP
+# =====================================================
+def merge_by_id(hot: Iterable[Dict[str, Any]], archived: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Dua urutan terurut id -> satu urutan. Id yang sama (job crash di antara
+    tulis file dan delete) hanya keluar sekali; versi tabel hot menang.
+    """
+    last_id = None
+    for row in heapq.merge(hot, archived, key=itemgetter("id")):
+        if row["id"] != last_id:
+            last_id = row["id"]
+            yield row
+
+
+def merge_chunks(
+    hot_chunks: Iterable[List[Dict[str, Any]]],
+    archived: Iterable[Dict[str, Any]],
+    chunk_size: int = 1000,
+) -> Iterator[List[Dict[str, Any]]]:
+    rows = merge_by_id((row for chunk in hot_chunks for row in chunk), archived)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def merge_chunks_async(
+    hot_chunks: AsyncIterator[List[Dict[str, Any]]],
+    archived: Iterator[Dict[str, Any]],
+    chunk_size: int = 1000,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Seperti merge_chunks; file arsip dibaca di thread, per chunk."""
+    buffered: deque = deque()
+    exhausted = False
+
+    async def head():
+        nonlocal exhausted
+        if not buffered and not exhausted:
+            rows = await asyncio.to_thread(lambda: list(islice(archived, chunk_size)))
+            buffered.extend(rows)
+            exhausted = len(rows) < chunk_size
+        return buffered[0] if buffered else None
+
+    out: List[Dict[str, Any]] = []
+    last_id = None
+
+    def emit(row):
+        nonlocal last_id
+        if row["id"] != last_id:
+            last_id = row["id"]
+            out.append(row)
+
+    async for rows in hot_chunks:
+        for row in rows:
+            while (first := await head()) is not None and first["id"] < row["id"]:
+                emit(buffered.popleft())
+            emit(row)
+        if len(out) >= chunk_size:
+            yield out
+            out = []
+    while await head() is not None:
+        emit(buffered.popleft())
+        if len(out) >= chunk_size:
+            yield out
+            out = []
+    if out:
+        yield out
+
+
+# =====================================================
+# JOB ARSIP
+# =====================================================
+def _delete_rows(conn, rows: List[Dict[str, Any]]):
+    """
+    Hapus row yang sudah diarsip. Key-nya dicatat dulu di event_keys
+    (transaksi yang sama) supaya event yang dikirim ulang tetap duplikat.
+    SQLite ber-partisi: hapus dari tabel periodenya.
+    """
+    partitions = db.event_partitions()
+    keys = [
+        {"id": r["id"], "topic": r["topic"], "event_id": r["event_id"], "seen_at": r["timestamp"]}
+        for r in rows
+    ]
+    for start in range(0, len(keys), _DELETE_CHUNK):
+        conn.execute(db.tombstone_stmt(conn.dialect.name), keys[start:start + _DELETE_CHUNK])
+    targets = defaultdict(list)
+    for row in rows:
+        if partitions is not None and conn.dialect.name != "postgresql":
+            name = partitions.name_for(period_start(row["timestamp"], partitions.interval))
+        else:
+            name = db.ProcessedEvent.__tablename__
+        targets[name].append(row["id"])
+    for name, ids in targets.items():
+        target = sql_table(name, sql_column("id"))
+        for start in range(0, len(ids), _DELETE_CHUNK):
+            conn.execute(target.delete().where(target.c.id.in_(ids[start:start + _DELETE_CHUNK])))
+
+
+def _reuses_ids(conn) -> bool:
+    """Tabel SQLite lama (tanpa AUTOINCREMENT) memakai ulang id terbesar yang dihapus."""
+    if conn.dialect.name != "sqlite" or db.event_partitions() is not None:
+        return False
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE name = :name"),
+        {"name": db.ProcessedEvent.__tablename__},
+    ).scalar()
+    return "AUTOINCREMENT" not in (sql or "").upper()
+
+
+def archive_closed_ranges(
+    archive: Optional[EventArchive] = None,
+    now: Optional[datetime] = None,
+    chunk_rows: int = ARCHIVE_CHUNK_ROWS,
+) -> Dict[str, Any]:
+    """
+    Pindahkan awalan tabel (urut id) yang waktu prosesnya sebelum batas
+    hari ke arsip. File ditulis dulu, baru row dihapus. Kalau proses mati
+    di antaranya, row ada di dua tempat dan merge_by_id membuang salah satunya.
+    topic_stats dan rollup tidak berubah: event arsip tetap terhitung.
+    """
+    archive = archive or event_archive
+    if not archive.enabled:
+        return {}
+    archive.check()
+    cutoff = period_start(now or datetime.utcnow(), "day") - timedelta(days=ARCHIVE_AFTER_DAYS)
+    table = db.ProcessedEvent.__table__
+    report = {"files": 0, "rows": 0}
+    while True:
+        # Urut PK: berhenti di row pertama yang masih hot, tanpa index timestamp
+        with db.engine.connect() as conn:
+            batch = [
+                dict(row)
+                for row in conn.execute(select(table).order_by(table.c.id).limit(chunk_rows)).mappings()
+            ]
+            # Row terakhir dibiarkan hot supaya id-nya tidak dipakai ulang
+            keep_id = conn.execute(select(func.max(table.c.id))).scalar() if _reuses_ids(conn) else None
+        closed = []
+        for row in batch:
+            if row["timestamp"] >= cutoff or row["id"] == keep_id:
+                break
+            closed.append(row)
+        if not closed:
+            break
+
+        groups = defaultdict(list)
+        for row in closed:
+            groups[(row["topic"], row["timestamp"].date())].append(row)
+        for (topic, day), rows in groups.items():
+            archive.write(topic, day, rows)
+        with db.engine.begin() as conn:
+            _delete_rows(conn, closed)
+        report["files"] += len(groups)
+        report["rows"] += len(closed)
+        if len(closed) < len(batch) or len(batch) < chunk_rows:
+            break
+    if report["rows"] or archive._summary is None:
+        archive.refresh_stats()
+    if report["rows"]:
+        print(f"🧊 Archived {report['rows']} events into {report['files']} files")
+    return report
+
+
+event_archive = EventArchive()
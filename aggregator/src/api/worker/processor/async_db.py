@@ -0,0 +1,219 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.api.worker.processor.db import (
+    DATABASE_URL,
+    SQLITE_PROFILE,
+    ProcessedEvent,
+    TopicStat,
+    _bucket_count_rows,
+    _claimed_rows,
+    _create_schema,
+    _event_rows,
+    _events_query,
+    _insert_ignore_duplicates,
+    _insert_keys_stmt,
+    _partition_insert,
+    _archived_keys_query,
+    _record_insert,
+    _without_archived,
+    archive_tombstones,
+    _row_dict,
+    _seed_topic_buckets,
+    _seed_topic_stats_stmt,
+    _timeseries_query,
+    _topic_count_rows,
+    _upsert_bucket_counts,
+    _upsert_topic_counts,
+    event_partitions,
+    finish_maintenance,
+    install_pragmas,
+    maintain_partitions,
+    prune_event_keys_chunk,
+    is_sqlite_file,
+    sqlite_pragmas,
+    statement_timeout_sql,
+)
+
+# =====================================================
+# DATABASE CONFIG (ASYNC)
+# =====================================================
+def to_async_url(url: str) -> str:
+    """postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://"""
+    for prefix, driver in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+if SQLITE_PROFILE == "tuned" and is_sqlite_file(ASYNC_DATABASE_URL):
+    # PRAGMA yang sama dengan profil sync (WAL, synchronous=NORMAL, mmap, ...)
+    install_pragmas(async_engine.sync_engine, sqlite_pragmas())
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# =====================================================
+# SESSION HELPER
+# =====================================================
+@asynccontextmanager
+async def async_session_scope() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+# =====================================================
+# DB INIT
+# =====================================================
+async def init_db_async():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
+
+    async with async_session_scope() as session:
+        existing = await session.execute(select(TopicStat.topic).limit(1))
+        if existing.first() is None:
+            await session.execute(_seed_topic_stats_stmt())
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_seed_topic_buckets)
+
+# =====================================================
+# CRUD (ASYNC)
+# =====================================================
+async def insert_events_keys_async(
+    events: Iterable[Dict[str, Any]],
+    timeout_ms: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    """Versi async dari db.insert_events_keys (hanya PostgreSQL/SQLite)."""
+    rows = _event_rows(events)
+    if not rows:
+        return []
+
+    dialect = async_engine.dialect.name
+    started = time.perf_counter()
+    async with async_session_scope() as session:
+        deadline = statement_timeout_sql(dialect, timeout_ms)
+        if deadline:
+            await session.execute(text(deadline))
+
+        partitions = event_partitions()
+        if partitions is not None:
+            now = datetime.utcnow()
+            keys = (await session.execute(_insert_keys_stmt(dialect), _claimed_rows(rows, now))).all()
+            stmt, fresh = _partition_insert(partitions, dialect, rows, keys, now)
+            if fresh:
+                await session.execute(stmt, fresh)
+            returned = [(r["topic"], r["event_id"], r["event_timestamp"]) for r in fresh]
+        else:
+            candidates = rows
+            if archive_tombstones():
+                archived = await session.execute(_archived_keys_query(rows))
+                candidates = _without_archived(rows, archived)
+            returned = []
+            if candidates:
+                result = await session.execute(
+                    _insert_ignore_duplicates(dialect).returning(
+                        ProcessedEvent.topic, ProcessedEvent.event_id, ProcessedEvent.event_timestamp
+                    ),
+                    candidates,
+                )
+                returned = list(result)
+        stamped = [(topic, stamp) for topic, _, stamp in returned]
+        inserted = [topic for topic, _ in stamped]
+
+        count_rows = _topic_count_rows(inserted)
+        if count_rows:
+            await session.execute(_upsert_topic_counts(dialect), count_rows)
+        bucket_rows = _bucket_count_rows(stamped)
+        if bucket_rows:
+            await session.execute(_upsert_bucket_counts(dialect), bucket_rows)
+
+    _record_insert(rows, inserted, started)
+    return [(topic, event_id) for topic, event_id, _ in returned]
+
+async def insert_events_async(events: Iterable[Dict[str, Any]]) -> int:
+    return len(await insert_events_keys_async(events))
+
+async def get_events_async(
+    topic: Optional[str] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    fields: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    query = _events_query(topic, after_id, fields)
+    if limit is not None:
+        query = query.limit(limit)
+
+    async with async_session_scope() as session:
+        result = await session.execute(query)
+        return [_row_dict(row) for row in result]
+
+async def iter_events_async(
+    topic: Optional[str] = None,
+    after_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    fields: Sequence[str] = (),
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    async with async_engine.connect() as conn:
+        result = await conn.stream(
+            _events_query(topic, after_id, fields).execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield [_row_dict(row) for row in rows]
+
+async def get_timeseries_async(
+    grain: str,
+    start: datetime,
+    end: datetime,
+    topic: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    async with async_session_scope() as session:
+        result = await session.execute(_timeseries_query(grain, start, end, topic))
+        return [dict(row._mapping) for row in result]
+
+async def get_stats_async():
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(TopicStat.topic, TopicStat.count).order_by(TopicStat.topic)
+        )
+        return [(topic, count) for topic, count in result]
+
+async def run_partition_maintenance_async(chunk_size: int = 10000) -> Dict[str, Any]:
+    """Versi async dari db.run_partition_maintenance."""
+    if event_partitions() is None:
+        return {}
+    async with async_engine.begin() as conn:
+        report = await conn.run_sync(maintain_partitions)
+    pruned = 0
+    while True:
+        async with async_engine.begin() as conn:
+            deleted = await conn.run_sync(prune_event_keys_chunk, None, chunk_size)
+        pruned += deleted
+        if deleted < chunk_size:
+            break
+    report["keys_pruned"] = pruned
+    return finish_maintenance(report)
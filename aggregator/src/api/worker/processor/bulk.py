@@ -0,0 +1,278 @@
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.api import cache, metrics
+from src.api.worker.processor import db
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Event per chunk (satu COPY / satu executemany); memori dibatasi oleh ini
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "10000"))
+# Jumlah pesan error yang dikembalikan ke client (sisanya hanya dihitung)
+BULK_MAX_ERRORS = 20
+
+STAGING_COLUMNS = ("topic", "event_id", "source", "event_timestamp", "payload")
+
+
+class BulkRowError(ValueError):
+    """Satu baris tidak valid: dilewati dan dilaporkan."""
+
+
+class BulkFormatError(ValueError):
+    """Seluruh body tidak bisa diproses (misalnya header CSV salah)."""
+
+
+# =====================================================
+# PARSING (satu baris -> event)
+# =====================================================
+def _validate(event: Any) -> Dict[str, Any]:
+    if not isinstance(event, dict):
+        raise BulkRowError("row is not an object")
+    for key in ("topic", "event_id", "timestamp"):
+        if not event.get(key) or not isinstance(event[key], str):
+            raise BulkRowError(f"missing or invalid '{key}'")
+    if db._parse_timestamp(event["timestamp"]) is None:
+        raise BulkRowError("invalid 'timestamp'")
+    payload = event.get("payload")
+    if payload is not None and not isinstance(payload, dict):
+        raise BulkRowError("'payload' must be an object")
+    return event
+
+
+def parse_ndjson_line(line: str) -> Dict[str, Any]:
+    try:
+        return _validate(json.loads(line))
+    except json.JSONDecodeError as e:
+        raise BulkRowError(f"invalid JSON: {e.msg}")
+
+
+class CsvRowParser:
+    """
+    CSV satu baris per event dengan header, kolom: topic, event_id,
+    timestamp, source, payload (JSON). Field dengan newline mentah tidak
+    didukung; payload JSON tidak pernah butuh newline mentah.
+    """
+
+    def __init__(self):
+        self.columns: Optional[List[str]] = None
+
+    def __call__(self, line: str) -> Optional[Dict[str, Any]]:
+        values = next(csv.reader([line]))
+        if self.columns is None:
+            self.columns = [c.strip() for c in values]
+            missing = {"topic", "event_id", "timestamp"} - set(self.columns)
+            if missing:
+                raise BulkFormatError(f"CSV header is missing {sorted(missing)}")
+            return None
+
+        if len(values) != len(self.columns):
+            raise BulkRowError(f"expected {len(self.columns)} columns, got {len(values)}")
+        event: Dict[str, Any] = {k: (v or None) for k, v in zip(self.columns, values)}
+        if event.get("payload"):
+            try:
+                event["payload"] = json.loads(event["payload"])
+            except json.JSONDecodeError as e:
+                raise BulkRowError(f"invalid payload JSON: {e.msg}")
+        return _validate(event)
+
+
+# =====================================================
+# LOADER
+# =====================================================
+class BulkLoader:
+    """
+    Bulk ingest per chunk, memori konstan berapa pun ukuran input.
+
+    PostgreSQL: setiap chunk di-COPY ke tabel staging UNLOGGED milik load
+    ini, lalu `finish()` menggabungkan semuanya ke processed_events dengan
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING. topic_stats dan rollup
+    ikut di-update dalam transaksi yang sama.
+    Dialect lain (SQLite): setiap chunk langsung lewat db.insert_events
+    (executemany, satu transaksi per chunk).
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or db.engine
+        self.use_copy = self.engine.dialect.name == "postgresql"
+        self.staging = f"bulk_staging_{uuid.uuid4().hex[:12]}"
+        self.received = 0
+        self.inserted = 0
+        self.invalid = 0
+        self.errors: List[str] = []
+        self._conn = None
+
+    # -------------------------------------------------
+    # PUBLIC
+    # -------------------------------------------------
+    def reject(self, line_no: int, error: Exception):
+        self.received += 1
+        self.invalid += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append(f"line {line_no}: {error}")
+
+    def write(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        self.received += len(events)
+        if not self.use_copy:
+            self.inserted += db.insert_events(events)
+            return
+        if self._conn is None:
+            self._open()
+        started = time.perf_counter()
+        with self._conn.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.staging} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                io.StringIO(copy_rows(events)),
+            )
+        metrics.DB_INSERT_SECONDS.observe(time.perf_counter() - started)
+
+    def finish(self) -> Dict[str, Any]:
+        if self._conn is not None:
+            try:
+                started = time.perf_counter()
+                with self._conn.cursor() as cursor:
+                    cursor.execute(merge_sql(
+                        self.staging,
+                        db.event_partitions() is not None,
+                        archived=db.archive_tombstones(),
+                    ))
+                    per_topic = cursor.fetchall()
+                self._conn.commit()
+                metrics.DB_INSERT_SECONDS.observe(time.perf_counter() - started)
+                self.inserted = sum(count for _, count in per_topic)
+                cache.TOPIC_VERSIONS.bump(topic for topic, count in per_topic if count)
+                metrics.EVENTS_INSERTED.inc_many(_by_topic_label(per_topic))
+            finally:
+                self._close()
+        return self.summary()
+
+    def abort(self):
+        if self._conn is not None:
+            try:
+                self._conn.rollback()
+            finally:
+                self._close()
+
+    def summary(self) -> Dict[str, Any]:
+        valid = self.received - self.invalid
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "duplicates": valid - self.inserted,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+    # -------------------------------------------------
+    # INTERNAL
+    # -------------------------------------------------
+    def _open(self):
+        self._conn = self.engine.raw_connection()
+        with self._conn.cursor() as cursor:
+            # UNLOGGED: tanpa WAL; isinya memang sementara
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {self.staging} ("
+                "topic text NOT NULL, event_id text NOT NULL, source text, "
+                "event_timestamp timestamptz, payload bytea)"
+            )
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {self.staging}")
+            conn.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to drop staging table {self.staging}: {e}")
+        conn.close()
+
+
+def _by_topic_label(per_topic: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, ...], int]:
+    counts: Counter = Counter()
+    for topic, count in per_topic:
+        counts[(metrics.topic_label(topic),)] += count
+    return dict(counts)
+
+
+def copy_rows(events: Iterable[Dict[str, Any]]) -> str:
+    """Event -> CSV untuk COPY (kolom STAGING_COLUMNS, NULL = field kosong)."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    for row in db._event_rows(events):
+        stamp = row["event_timestamp"]
+        payload = row["payload"]
+        writer.writerow((
+            row["topic"],
+            row["event_id"],
+            row["source"],
+            stamp.isoformat() if stamp else None,
+            "\\x" + payload.hex() if payload is not None else None,
+        ))
+    return out.getvalue()
+
+
+def merge_sql(staging: str, partitioned: bool = False, archived: bool = False) -> str:
+    """
+    Satu statement: insert yang belum ada, lalu counter & rollup dari row
+    yang BENAR-BENAR masuk (RETURNING). Hasil: (topic, jumlah baru).
+    Dengan `partitioned`, dedup lewat event_keys (lihat db.EventKey).
+    Dengan `archived`, key yang sudah diarsip (event_keys) ikut dilewati.
+    """
+    bucket = "coalesce(event_timestamp, now()) AT TIME ZONE 'UTC'"
+    if partitioned:
+        insert = f"""src AS (
+    SELECT DISTINCT ON (topic, event_id) * FROM {staging} ORDER BY topic, event_id
+),
+keys AS (
+    INSERT INTO event_keys (topic, event_id, seen_at)
+    SELECT topic, event_id, now() AT TIME ZONE 'UTC' FROM src
+    ON CONFLICT (topic, event_id) DO NOTHING
+    RETURNING id, topic, event_id
+),
+ins AS (
+    INSERT INTO processed_events (id, topic, event_id, timestamp, source, event_timestamp, payload)
+    SELECT keys.id, src.topic, src.event_id, now() AT TIME ZONE 'UTC',
+           src.source, src.event_timestamp, src.payload
+    FROM keys JOIN src USING (topic, event_id)
+    RETURNING topic, event_timestamp
+)"""
+    else:
+        skip_archived = (
+            "\n    WHERE NOT EXISTS (SELECT 1 FROM event_keys k"
+            " WHERE k.topic = s.topic AND k.event_id = s.event_id)"
+            if archived else ""
+        )
+        insert = f"""ins AS (
+    INSERT INTO processed_events (topic, event_id, timestamp, source, event_timestamp, payload)
+    SELECT topic, event_id, now(), source, event_timestamp, payload FROM {staging} s{skip_archived}
+    ON CONFLICT ON CONSTRAINT uq_topic_event_id DO NOTHING
+    RETURNING topic, event_timestamp
+)"""
+    rollups = ",\n".join(
+        f"""b_{grain} AS (
+    INSERT INTO topic_buckets (topic, grain, bucket_start, count)
+    SELECT topic, '{grain}', date_trunc('{unit}', {bucket}), count(*)
+    FROM ins GROUP BY 1, 3 ORDER BY 1, 3
+    ON CONFLICT (topic, grain, bucket_start)
+    DO UPDATE SET count = topic_buckets.count + excluded.count
+)"""
+        for grain, unit in (("1m", "minute"), ("1h", "hour"))
+    )
+    return f"""
+WITH {insert},
+stats AS (
+    INSERT INTO topic_stats (topic, count)
+    SELECT topic, count(*) FROM ins GROUP BY topic ORDER BY topic
+    ON CONFLICT (topic) DO UPDATE SET count = topic_stats.count + excluded.count
+),
+{rollups}
+SELECT topic, count(*) FROM ins GROUP BY topic
+"""
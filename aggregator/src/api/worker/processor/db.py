@@ -1,16 +1,35 @@
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
+    text,
     Column,
+    Index,
     String,
     Integer,
     DateTime,
+    LargeBinary,
     func,
+    select,
+    column as sql_column,
+    table as sql_table,
+    tuple_,
     UniqueConstraint,
 )
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from collections import Counter
 from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 import os
+import time
+
+from src.api import cache, metrics
+from src.api.worker import dedup
+from src.api.worker.processor.partitions import TimePartitions
+from src.broker import codec
 
 # =====================================================
 # DATABASE CONFIG
@@ -20,13 +39,70 @@ DATABASE_URL = os.getenv(
     "sqlite:///./test.db"  # 🔥 default aman untuk pytest
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    connect_args={"check_same_thread": False}
-    if DATABASE_URL.startswith("sqlite")
-    else {},
-)
+# "default": satu engine seperti biasa.
+# "tuned" (hanya SQLite file): WAL + synchronous=NORMAL + mmap + busy timeout,
+# SATU koneksi writer (transaksi batch antre di pool) dan pool koneksi
+# read-only untuk /events dan /stats, supaya pembaca tidak rebutan lock
+# dengan worker.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+
+
+def is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith(":")
+
+
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if read_only:
+        return pragmas + ["PRAGMA query_only = ON"]
+    # journal_mode=WAL tersimpan di file database, cukup dari writer
+    return ["PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL"] + pragmas
+
+
+def install_pragmas(target_engine, pragmas: List[str]):
+    @event.listens_for(target_engine, "connect")
+    def _apply(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def create_engines(url: str, profile: Optional[str] = None):
+    """Return (engine writer, engine reader atau None kalau sama dengan writer)."""
+    profile = profile or SQLITE_PROFILE
+    if profile != "tuned" or not is_sqlite_file(url):
+        return create_engine(
+            url,
+            pool_pre_ping=True,
+            connect_args={"check_same_thread": False}
+            if url.startswith("sqlite")
+            else {},
+        ), None
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    install_pragmas(writer, sqlite_pragmas())
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=max(1, SQLITE_READ_POOL_SIZE),
+        max_overflow=0,
+    )
+    install_pragmas(reader, sqlite_pragmas(read_only=True))
+    return writer, reader
+
+
+engine, read_engine = create_engines(DATABASE_URL)
 
 SessionLocal = scoped_session(
     sessionmaker(
@@ -38,6 +114,30 @@ SessionLocal = scoped_session(
 
 Base = declarative_base()
 
+# Payload disimpan sebagai blob ber-header codec (lihat src/broker/codec.py),
+# jadi ganti codec/kompresi tidak merusak row lama
+PAYLOAD_CODEC = os.getenv("PAYLOAD_CODEC", "msgpack")
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "zlib")
+PAYLOAD_COMPRESS_MIN_BYTES = int(os.getenv("PAYLOAD_COMPRESS_MIN_BYTES", "256"))
+
+# Partisi processed_events per periode waktu proses: "" (mati), day, week, month.
+# Hanya PostgreSQL (partisi native) dan SQLite (tabel per periode + VIEW).
+EVENTS_PARTITION_INTERVAL = os.getenv("EVENTS_PARTITION_INTERVAL", "")
+# Jumlah partisi ke depan yang disiapkan
+EVENTS_PARTITION_PREMAKE = int(os.getenv("EVENTS_PARTITION_PREMAKE", "3"))
+# Partisi yang seluruhnya lebih tua dari ini dibuang (0 = simpan semua)
+EVENTS_RETENTION_DAYS = float(os.getenv("EVENTS_RETENTION_DAYS", "0"))
+# "drop" atau "detach" (lepas dari tabel, data tetap ada, misal untuk diarsip)
+EVENTS_RETENTION_MODE = os.getenv("EVENTS_RETENTION_MODE", "drop")
+# Jendela dedup saat partisi aktif: key (topic, event_id) disimpan selama
+# ini. Default = retensi; 0 = selamanya.
+EVENTS_DEDUP_WINDOW_DAYS = float(
+    os.getenv("EVENTS_DEDUP_WINDOW_DAYS", str(EVENTS_RETENTION_DAYS))
+)
+# Arsip Parquet (lihat archive.py). Key row yang diarsip disimpan di
+# event_keys, dan insert membuang key itu supaya tetap exactly-once.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+
 # =====================================================
 # MODEL
 # =====================================================
@@ -46,12 +146,70 @@ class ProcessedEvent(Base):
     id = Column(Integer, primary_key=True)
     topic = Column(String, nullable=False)
     event_id = Column(String, nullable=False)
+    # Waktu event diproses (bukan timestamp milik event)
     timestamp = Column(DateTime, default=func.now(), nullable=False)
+    source = Column(String, nullable=True)
+    event_timestamp = Column(DateTime(timezone=True), nullable=True)
+    payload = Column(LargeBinary, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("topic", "event_id", name="uq_topic_event_id"),
+        # Keyset pagination: WHERE topic = ? AND id > ? ORDER BY id
+        Index("ix_processed_events_topic_id", "topic", "id"),
+        # Id tidak boleh dipakai ulang setelah row dipindah ke arsip
+        {"sqlite_autoincrement": True},
     )
 
+class EventKey(Base):
+    """
+    Penentu dedup saat processed_events dipartisi: unique constraint di
+    tabel partisi wajib memuat kolom partisi, jadi tidak bisa global.
+    Id di sini sekaligus menjadi id row processed_events. Row yang lebih
+    tua dari EVENTS_DEDUP_WINDOW_DAYS dipangkas.
+    Tanpa partisi, tabel ini hanya berisi key row yang sudah diarsip.
+    """
+    __tablename__ = "event_keys"
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    event_id = Column(String, nullable=False)
+    seen_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("topic", "event_id", name="uq_event_keys_topic_event_id"),
+        Index("ix_event_keys_seen_at", "seen_at"),
+        # Id tidak boleh dipakai ulang setelah key lama dipangkas
+        {"sqlite_autoincrement": True},
+    )
+
+class TopicStat(Base):
+    """
+    Counter per topic, di-update dalam transaksi yang sama dengan insert
+    event, jadi /stats cukup membaca O(jumlah topic) row.
+    """
+    __tablename__ = "topic_stats"
+    topic = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class TopicBucket(Base):
+    """
+    Rollup jumlah event per topic per bucket waktu (grain "1m" dan "1h"),
+    berdasarkan timestamp milik event. Di-update dalam transaksi insert,
+    jadi /stats/timeseries tidak perlu menyentuh processed_events.
+    """
+    __tablename__ = "topic_buckets"
+    topic = Column(String, primary_key=True)
+    grain = Column(String(2), primary_key=True)
+    # UTC tanpa timezone, awal bucket
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Query tanpa filter topic: WHERE grain = ? AND bucket_start BETWEEN ...
+        Index("ix_topic_buckets_grain_start", "grain", "bucket_start"),
+    )
+
+BUCKET_GRAINS = {"1m": timedelta(minutes=1), "1h": timedelta(hours=1)}
+
 # =====================================================
 # SESSION HELPER
 # =====================================================
@@ -67,50 +225,545 @@ def session_scope():
     finally:
         session.close()
 
+@contextmanager
+def read_connection():
+    """Koneksi untuk query baca: pool read-only kalau ada, selain itu engine biasa."""
+    with (read_engine or engine).connect() as conn:
+        yield conn
+
 # =====================================================
 # DB INIT
 # =====================================================
+def event_partitions() -> Optional[TimePartitions]:
+    if not EVENTS_PARTITION_INTERVAL:
+        return None
+    return TimePartitions(
+        ProcessedEvent.__table__, EVENTS_PARTITION_INTERVAL, EVENTS_PARTITION_PREMAKE
+    )
+
+def _create_schema(conn):
+    """
+    Tabel biasa lewat create_all; processed_events ber-partisi dibuat
+    TimePartitions. event_keys selalu ada (partisi atau arsip).
+    """
+    partitions = event_partitions()
+    Base.metadata.create_all(
+        bind=conn,
+        tables=[
+            t for t in Base.metadata.sorted_tables
+            if not (partitions and t is ProcessedEvent.__table__)
+        ],
+    )
+    if partitions:
+        partitions.create(conn, datetime.utcnow())
+        return
+    _add_missing_columns(conn)
+    # create_all tidak menambah index ke tabel yang sudah ada
+    for index in ProcessedEvent.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _create_schema(conn)
+    _seed_topic_stats()
+    with engine.begin() as conn:
+        _seed_topic_buckets(conn)
+
+def _add_missing_columns(conn):
+    """Tabel lama (sebelum source/event_timestamp/payload) -> ALTER TABLE ADD COLUMN."""
+    table = ProcessedEvent.__table__
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing or not column.nullable:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def _seed_topic_stats_stmt():
+    return TopicStat.__table__.insert().from_select(
+        ["topic", "count"],
+        select(ProcessedEvent.topic, func.count(ProcessedEvent.id))
+        .group_by(ProcessedEvent.topic),
+    )
+
+def _seed_topic_stats():
+    """Database lama belum punya topic_stats -> isi sekali dari processed_events."""
+    with session_scope() as session:
+        if session.query(TopicStat.topic).first() is not None:
+            return
+        session.execute(_seed_topic_stats_stmt())
+
+def _seed_topic_buckets(conn, chunk_size: int = 10000):
+    """
+    Database lama belum punya rollup -> hitung sekali dari processed_events
+    (stream per chunk; yang ditampung hanya hitungan per bucket).
+    """
+    if conn.execute(select(TopicBucket.topic).limit(1)).first() is not None:
+        return
+    stamp = func.coalesce(ProcessedEvent.event_timestamp, ProcessedEvent.timestamp)
+    result = conn.execution_options(yield_per=chunk_size).execute(
+        select(ProcessedEvent.topic, stamp)
+    )
+    rows = _bucket_count_rows(result)
+    if rows:
+        conn.execute(TopicBucket.__table__.insert(), rows)
 
 # =====================================================
 # CRUD
 # =====================================================
-def insert_event(topic: str, event_id: str):
+def _insert_ignore_duplicates(dialect: Optional[str] = None):
+    """
+    INSERT ... ON CONFLICT DO NOTHING sesuai dialect engine aktif.
+    Return None kalau dialect tidak punya upsert (pakai fallback savepoint).
+    """
+    dialect = dialect or engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(ProcessedEvent).on_conflict_do_nothing(
+            constraint="uq_topic_event_id"
+        )
+    if dialect == "sqlite":
+        return sqlite.insert(ProcessedEvent).on_conflict_do_nothing(
+            index_elements=["topic", "event_id"]
+        )
+    return None
+
+
+def _upsert_counts(model, index_elements: List[str], dialect: Optional[str] = None):
+    """INSERT ... ON CONFLICT (key) DO UPDATE SET count = count + excluded.count"""
+    dialect = dialect or engine.dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(model)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(model)
+    else:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={"count": model.count + stmt.excluded.count},
+    )
+
+
+def _upsert_topic_counts(dialect: Optional[str] = None):
+    return _upsert_counts(TopicStat, ["topic"], dialect)
+
+
+def _upsert_bucket_counts(dialect: Optional[str] = None):
+    return _upsert_counts(TopicBucket, ["topic", "grain", "bucket_start"], dialect)
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(value: datetime, grain: str) -> datetime:
+    value = to_utc_naive(value)
+    if grain == "1m":
+        return value.replace(second=0, microsecond=0)
+    if grain == "1h":
+        return value.replace(minute=0, second=0, microsecond=0)
+    raise ValueError(f"unknown bucket grain {grain!r}")
+
+
+def _bucket_count_rows(stamped: Iterable[Tuple[str, Optional[datetime]]]) -> List[Dict[str, Any]]:
+    """(topic, timestamp) -> row rollup untuk semua grain, urut per key (urutan lock tetap)."""
+    now = None
+    counts: Counter = Counter()
+    for topic, stamp in stamped:
+        if stamp is None:
+            # Event tanpa timestamp dihitung pada waktu diproses
+            now = now or datetime.now(timezone.utc)
+            stamp = now
+        for grain in BUCKET_GRAINS:
+            counts[(topic, grain, bucket_start(stamp, grain))] += 1
+    return [
+        {"topic": topic, "grain": grain, "bucket_start": start, "count": count}
+        for (topic, grain, start), count in sorted(counts.items())
+    ]
+
+
+def _topic_count_rows(topics: Iterable[str]) -> List[Dict[str, Any]]:
+    # Urut per topic supaya lock row selalu diambil dengan urutan sama
+    return [{"topic": t, "count": c} for t, c in sorted(Counter(topics).items())]
+
+
+def _bump_counts(session, model, stmt, rows: List[Dict[str, Any]], key: Sequence[str]):
+    if not rows:
+        return
+    if stmt is not None:
+        session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        current = session.get(model, tuple(row[k] for k in key))
+        if current is None:
+            session.add(model(**row))
+        else:
+            current.count += row["count"]
+
+
+def _bump_topic_counts(session, topics: Iterable[str]):
+    _bump_counts(session, TopicStat, _upsert_topic_counts(), _topic_count_rows(topics), ["topic"])
+
+
+def _bump_bucket_counts(session, stamped: Iterable[Tuple[str, Optional[datetime]]]):
+    _bump_counts(
+        session,
+        TopicBucket,
+        _upsert_bucket_counts(),
+        _bucket_count_rows(stamped),
+        ["topic", "grain", "bucket_start"],
+    )
+
+
+def _insert_keys_stmt(dialect: str):
+    """Klaim key di event_keys; RETURNING = key yang baru (id-nya dipakai row event)."""
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(EventKey)
+    return stmt.on_conflict_do_nothing(index_elements=["topic", "event_id"]).returning(
+        EventKey.id, EventKey.topic, EventKey.event_id
+    )
+
+
+def _claimed_rows(rows: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    return [{"topic": r["topic"], "event_id": r["event_id"], "seen_at": now} for r in rows]
+
+
+def _partition_insert(partitions: TimePartitions, dialect: str, rows, keys, now: datetime):
+    """
+    (statement insert ke partisi, row baru). Row duplikat dalam satu
+    batch hanya masuk sekali (key-nya hanya dikembalikan sekali).
+    """
+    ids = {(topic, event_id): id_ for id_, topic, event_id in keys}
+    fresh = []
+    for row in rows:
+        id_ = ids.pop((row["topic"], row["event_id"]), None)
+        if id_ is not None:
+            fresh.append({**row, "id": id_, "timestamp": now})
+    target = sql_table(
+        partitions.target(dialect, now),
+        *(sql_column(c.name, c.type) for c in ProcessedEvent.__table__.columns),
+    )
+    return target.insert(), fresh
+
+
+def _insert_partitioned(session, partitions: TimePartitions, rows: List[Dict[str, Any]]):
+    dialect = session.get_bind().dialect.name
+    now = datetime.utcnow()
+    keys = session.execute(_insert_keys_stmt(dialect), _claimed_rows(rows, now)).all()
+    stmt, fresh = _partition_insert(partitions, dialect, rows, keys, now)
+    if fresh:
+        session.execute(stmt, fresh)
+    return [(r["topic"], r["event_id"], r["event_timestamp"]) for r in fresh]
+
+
+def archive_tombstones() -> bool:
+    """Tanpa partisi + arsip aktif: insert harus mengecek key yang sudah diarsip."""
+    return bool(ARCHIVE_DIR) and event_partitions() is None
+
+
+def _archived_keys_query(rows: List[Dict[str, Any]]):
+    return select(EventKey.topic, EventKey.event_id).where(
+        tuple_(EventKey.topic, EventKey.event_id).in_(
+            {(r["topic"], r["event_id"]) for r in rows}
+        )
+    )
+
+
+def _without_archived(rows: List[Dict[str, Any]], archived) -> List[Dict[str, Any]]:
+    archived = set(map(tuple, archived))
+    return [r for r in rows if (r["topic"], r["event_id"]) not in archived]
+
+
+def tombstone_stmt(dialect: str):
+    """Key row yang akan dihapus dari tabel hot (arsip); yang sudah ada dibiarkan."""
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(EventKey)
+    return stmt.on_conflict_do_nothing()
+
+
+def _record_insert(rows: List[Dict[str, Any]], inserted: List[str], started: float):
+    """Setelah commit: metrics (row baru / duplikat di DB) dan versi cache topic."""
+    cache.TOPIC_VERSIONS.bump(inserted)
+    metrics.DB_INSERT_SECONDS.observe(time.perf_counter() - started)
+    metrics.EVENTS_INSERTED.inc_many(metrics.count_by_topic(inserted))
+    if len(inserted) < len(rows):
+        duplicates = Counter(row["topic"] for row in rows) - Counter(inserted)
+        metrics.EVENTS_DEDUPLICATED.inc_many(
+            metrics.count_by_topic(duplicates.elements(), "db")
+        )
+
+
+def pack_payload(payload: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    if payload is None:
+        return None
+    return codec.encode(
+        payload, PAYLOAD_CODEC, PAYLOAD_COMPRESSION, min_bytes=PAYLOAD_COMPRESS_MIN_BYTES
+    )
+
+
+def unpack_payload(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    return None if blob is None else codec.decode(blob)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """ISO8601 (dari model_dump) -> datetime UTC. Nilai rusak -> None."""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _event_rows(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "topic": e["topic"],
+            "event_id": e["event_id"],
+            "source": e.get("source"),
+            "event_timestamp": _parse_timestamp(e.get("timestamp")),
+            "payload": pack_payload(e.get("payload")),
+        }
+        for e in events
+    ]
+
+
+def statement_timeout_sql(dialect: str, timeout_ms: Optional[int]) -> Optional[str]:
+    """Batas waktu per statement di dalam transaksi (hanya PostgreSQL)."""
+    if timeout_ms is None or dialect != "postgresql":
+        return None
+    return f"SET LOCAL statement_timeout = {max(1, int(timeout_ms))}"
+
+
+def insert_events_keys(
+    events: Iterable[Dict[str, Any]],
+    timeout_ms: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Batch insert idempotent: semua event masuk dalam SATU transaksi.
+    Duplikat (topic, event_id) diabaikan oleh DB.
+    Return key (topic, event_id) yang benar-benar baru. Dengan `timeout_ms`
+    (PostgreSQL) transaksi dibatalkan kalau statement melewati batas itu.
+    """
+    rows = _event_rows(events)
+    if not rows:
+        return []
+
+    started = time.perf_counter()
     with session_scope() as session:
-        try:
-            event = ProcessedEvent(
-                topic=topic,
-                event_id=event_id,
+        deadline = statement_timeout_sql(engine.dialect.name, timeout_ms)
+        if deadline:
+            session.execute(text(deadline))
+
+        partitions = event_partitions()
+        stmt = _insert_ignore_duplicates()
+        # Key yang sudah diarsip = duplikat, walau row-nya tidak lagi di tabel
+        candidates = rows
+        if archive_tombstones():
+            candidates = _without_archived(rows, session.execute(_archived_keys_query(rows)))
+        if partitions is not None:
+            returned = _insert_partitioned(session, partitions, rows)
+        elif not candidates:
+            returned = []
+        elif stmt is not None:
+            result = session.execute(
+                stmt.returning(
+                    ProcessedEvent.topic, ProcessedEvent.event_id, ProcessedEvent.event_timestamp
+                ),
+                candidates,
             )
-            session.add(event)
-        except IntegrityError:
-            # idempotent insert
-            pass
+            returned = list(result)
+        else:
+            # Fallback generik: satu savepoint per row
+            returned = []
+            for row in candidates:
+                try:
+                    with session.begin_nested():
+                        session.add(ProcessedEvent(**row))
+                    returned.append((row["topic"], row["event_id"], row["event_timestamp"]))
+                except IntegrityError:
+                    pass
 
-def get_events(topic: str | None = None):
-    with session_scope() as session:
-        query = session.query(ProcessedEvent)
-        if topic:
-            query = query.filter(ProcessedEvent.topic == topic)
+        # Counter dan rollup ikut transaksi yang sama -> selalu konsisten dengan tabel
+        inserted = [topic for topic, _, _ in returned]
+        _bump_topic_counts(session, inserted)
+        _bump_bucket_counts(session, ((topic, stamp) for topic, _, stamp in returned))
+
+    _record_insert(rows, inserted, started)
+    return [(topic, event_id) for topic, event_id, _ in returned]
+
+
+def insert_events(events: Iterable[Dict[str, Any]]) -> int:
+    """Seperti insert_events_keys, tapi hanya mengembalikan jumlah row baru."""
+    return len(insert_events_keys(events))
+
+
+def insert_event(topic: str, event_id: str) -> bool:
+    """Idempotent insert satu event. True kalau event baru."""
+    return insert_events([{"topic": topic, "event_id": event_id}]) == 1
+
+# Kolom tambahan yang bisa diminta lewat /events?fields=...
+EXTRA_FIELDS = ("source", "event_timestamp", "payload")
+
+def _events_query(
+    topic: Optional[str],
+    after_id: Optional[int],
+    fields: Sequence[str] = (),
+):
+    """Default hanya kolom ringan; payload cuma dibaca kalau diminta."""
+    query = select(
+        ProcessedEvent.id,
+        ProcessedEvent.topic,
+        ProcessedEvent.event_id,
+        ProcessedEvent.timestamp,
+        *(getattr(ProcessedEvent, f) for f in EXTRA_FIELDS if f in fields),
+    )
+    if topic:
+        query = query.where(ProcessedEvent.topic == topic)
+    if after_id is not None:
+        query = query.where(ProcessedEvent.id > after_id)
+    return query.order_by(ProcessedEvent.id)
+
+def _row_dict(row) -> Dict[str, Any]:
+    data = dict(row._mapping)
+    if "payload" in data:
+        data["payload"] = unpack_payload(data["payload"])
+    return data
 
+def get_events(
+    topic: Optional[str] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    fields: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Keyset pagination: halaman berikutnya pakai `after_id` = id terakhir
+    dari halaman sebelumnya. Tanpa `limit` semua row dikembalikan.
+    """
+    query = _events_query(topic, after_id, fields)
+    if limit is not None:
+        query = query.limit(limit)
+
+    with read_connection() as conn:
+        return [_row_dict(row) for row in conn.execute(query)]
+
+def iter_events(
+    topic: Optional[str] = None,
+    after_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    fields: Sequence[str] = (),
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Baca row dengan server-side cursor dan yield per chunk,
+    jadi memori konstan berapa pun jumlah row di tabel.
+    """
+    with read_connection() as conn:
+        result = conn.execution_options(yield_per=chunk_size).execute(
+            _events_query(topic, after_id, fields)
+        )
+        for rows in result.partitions():
+            yield [_row_dict(row) for row in rows]
+
+def _timeseries_query(
+    grain: str,
+    start: datetime,
+    end: datetime,
+    topic: Optional[str] = None,
+):
+    query = select(TopicBucket.topic, TopicBucket.bucket_start, TopicBucket.count).where(
+        TopicBucket.grain == grain,
+        TopicBucket.bucket_start >= bucket_start(start, grain),
+        TopicBucket.bucket_start < to_utc_naive(end),
+    )
+    if topic:
+        query = query.where(TopicBucket.topic == topic)
+    return query.order_by(TopicBucket.bucket_start, TopicBucket.topic)
+
+def get_timeseries(
+    grain: str,
+    start: datetime,
+    end: datetime,
+    topic: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Jumlah event per bucket di [start, end), dibaca dari rollup."""
+    with read_connection() as conn:
         return [
-            {
-                "id": e.id,
-                "topic": e.topic,
-                "event_id": e.event_id,
-                "timestamp": e.timestamp,
-            }
-            for e in query.all()
+            dict(row._mapping)
+            for row in conn.execute(_timeseries_query(grain, start, end, topic))
         ]
 
 def get_stats():
-    with session_scope() as session:
-        return (
-            session.query(
-                ProcessedEvent.topic,
-                func.count(ProcessedEvent.id),
+    """Jumlah event unik per topic, dibaca dari counter (bukan COUNT(*))."""
+    with read_connection() as conn:
+        return [
+            (topic, count)
+            for topic, count in conn.execute(
+                select(TopicStat.topic, TopicStat.count).order_by(TopicStat.topic)
             )
-            .group_by(ProcessedEvent.topic)
-            .all()
+        ]
+
+# =====================================================
+# PARTITION MAINTENANCE
+# =====================================================
+def maintain_partitions(conn, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Satu transaksi DDL: siapkan partisi ke depan dan buang (atau lepas)
+    partisi yang seluruhnya lewat EVENTS_RETENTION_DAYS.
+    """
+    partitions = event_partitions()
+    if partitions is None:
+        return {}
+    now = now or datetime.utcnow()
+    created = partitions.ensure(conn, now)
+    dropped = []
+    if EVENTS_RETENTION_DAYS > 0:
+        dropped = partitions.drop_before(
+            conn,
+            now - timedelta(days=EVENTS_RETENTION_DAYS),
+            now,
+            detach_only=EVENTS_RETENTION_MODE == "detach",
         )
+    return {"created": created, "dropped": dropped}
+
+def prune_event_keys_chunk(conn, now: Optional[datetime] = None, chunk_size: int = 10000) -> int:
+    """Hapus sampai `chunk_size` key dedup yang lewat jendela; return jumlahnya."""
+    if EVENTS_DEDUP_WINDOW_DAYS <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=EVENTS_DEDUP_WINDOW_DAYS)
+    expired = (
+        select(EventKey.id)
+        .where(EventKey.seen_at < cutoff)
+        .order_by(EventKey.seen_at)
+        .limit(chunk_size)
+        .scalar_subquery()
+    )
+    return conn.execute(EventKey.__table__.delete().where(EventKey.id.in_(expired))).rowcount
+
+def finish_maintenance(report: Dict[str, Any]) -> Dict[str, Any]:
+    if report.get("dropped"):
+        # Row hilang dari topic yang tidak diketahui -> semua cache basi
+        cache.TOPIC_VERSIONS.invalidate_all()
+        print(f"🧹 Retention removed partitions {report['dropped']}")
+    if report.get("dropped") or report.get("keys_pruned"):
+        # Key di filter bisa sudah tidak ada di DB -> bukan lagi duplikat pasti
+        dedup.clear_all()
+    return report
+
+def run_partition_maintenance(now: Optional[datetime] = None, chunk_size: int = 10000) -> Dict[str, Any]:
+    """Dipanggil berkala oleh aggregator (mode sync). Key dipangkas per transaksi kecil."""
+    if event_partitions() is None:
+        return {}
+    with engine.begin() as conn:
+        report = maintain_partitions(conn, now)
+    pruned = 0
+    while True:
+        with engine.begin() as conn:
+            deleted = prune_event_keys_chunk(conn, now, chunk_size)
+        pruned += deleted
+        if deleted < chunk_size:
+            break
+    report["keys_pruned"] = pruned
+    return finish_maintenance(report)
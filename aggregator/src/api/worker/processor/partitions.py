@@ -0,0 +1,224 @@
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Table, text
+
+INTERVALS = ("day", "week", "month")
+
+
+# =====================================================
+# PERIODE
+# =====================================================
+def period_start(value: datetime, interval: str) -> datetime:
+    """Awal periode (UTC naive) yang memuat `value`; minggu mulai hari Senin."""
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    raise ValueError(f"unknown partition interval {interval!r}; expected one of {INTERVALS}")
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(days=7)
+    if interval == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    raise ValueError(f"unknown partition interval {interval!r}; expected one of {INTERVALS}")
+
+
+# =====================================================
+# PARTISI WAKTU
+# =====================================================
+class TimePartitions:
+    """
+    Tabel yang dipecah per periode waktu pada kolom `column`.
+
+    PostgreSQL: partisi native (PARTITION BY RANGE), tabel induk
+    dipakai langsung untuk insert dan query.
+    SQLite: satu tabel per periode (`<tabel>_pYYYYMMDD`) dan VIEW
+    bernama `<tabel>` = UNION ALL semua periode; insert langsung ke tabel
+    periodenya (`target()`).
+    Retensi = hapus/lepas satu partisi utuh, bukan DELETE per row.
+    """
+
+    def __init__(self, table: Table, interval: str, premake: int = 3, column: str = "timestamp"):
+        period_start(datetime(2000, 1, 1), interval)  # validasi interval
+        self.table = table
+        self.interval = interval
+        self.premake = max(0, premake)
+        self.column = column
+        self._pattern = re.compile(rf"^{re.escape(table.name)}_p(\d{{8}})$")
+
+    # -------------------------------------------------
+    # NAMA & DDL
+    # -------------------------------------------------
+    def name_for(self, start: datetime) -> str:
+        return f"{self.table.name}_p{start:%Y%m%d}"
+
+    def parse(self, name: str) -> Optional[Tuple[datetime, datetime]]:
+        """Nama partisi -> (awal, akhir) periode, None kalau bukan partisi tabel ini."""
+        match = self._pattern.match(name)
+        if not match:
+            return None
+        start = datetime.strptime(match.group(1), "%Y%m%d")
+        return start, next_period(start, self.interval)
+
+    def _columns_sql(self, dialect) -> str:
+        columns = []
+        for column in self.table.columns:
+            null = " NOT NULL" if column.primary_key or not column.nullable else ""
+            columns.append(f"{column.name} {column.type.compile(dialect=dialect)}{null}")
+        return ", ".join(columns)
+
+    def _index_sql(self, table_name: str) -> List[str]:
+        # Index partisi SQLite diberi akhiran "_pYYYYMMDD" (nama index global di SQLite)
+        suffix = table_name[len(self.table.name):]
+        return [
+            f"CREATE INDEX IF NOT EXISTS {index.name}{suffix} "
+            f"ON {table_name} ({', '.join(c.name for c in index.columns)})"
+            for index in self.table.indexes
+        ]
+
+    def parent_ddl(self, dialect) -> List[str]:
+        """PostgreSQL: tabel induk ber-partisi. PK harus memuat kolom partisi."""
+        primary = [c.name for c in self.table.primary_key.columns] + [self.column]
+        return [
+            f"CREATE TABLE IF NOT EXISTS {self.table.name} ("
+            f"{self._columns_sql(dialect)}, PRIMARY KEY ({', '.join(primary)})"
+            f") PARTITION BY RANGE ({self.column})"
+        ] + self._index_sql(self.table.name)
+
+    def partition_ddl(self, dialect, start: datetime) -> List[str]:
+        name = self.name_for(start)
+        if dialect.name == "postgresql":
+            end = next_period(start, self.interval)
+            return [
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table.name} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+            ]
+        primary = ", ".join(c.name for c in self.table.primary_key.columns)
+        return [
+            f"CREATE TABLE IF NOT EXISTS {name} ({self._columns_sql(dialect)}, PRIMARY KEY ({primary}))"
+        ] + self._index_sql(name)
+
+    def view_ddl(self, names: List[str]) -> List[str]:
+        """SQLite: VIEW `<tabel>` di atas semua tabel periode."""
+        columns = ", ".join(c.name for c in self.table.columns)
+        selects = " UNION ALL ".join(f"SELECT {columns} FROM {name}" for name in sorted(names))
+        return [
+            f"DROP VIEW IF EXISTS {self.table.name}",
+            f"CREATE VIEW {self.table.name} AS {selects}",
+        ]
+
+    # -------------------------------------------------
+    # OPERASI (conn = Connection sync dalam transaksi)
+    # -------------------------------------------------
+    def _relation_kind(self, conn) -> Optional[str]:
+        if conn.dialect.name == "postgresql":
+            row = conn.execute(
+                text(
+                    "SELECT relkind FROM pg_class "
+                    "WHERE relname = :name AND pg_table_is_visible(oid)"
+                ),
+                {"name": self.table.name},
+            ).first()
+            return {"p": "partitioned", "r": "table"}.get(row[0], row[0]) if row else None
+        row = conn.execute(
+            text("SELECT type FROM sqlite_master WHERE name = :name"),
+            {"name": self.table.name},
+        ).first()
+        return {"view": "partitioned", "table": "table"}.get(row[0], row[0]) if row else None
+
+    def create(self, conn, now: datetime):
+        """Buat layout (induk / view) dan partisi periode sekarang + `premake` ke depan."""
+        kind = self._relation_kind(conn)
+        if kind == "table":
+            raise RuntimeError(
+                f"{self.table.name} already exists as a plain table; migrate it "
+                "(rename, then copy rows into the partitioned layout) before "
+                "enabling partitioning"
+            )
+        if kind is None and conn.dialect.name == "postgresql":
+            for sql in self.parent_ddl(conn.dialect):
+                conn.execute(text(sql))
+        self.ensure(conn, now)
+
+    def partitions(self, conn) -> List[str]:
+        if conn.dialect.name == "postgresql":
+            rows = conn.execute(
+                text(
+                    "SELECT c.relname FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent "
+                    "WHERE p.relname = :name"
+                ),
+                {"name": self.table.name},
+            )
+        else:
+            rows = conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB :pattern"),
+                {"pattern": f"{self.table.name}_p[0-9]*"},
+            )
+        return sorted(name for (name,) in rows if self.parse(name))
+
+    def ensure(self, conn, now: datetime) -> List[str]:
+        """Pastikan partisi periode sekarang dan `premake` berikutnya ada. Return yang baru."""
+        existing = set(self.partitions(conn))
+        created = []
+        start = period_start(now, self.interval)
+        for _ in range(self.premake + 1):
+            name = self.name_for(start)
+            if name not in existing:
+                for sql in self.partition_ddl(conn.dialect, start):
+                    conn.execute(text(sql))
+                created.append(name)
+            start = next_period(start, self.interval)
+        if conn.dialect.name != "postgresql" and (created or self._relation_kind(conn) is None):
+            for sql in self.view_ddl(sorted(existing | set(created))):
+                conn.execute(text(sql))
+        return created
+
+    def drop_before(self, conn, cutoff: datetime, now: datetime, detach_only: bool = False) -> List[str]:
+        """
+        Partisi yang SELURUH periodenya < cutoff dilepas dari tabel induk /
+        view. Tabelnya di-drop, kecuali `detach_only` (PostgreSQL: tetap
+        dengan namanya; SQLite: di-rename `<nama>_detached`). Partisi periode
+        berjalan tidak pernah disentuh.
+        """
+        current = period_start(now, self.interval)
+        expired = []
+        for name in self.partitions(conn):
+            start, end = self.parse(name)
+            if end <= cutoff and start < current:
+                expired.append(name)
+        if not expired:
+            return []
+
+        if conn.dialect.name == "postgresql":
+            for name in expired:
+                conn.execute(text(f"ALTER TABLE {self.table.name} DETACH PARTITION {name}"))
+                if not detach_only:
+                    conn.execute(text(f"DROP TABLE {name}"))
+            return expired
+
+        remaining = [n for n in self.partitions(conn) if n not in expired]
+        for sql in self.view_ddl(remaining):
+            conn.execute(text(sql))
+        for name in expired:
+            if detach_only:
+                conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}_detached"))
+            else:
+                conn.execute(text(f"DROP TABLE {name}"))
+        return expired
+
+    def target(self, dialect_name: str, now: datetime) -> str:
+        """Nama tabel tujuan insert untuk row dengan waktu `now`."""
+        if dialect_name == "postgresql":
+            return self.table.name
+        return self.name_for(period_start(now, self.interval))
@@ -0,0 +1,239 @@
+import json
+import os
+import zlib
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+# Encoder cepat bersifat opsional: kalau tidak terinstall, fallback ke stdlib
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# =====================================================
+# CONFIG
+# =====================================================
+# json | orjson | msgpack | auto (pakai yang diiklankan consumer)
+MESSAGE_CODEC = os.getenv("MESSAGE_CODEC", "json")
+# none | zlib | zstd
+MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "none")
+# Payload lebih kecil dari ini tidak dikompres
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Iklan codec per replica kedaluwarsa setelah ini (di-refresh tiap TTL/3)
+CODEC_ADVERTISE_TTL_SECONDS = int(os.getenv("CODEC_ADVERTISE_TTL_SECONDS", "60"))
+
+# =====================================================
+# WIRE FORMAT
+# =====================================================
+# Pesan baru: 3 byte header [versi, format, kompresi] + body.
+# JSON tanpa kompresi tetap dikirim polos (tanpa header) supaya consumer
+# lama bisa membacanya; decode menerima keduanya.
+WIRE_VERSION = 1
+
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+# "auto" yang belum sempat dinegosiasi diperlakukan sebagai JSON
+_FORMATS = {
+    "json": FORMAT_JSON,
+    "orjson": FORMAT_JSON,
+    "auto": FORMAT_JSON,
+    "msgpack": FORMAT_MSGPACK,
+}
+_COMPRESSIONS = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def supported_codecs() -> List[str]:
+    """Codec dan kompresi yang bisa di-DECODE proses ini."""
+    codecs = ["json", "zlib"]
+    if msgpack is not None:
+        codecs.append("msgpack")
+    if zstandard is not None:
+        codecs.append("zstd")
+    return codecs
+
+
+def _dumps_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads_json(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _compress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(body)
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor().compress(body)
+    return body
+
+
+def _decompress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return body
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise CodecError("zstd message but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise CodecError(f"unknown compression id {compression}")
+
+
+# =====================================================
+# ENCODE / DECODE
+# =====================================================
+def encode(
+    obj: Any,
+    codec: Optional[str] = None,
+    compression: Optional[str] = None,
+    min_bytes: Optional[int] = None,
+) -> bytes:
+    codec = codec or MESSAGE_CODEC
+    compression = compression or MESSAGE_COMPRESSION
+    min_bytes = COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+
+    fmt = _FORMATS.get(codec)
+    if fmt is None:
+        raise CodecError(f"unknown codec {codec!r}")
+    if fmt == FORMAT_MSGPACK and msgpack is None:
+        fmt = FORMAT_JSON
+
+    body = msgpack.packb(obj) if fmt == FORMAT_MSGPACK else _dumps_json(obj)
+
+    comp = _COMPRESSIONS.get(compression, COMPRESSION_NONE)
+    if comp == COMPRESSION_ZSTD and zstandard is None:
+        comp = COMPRESSION_ZLIB
+    if comp != COMPRESSION_NONE and len(body) >= min_bytes:
+        body = _compress(body, comp)
+    else:
+        comp = COMPRESSION_NONE
+
+    if fmt == FORMAT_JSON and comp == COMPRESSION_NONE:
+        return body
+    return bytes((WIRE_VERSION, fmt, comp)) + body
+
+
+def decode(data: Union[str, bytes]) -> Any:
+    if isinstance(data, str):
+        # Client dengan decode_responses=True
+        data = data.encode("utf-8")
+
+    # Pesan lama (JSON polos tanpa header)
+    if not data or data[0] != WIRE_VERSION:
+        return _loads_json(data)
+
+    if len(data) < 3:
+        raise CodecError("truncated message header")
+    fmt, comp = data[1], data[2]
+    body = _decompress(data[3:], comp)
+
+    if fmt == FORMAT_JSON:
+        return _loads_json(body)
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise CodecError("msgpack message but msgpack is not installed")
+        return msgpack.unpackb(body)
+    raise CodecError(f"unknown format id {fmt}")
+
+
+# =====================================================
+# NEGOTIATION
+# =====================================================
+# Tiap replica consumer mengiklankan codec-nya di key sendiri
+# ("<channel>:codecs:<replica>", ber-TTL). Publisher memakai IRISAN semua
+# iklan, jadi saat rolling deploy replica lama tetap bisa membaca pesan.
+def codecs_key(channel: str, replica: str) -> str:
+    return f"{channel}:codecs:{replica}"
+
+
+def codecs_pattern(channel: str) -> str:
+    return f"{channel}:codecs:*"
+
+
+def advertisement() -> str:
+    return ",".join(supported_codecs())
+
+
+def common_codecs(advertised: Iterable[Optional[Union[str, bytes]]]) -> Optional[str]:
+    """Irisan iklan semua replica; None kalau belum ada iklan sama sekali."""
+    common = None
+    for value in advertised:
+        if value is None:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode()
+        codecs = set(value.split(","))
+        common = codecs if common is None else common & codecs
+    if common is None:
+        return None
+    return ",".join(sorted(common | {"json"}))
+
+
+def advertise(client, channel: str, replica: str, ttl: int = CODEC_ADVERTISE_TTL_SECONDS):
+    """Consumer mengumumkan codec yang bisa dia decode (dibaca publisher)."""
+    client.set(codecs_key(channel, replica), advertisement(), ex=ttl)
+
+
+def advertised_codecs(client, channel: str = "events") -> Optional[str]:
+    keys = list(client.scan_iter(match=codecs_pattern(channel)))
+    return common_codecs(client.mget(keys)) if keys else None
+
+
+def negotiate(
+    advertised: Optional[Union[str, bytes]],
+    compression: str = "none",
+) -> Tuple[str, str]:
+    """
+    Pilih codec terbaik yang didukung KEDUA sisi. Kompresi hanya yang
+    dikonfigurasi (`compression`); zstd turun ke zlib kalau sisi lain tidak
+    bisa zstd. Tanpa iklan (consumer versi lama) -> JSON tanpa kompresi.
+    """
+    if isinstance(advertised, bytes):
+        advertised = advertised.decode()
+    remote = set((advertised or "json").split(","))
+    both = remote & set(supported_codecs())
+
+    codec = "msgpack" if "msgpack" in both else "json"
+    if compression == "zstd" and "zstd" in both:
+        return codec, "zstd"
+    if compression in ("zstd", "zlib") and "zlib" in both:
+        return codec, "zlib"
+    return codec, "none"
+
+
+def choose(advertised: Optional[Union[str, bytes]]) -> Tuple[str, str]:
+    """Codec untuk producer: MESSAGE_CODEC=auto -> negosiasi, selain itu config."""
+    if MESSAGE_CODEC != "auto":
+        return MESSAGE_CODEC, MESSAGE_COMPRESSION
+    return negotiate(advertised, MESSAGE_COMPRESSION)
+
+
+def resolve(client, channel: str = "events") -> Tuple[str, str]:
+    try:
+        advertised = advertised_codecs(client, channel) if MESSAGE_CODEC == "auto" else None
+    except Exception:
+        advertised = None
+    return choose(advertised)
@@ -0,0 +1,62 @@
+import json
+import os
+from typing import Any, Dict, List
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Jendela dedup bersama di Redis untuk /publish (detik); 0 = mati.
+# Memori Redis dibatasi: setiap key hilang sendiri setelah TTL ini.
+EDGE_DEDUP_TTL_SECONDS = int(os.getenv("EDGE_DEDUP_TTL_SECONDS", "0"))
+# Prefix key (harus sama dengan publisher kalau publisher ikut klaim)
+EDGE_DEDUP_PREFIX = os.getenv("EDGE_DEDUP_PREFIX", "events:seen")
+
+
+def claim_key(prefix: str, event: Dict[str, Any]) -> str:
+    # JSON array: topic yang mengandung ":" tidak bisa bertabrakan
+    return f"{prefix}:" + json.dumps([event["topic"], event["event_id"]], separators=(",", ":"))
+
+
+class EdgeDedup:
+    """
+    Klaim (topic, event_id) dengan SET NX EX sebelum event dikirim ke broker.
+    Semua replica aggregator (dan publisher) memakai key yang sama, jadi
+    event yang sudah diterima siapa pun dalam jendela TTL tidak diteruskan
+    lagi. Semua klaim satu request = satu pipeline (satu round trip).
+    """
+
+    def __init__(self, ttl_seconds: int = EDGE_DEDUP_TTL_SECONDS, prefix: str = EDGE_DEDUP_PREFIX):
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _queue_claims(self, pipe, events):
+        for event in events:
+            pipe.set(claim_key(self.prefix, event), 1, nx=True, ex=self.ttl)
+
+    def claim(self, client, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return event yang berhasil diklaim (belum terlihat dalam jendela)."""
+        if not events:
+            return []
+        pipe = client.pipeline(transaction=False)
+        self._queue_claims(pipe, events)
+        return [e for e, ok in zip(events, pipe.execute()) if ok]
+
+    async def claim_async(self, client, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not events:
+            return []
+        pipe = client.pipeline(transaction=False)
+        self._queue_claims(pipe, events)
+        return [e for e, ok in zip(events, await pipe.execute()) if ok]
+
+    def release(self, client, events: List[Dict[str, Any]]):
+        """Lepas klaim (misal publish gagal) supaya retry client tidak dibuang."""
+        if events:
+            client.delete(*(claim_key(self.prefix, e) for e in events))
+
+    async def release_async(self, client, events: List[Dict[str, Any]]):
+        if events:
+            await client.delete(*(claim_key(self.prefix, e) for e in events))
@@ -0,0 +1,59 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from src.broker import codec
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Jumlah event maksimum dalam satu pesan envelope di broker
+ENVELOPE_MAX_EVENTS = int(os.getenv("PUBLISH_ENVELOPE_SIZE", "500"))
+ENVELOPE_TYPE = "batch"
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def dedupe_events(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Buang (topic, event_id) yang berulang di dalam satu request (yang pertama menang)."""
+    seen = set()
+    unique = []
+    for event in events:
+        key = (event["topic"], event["event_id"])
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(event)
+    return unique
+
+
+def pack_events(
+    events: List[Dict[str, Any]],
+    max_events: int = ENVELOPE_MAX_EVENTS,
+    codec_name: Optional[str] = None,
+    compression: Optional[str] = None,
+) -> List[bytes]:
+    """
+    Bungkus banyak event jadi sesedikit mungkin pesan broker.
+    Satu event tetap dikirim sebagai event biasa (tanpa envelope).
+    """
+    if len(events) == 1:
+        return [codec.encode(events[0], codec_name, compression)]
+
+    max_events = max(1, max_events)
+    return [
+        codec.encode(
+            {"type": ENVELOPE_TYPE, "events": events[i:i + max_events]},
+            codec_name,
+            compression,
+        )
+        for i in range(0, len(events), max_events)
+    ]
+
+
+def unpack_message(data: Union[str, bytes]) -> List[Dict[str, Any]]:
+    """Decode pesan broker: envelope batch ATAU satu event (format apa pun)."""
+    message = codec.decode(data)
+    if isinstance(message, dict) and message.get("type") == ENVELOPE_TYPE:
+        return message["events"]
+    return [message]
@@ -0,0 +1,55 @@
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Jumlah shard channel/stream. Publisher dan aggregator HARUS sama.
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+
+
+def _parse_shards(value: Optional[str]) -> Optional[List[int]]:
+    if not value:
+        return None
+    return sorted({int(part) for part in value.split(",") if part.strip()})
+
+# Shard yang dikonsumsi proses ini, misal "0,1" (default: semua shard).
+# Dipakai untuk membagi shard ke beberapa proses/replica.
+CONSUMER_SHARDS = _parse_shards(os.getenv("CONSUMER_SHARDS"))
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def shard_for(topic: str, shard_count: Optional[int] = None) -> int:
+    """
+    Hash stabil (CRC32 dari UTF-8 topic), sama di semua proses & bahasa.
+    Jangan pakai hash() bawaan Python: nilainya di-random per proses.
+    """
+    return zlib.crc32(topic.encode("utf-8")) % (shard_count or SHARD_COUNT)
+
+
+def shard_channel(base: str, shard: int, shard_count: Optional[int] = None) -> str:
+    # Satu shard -> nama lama ("events") supaya kompatibel
+    if (shard_count or SHARD_COUNT) == 1:
+        return base
+    return f"{base}:{shard}"
+
+
+def group_by_shard(
+    events: Iterable[Dict[str, Any]],
+    shard_count: Optional[int] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Kelompokkan event per shard; urutan event di dalam topic tetap."""
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for event in events:
+        groups.setdefault(shard_for(event["topic"], shard_count), []).append(event)
+    return groups
+
+
+def consumer_shards(shard_count: Optional[int] = None) -> List[int]:
+    shard_count = shard_count or SHARD_COUNT
+    if CONSUMER_SHARDS is None:
+        return list(range(shard_count))
+    return [s for s in CONSUMER_SHARDS if s < shard_count]
@@ -0,0 +1,311 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.api import metrics
+
+# =====================================================
+# CONFIG
+# =====================================================
+# Direktori spool /publish; kosong = spool mati (publish langsung ke broker)
+PUBLISH_SPOOL_DIR = os.getenv("PUBLISH_SPOOL_DIR", "")
+PUBLISH_SPOOL_SEGMENT_BYTES = int(os.getenv("PUBLISH_SPOOL_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Batas total segment di disk; penuh -> /publish menolak (503)
+PUBLISH_SPOOL_MAX_BYTES = int(os.getenv("PUBLISH_SPOOL_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Group commit: fsync pertama menunggu selama ini supaya request lain ikut
+PUBLISH_SPOOL_FSYNC_MS = float(os.getenv("PUBLISH_SPOOL_FSYNC_MS", "2"))
+# Event per kiriman forwarder ke broker
+PUBLISH_SPOOL_BATCH_EVENTS = int(os.getenv("PUBLISH_SPOOL_BATCH_EVENTS", "5000"))
+PUBLISH_SPOOL_RETRY_SECONDS = float(os.getenv("PUBLISH_SPOOL_RETRY_SECONDS", "1"))
+
+# Header record: panjang body, crc32 body
+RECORD_HEADER = struct.Struct("<II")
+CHECKPOINT_FILE = "checkpoint.json"
+
+SPOOL_FSYNCS = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_publish_spool_fsyncs_total",
+    "fsync calls of the publish spool (one per group commit).",
+))
+SPOOL_RECORDS = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_publish_spool_records_total",
+    "Publish requests appended to the spool.",
+))
+SPOOL_CORRUPT = metrics.REGISTRY.register(metrics.Counter(
+    "aggregator_publish_spool_corrupt_segments_total",
+    "Sealed spool segments whose tail failed the checksum (rest of segment skipped).",
+))
+SPOOL_BYTES = metrics.REGISTRY.register(metrics.Gauge(
+    "aggregator_publish_spool_bytes",
+    "Bytes held in spool segments (not yet forwarded and deleted).",
+))
+
+
+class SpoolFull(Exception):
+    """Spool mencapai PUBLISH_SPOOL_MAX_BYTES."""
+
+
+class SpoolBatch(NamedTuple):
+    events: List[Dict[str, Any]]
+    # Posisi (segment, offset) setelah batch ini; diberikan ke commit()
+    position: Tuple[int, int]
+    # Ditulis proses sebelumnya (mungkin sudah terkirim sebagian sebelum crash)
+    replayed: bool
+
+
+# =====================================================
+# SPOOL
+# =====================================================
+class PublishSpool:
+    """
+    Write-ahead log lokal untuk /publish. Satu request = satu record
+    (panjang + crc32 + JSON event) yang di-append ke segment aktif, lalu
+    request menunggu fsync. fsync dipakai bersama (group commit): satu
+    request menjadi leader, menunggu `fsync_ms`, lalu satu fsync menutup
+    semua record yang sudah ditulis. Forwarder membaca segment lewat mmap
+    mulai dari checkpoint, mengirim ke broker, lalu commit(); segment yang
+    sudah terkirim seluruhnya dihapus. Saat start, semua yang belum
+    terkirim dibaca ulang (at-least-once; dedup di worker menangani ulangan).
+    """
+
+    def __init__(
+        self,
+        directory: str = PUBLISH_SPOOL_DIR,
+        segment_bytes: int = PUBLISH_SPOOL_SEGMENT_BYTES,
+        max_bytes: int = PUBLISH_SPOOL_MAX_BYTES,
+        fsync_ms: float = PUBLISH_SPOOL_FSYNC_MS,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_ms = fsync_ms
+        self._lock = threading.Lock()
+        self._data = threading.Condition(self._lock)
+        self._sync_cond = threading.Condition()
+        self._fd: Optional[int] = None
+        self._active = 0
+        self._sizes: Dict[int, int] = {}
+        self._position: Tuple[int, int] = (0, 0)
+        # Record sebelum posisi ini berasal dari proses sebelumnya
+        self._replay_until: Tuple[int, int] = (0, 0)
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    @property
+    def is_open(self) -> bool:
+        return self._fd is not None
+
+    # -------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------
+    def open(self):
+        """Muat checkpoint, buang segment yang sudah terkirim, mulai segment baru."""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = sorted(
+            int(name[len("segment-"):-len(".log")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+        position = self._load_checkpoint()
+        if position is None:
+            position = (segments[0], 0) if segments else (1, 0)
+        for seq in segments:
+            if seq < position[0]:
+                os.remove(self._segment_path(seq))
+            else:
+                self._sizes[seq] = os.path.getsize(self._segment_path(seq))
+        self._position = position
+        if self._sizes:
+            last = max(self._sizes)
+            self._replay_until = (last, self._sizes[last])
+        # Ekor segment lama bisa sobek (crash saat menulis): tidak pernah
+        # di-append lagi, pembaca berhenti di record rusak pertama
+        self._open_segment(max(segments + [position[0] - 1]) + 1)
+        SPOOL_BYTES.set_function(lambda: {(): self.size()})
+        pending = sum(self._sizes.values()) - position[1]
+        if pending > 0:
+            print(f"📼 Replaying {pending} bytes from publish spool {self.directory}")
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+            self._data.notify_all()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:020d}.log")
+
+    def _open_segment(self, seq: int):
+        self._fd = os.open(self._segment_path(seq), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._active = seq
+        self._sizes[seq] = os.fstat(self._fd).st_size
+        # Entry direktori segment baru juga harus durable
+        self._fsync_dir()
+
+    def _fsync_dir(self):
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _load_checkpoint(self) -> Optional[Tuple[int, int]]:
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE)) as f:
+                data = json.load(f)
+            return int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    # -------------------------------------------------
+    # TULIS (dipanggil request /publish, dari thread)
+    # -------------------------------------------------
+    def append(self, events: List[Dict[str, Any]]):
+        """Return setelah record durable (fsync). SpoolFull kalau batas tercapai."""
+        body = json.dumps(events, separators=(",", ":")).encode("utf-8")
+        record = RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+        with self._lock:
+            if self._fd is None:
+                raise RuntimeError("publish spool is not open")
+            if self.max_bytes and self.size() + len(record) > self.max_bytes:
+                raise SpoolFull(f"publish spool holds {self.size()} bytes")
+            if self._sizes[self._active] and self._sizes[self._active] + len(record) > self.segment_bytes:
+                self._roll()
+            os.write(self._fd, record)
+            self._sizes[self._active] += len(record)
+            self._written += 1
+            seq = self._written
+            self._data.notify_all()
+        SPOOL_RECORDS.inc()
+        self._wait_synced(seq)
+
+    def _roll(self):
+        # Record di segment lama harus durable sebelum fd ditutup
+        os.fsync(self._fd)
+        SPOOL_FSYNCS.inc()
+        os.close(self._fd)
+        self._open_segment(self._active + 1)
+
+    def _wait_synced(self, seq: int):
+        with self._sync_cond:
+            while self._synced < seq and self._syncing:
+                self._sync_cond.wait()
+            if self._synced >= seq:
+                return
+            self._syncing = True
+        # Leader: tunggu sebentar supaya request lain ikut satu fsync.
+        # Kalau fsync gagal, follower yang bangun menjadi leader berikutnya.
+        target = self._synced
+        try:
+            if self.fsync_ms > 0:
+                time.sleep(self.fsync_ms / 1000)
+            with self._lock:
+                written = self._written
+                os.fsync(self._fd)
+            target = written
+            SPOOL_FSYNCS.inc()
+        finally:
+            with self._sync_cond:
+                self._synced = max(self._synced, target)
+                self._syncing = False
+                self._sync_cond.notify_all()
+
+    # -------------------------------------------------
+    # BACA (forwarder)
+    # -------------------------------------------------
+    def wait_for_data(self, timeout: float) -> bool:
+        """Tunggu (maks `timeout`) sampai ada record yang belum di-forward."""
+        with self._lock:
+            if not self._has_pending():
+                self._data.wait(timeout)
+            return self._has_pending()
+
+    def _has_pending(self) -> bool:
+        seq, offset = self._position
+        return any(size > (offset if s == seq else 0) for s, size in self._sizes.items() if s >= seq)
+
+    def read_batch(self, max_events: int = PUBLISH_SPOOL_BATCH_EVENTS) -> Optional[SpoolBatch]:
+        """Record berikutnya mulai checkpoint, sampai ~`max_events` event. None kalau kosong."""
+        with self._lock:
+            segments = sorted(s for s in self._sizes if s >= self._position[0])
+            active = self._active
+        seq, offset = self._position
+        events: List[Dict[str, Any]] = []
+        for segment in segments:
+            if segment != seq:
+                seq, offset = segment, 0
+            offset, complete = self._read_segment(segment, offset, events, max_events, segment != active)
+            if not complete:
+                break
+        if not events and (seq, offset) == self._position:
+            return None
+        return SpoolBatch(events, (seq, offset), self._position < self._replay_until)
+
+    def _read_segment(self, seq, offset, events, max_events, sealed) -> Tuple[int, bool]:
+        """Tambah event dari segment ke `events`. Return (offset baru, segment habis?)."""
+        with open(self._segment_path(seq), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= offset:
+                return offset, sealed
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                while len(events) < max_events and offset + RECORD_HEADER.size <= size:
+                    length, crc = RECORD_HEADER.unpack_from(view, offset)
+                    start = offset + RECORD_HEADER.size
+                    body = view[start:start + length]
+                    if start + length > size or zlib.crc32(body) != crc:
+                        if not sealed:
+                            # Segment aktif: record mungkin belum selesai ditulis
+                            return offset, False
+                        SPOOL_CORRUPT.inc()
+                        print(f"⚠️ Publish spool segment {seq}: bad record at {offset}, skipping rest")
+                        return size, True
+                    events.extend(json.loads(body))
+                    offset = start + length
+        return offset, sealed and offset >= size
+
+    def commit(self, position: Tuple[int, int]):
+        """Batch sampai `position` sudah di broker: simpan checkpoint, hapus segment lama."""
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        # Rename harus durable SEBELUM segment dihapus: kalau tidak, setelah
+        # crash checkpoint lama bisa menunjuk segment yang sudah tidak ada
+        self._fsync_dir()
+        with self._lock:
+            self._position = position
+            for seq in [s for s in self._sizes if s < position[0] and s != self._active]:
+                os.remove(self._segment_path(seq))
+                del self._sizes[seq]
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            seq, offset = self._position
+            pending = sum(size for s, size in self._sizes.items() if s >= seq) - offset
+            return {
+                "enabled": True,
+                "segments": len(self._sizes),
+                "bytes": self.size(),
+                "pending_bytes": max(0, pending),
+            }
+
+
+publish_spool = PublishSpool()
@@ -0,0 +1,258 @@
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+# =====================================================
+# CONFIG
+# =====================================================
+# "pubsub" (default, fire-and-forget) atau "streams" (consumer group + ack)
+BROKER_TRANSPORT = os.getenv("BROKER_TRANSPORT", "pubsub")
+
+STREAM_GROUP = os.getenv("STREAM_GROUP", "aggregator")
+STREAM_CONSUMER = os.getenv(
+    "STREAM_CONSUMER", f"{socket.gethostname()}-{os.getpid()}"
+)
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "1000000"))
+STREAM_READ_COUNT = int(os.getenv("STREAM_READ_COUNT", "500"))
+STREAM_BLOCK_MS = int(os.getenv("STREAM_BLOCK_MS", "1000"))
+STREAM_CLAIM_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", "60000"))
+# Jumlah consumer thread per proses (semua dalam group yang sama)
+STREAM_CONSUMERS = int(os.getenv("STREAM_CONSUMERS", "1"))
+
+# (ack token, isi pesan). Token None berarti tidak perlu di-ack.
+Entry = Tuple[Optional[str], Any]
+
+
+def _data(fields) -> Any:
+    # Key field berupa bytes kalau client tidak memakai decode_responses
+    return fields.get(b"data", fields.get("data"))
+
+
+# =====================================================
+# PUB/SUB
+# =====================================================
+class PubSubTransport:
+    """Redis PUBLISH/SUBSCRIBE. Pesan yang terkirim saat worker mati hilang."""
+
+    def __init__(self, client, channel: str = "events"):
+        self.client = client
+        self.channel = channel
+
+    def send(self, messages: List[bytes]):
+        self.send_batches({self.channel: messages})
+
+    def send_batches(self, batches: Dict[str, List[bytes]]):
+        """Kirim pesan ke beberapa channel (shard) dalam SATU pipeline."""
+        pipe = self.client.pipeline(transaction=False)
+        for channel, messages in batches.items():
+            for message in messages:
+                pipe.publish(channel, message)
+        pipe.execute()
+
+
+# =====================================================
+# STREAMS
+# =====================================================
+class StreamTransport:
+    """
+    Redis Streams dengan consumer group.
+
+    - `send` memakai XADD dengan MAXLEN ~ supaya stream tidak tumbuh terus.
+    - `read` memakai XREADGROUP COUNT, jadi satu panggilan = satu batch.
+    - Entry baru di-`ack` SETELAH commit ke DB; entry yang tidak pernah
+      di-ack (consumer mati) diambil alih lewat `reclaim` (XAUTOCLAIM).
+    """
+
+    def __init__(
+        self,
+        client,
+        stream: str = "events",
+        group: str = STREAM_GROUP,
+        consumer: str = STREAM_CONSUMER,
+        maxlen: int = STREAM_MAXLEN,
+        count: int = STREAM_READ_COUNT,
+        block_ms: int = STREAM_BLOCK_MS,
+        claim_idle_ms: int = STREAM_CLAIM_IDLE_MS,
+    ):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self._last_claim = 0.0
+
+    def send(self, messages: List[bytes]):
+        self.send_batches({self.stream: messages})
+
+    def send_batches(self, batches: Dict[str, List[bytes]]):
+        """XADD ke beberapa stream (shard) dalam SATU pipeline."""
+        pipe = self.client.pipeline(transaction=False)
+        for stream, messages in batches.items():
+            for message in messages:
+                pipe.xadd(
+                    stream,
+                    {"data": message},
+                    maxlen=self.maxlen,
+                    approximate=True,
+                )
+        pipe.execute()
+
+    def ensure_group(self):
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            # Group sudah ada (dibuat replica lain) -> aman
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self) -> List[Entry]:
+        response = self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=self.count,
+            block=self.block_ms,
+        )
+        return self._entries(response)
+
+    @staticmethod
+    def _entries(response) -> List[Entry]:
+        return [
+            (entry_id, _data(fields))
+            for _, entries in response or []
+            for entry_id, fields in entries
+        ]
+
+    def _claim_due(self, force: bool) -> bool:
+        now = time.monotonic()
+        if not force and (now - self._last_claim) * 1000 < self.claim_idle_ms / 2:
+            return False
+        self._last_claim = now
+        return True
+
+    def reclaim(self, force: bool = False) -> List[Entry]:
+        """
+        Ambil alih entry pending milik consumer lain yang sudah idle lebih
+        dari `claim_idle_ms`. Dijalankan paling sering setengah periode idle.
+        """
+        if not self._claim_due(force):
+            return []
+
+        claimed: List[Entry] = []
+        start_id = "0-0"
+        while True:
+            response = self.client.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=self.claim_idle_ms,
+                start_id=start_id,
+                count=self.count,
+            )
+            start_id, entries = response[0], response[1]
+            # Entry yang sudah ter-trim MAXLEN tidak punya isi -> langsung ack
+            self.ack([entry_id for entry_id, fields in entries if not fields])
+            claimed.extend(
+                (entry_id, _data(fields))
+                for entry_id, fields in entries
+                if fields
+            )
+            if start_id in ("0-0", b"0-0") or len(claimed) >= self.count:
+                return claimed
+
+    def ack(self, entry_ids: List[str]):
+        if entry_ids:
+            self.client.xack(self.stream, self.group, *entry_ids)
+
+
+# =====================================================
+# ASYNC (redis.asyncio)
+# =====================================================
+class AsyncPubSubTransport(PubSubTransport):
+    async def send(self, messages: List[bytes]):
+        await self.send_batches({self.channel: messages})
+
+    async def send_batches(self, batches: Dict[str, List[bytes]]):
+        pipe = self.client.pipeline(transaction=False)
+        for channel, messages in batches.items():
+            for message in messages:
+                pipe.publish(channel, message)
+        await pipe.execute()
+
+
+class AsyncStreamTransport(StreamTransport):
+    """StreamTransport untuk client redis.asyncio (semua method di-await)."""
+
+    async def send(self, messages: List[bytes]):
+        await self.send_batches({self.stream: messages})
+
+    async def send_batches(self, batches: Dict[str, List[bytes]]):
+        pipe = self.client.pipeline(transaction=False)
+        for stream, messages in batches.items():
+            for message in messages:
+                pipe.xadd(stream, {"data": message}, maxlen=self.maxlen, approximate=True)
+        await pipe.execute()
+
+    async def ensure_group(self):
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self) -> List[Entry]:
+        response = await self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=self.count,
+            block=self.block_ms,
+        )
+        return self._entries(response)
+
+    async def reclaim(self, force: bool = False) -> List[Entry]:
+        if not self._claim_due(force):
+            return []
+
+        claimed: List[Entry] = []
+        start_id = "0-0"
+        while True:
+            response = await self.client.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=self.claim_idle_ms,
+                start_id=start_id,
+                count=self.count,
+            )
+            start_id, entries = response[0], response[1]
+            await self.ack([entry_id for entry_id, fields in entries if not fields])
+            claimed.extend(
+                (entry_id, _data(fields))
+                for entry_id, fields in entries
+                if fields
+            )
+            if start_id in ("0-0", b"0-0") or len(claimed) >= self.count:
+                return claimed
+
+    async def ack(self, entry_ids: List[str]):
+        if entry_ids:
+            await self.client.xack(self.stream, self.group, *entry_ids)
+
+
+def make_async_transport(client, channel: str = "events", kind: str = BROKER_TRANSPORT):
+    if kind == "streams":
+        return AsyncStreamTransport(client, stream=channel)
+    return AsyncPubSubTransport(client, channel)
+
+
+def make_transport(client, channel: str = "events", kind: str = BROKER_TRANSPORT):
+    if kind == "streams":
+        return StreamTransport(client, stream=channel)
+    return PubSubTransport(client, channel)
@@ -1,14 +1,20 @@
-from fastapi import FastAPI, HTTPException
-from typing import Optional, List, Union, Dict, Any
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, List, Union, Dict, Any, Tuple
+from collections import Counter
 from contextlib import asynccontextmanager
 from fastapi.encoders import jsonable_encoder
 import os
 import json
+import asyncio
 import threading
+import time
 import redis
+import redis.asyncio
 import uvicorn
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from datetime import datetime, timezone
 
 # =====================================================
 # CONFIG
@@ -21,11 +27,88 @@ except ImportError:
     pass
 
 from src.api.worker.processor.db import (
-    insert_event,
+    BUCKET_GRAINS,
+    EXTRA_FIELDS,
+    bucket_start,
+    event_partitions,
+    insert_events_keys,
+    run_partition_maintenance,
+    get_timeseries,
+    to_utc_naive,
+    insert_events,
     get_events,
+    iter_events,
     get_stats,
     init_db,
 )
+from src.api.worker.processor.async_db import (
+    insert_events_async,
+    insert_events_keys_async,
+    get_events_async,
+    iter_events_async,
+    get_stats_async,
+    get_timeseries_async,
+    init_db_async,
+    run_partition_maintenance_async,
+)
+from src.api import metrics
+from src.api.cache import etag_matches, make_etag, response_cache
+from src.api.worker.batcher import AsyncEventBatcher, EventBatcher
+from src.api.worker.processor.archive import (
+    ARCHIVE_INTERVAL_SECONDS,
+    archive_closed_ranges,
+    event_archive,
+    merge_chunks,
+    merge_chunks_async,
+)
+from src.api.worker.processor.bulk import (
+    BULK_CHUNK_SIZE,
+    BulkFormatError,
+    BulkLoader,
+    BulkRowError,
+    CsvRowParser,
+    parse_ndjson_line,
+)
+from src.api.worker.dedup import DedupFilter
+from src.broker import codec
+from src.broker.edge_dedup import EdgeDedup
+from src.broker.envelope import dedupe_events, pack_events, unpack_message
+from src.broker.sharding import consumer_shards, group_by_shard, shard_channel
+from src.broker.spool import (
+    PUBLISH_SPOOL_BATCH_EVENTS,
+    PUBLISH_SPOOL_RETRY_SECONDS,
+    SpoolFull,
+    publish_spool,
+)
+from src.broker.transport import (
+    BROKER_TRANSPORT,
+    STREAM_CONSUMER,
+    STREAM_CONSUMERS,
+    STREAM_GROUP,
+    AsyncStreamTransport,
+    StreamTransport,
+    make_async_transport,
+    make_transport,
+)
+
+# "sync" (threadpool + redis-py + engine sync) atau
+# "async" (redis.asyncio + create_async_engine + consumer asyncio task)
+AGGREGATOR_MODE = os.getenv("AGGREGATOR_MODE", "sync")
+
+STARTED_AT = time.monotonic()
+EVENTS_PAGE_LIMIT = int(os.getenv("EVENTS_PAGE_LIMIT", "1000"))
+EVENTS_MAX_LIMIT = int(os.getenv("EVENTS_MAX_LIMIT", "10000"))
+# Batas jumlah bucket per request /stats/timeseries (default: 1 minggu per menit)
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "10080"))
+TIMESERIES_DEFAULT_BUCKETS = 60
+# Deadline POST /publish?ack=persisted
+PUBLISH_ACK_TIMEOUT_MS = int(os.getenv("PUBLISH_ACK_TIMEOUT_MS", "5000"))
+# Baris NDJSON per validasi + kiriman broker di POST /publish/stream
+PUBLISH_STREAM_CHUNK_SIZE = int(os.getenv("PUBLISH_STREAM_CHUNK_SIZE", "1000"))
+# Jumlah pesan error per baris yang dikembalikan (sisanya hanya dihitung)
+PUBLISH_STREAM_MAX_ERRORS = 100
+# Interval maintenance partisi (buat partisi ke depan, retensi, pangkas key dedup)
+PARTITION_MAINTENANCE_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
 
 # =====================================================
 # EVENT SCHEMA (Updated)
@@ -37,6 +120,44 @@ class EventSchema(BaseModel):
     source: Optional[str] = "unknown"
     payload: Optional[Dict[str, Any]] = None 
 
+# Satu validator untuk satu chunk (list), bukan satu model per request/Union
+EVENT_LIST_ADAPTER = TypeAdapter(List[EventSchema])
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+def validate_lines(lines: List[Tuple[int, bytes]]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+    """
+    Chunk NDJSON [(nomor baris, bytes)] -> (event valid sebagai dict JSON,
+    [(nomor baris, error)]). JSON di-parse per baris, jadi baris rusak tidak
+    menggeser baris lain; validasi schema satu panggilan untuk seluruh chunk.
+    """
+    parsed, line_nos, errors = [], [], []
+    for line_no, raw in lines:
+        try:
+            parsed.append(_json_loads(raw))
+            line_nos.append(line_no)
+        except ValueError as e:
+            errors.append((line_no, f"invalid JSON: {e}"))
+
+    try:
+        models = EVENT_LIST_ADAPTER.validate_python(parsed)
+    except ValidationError as e:
+        # Error per index list -> per baris; sisanya divalidasi ulang sekali
+        bad: Dict[int, str] = {}
+        for error in e.errors():
+            index, *field = error["loc"]
+            message = f"{'.'.join(map(str, field))}: {error['msg']}" if field else error["msg"]
+            bad.setdefault(index, message)
+        errors.extend((line_nos[i], message) for i, message in bad.items())
+        models = EVENT_LIST_ADAPTER.validate_python(
+            [p for i, p in enumerate(parsed) if i not in bad]
+        )
+    errors.sort()
+    return EVENT_LIST_ADAPTER.dump_python(models, mode="json"), errors
+
 # =====================================================
 # REDIS SETUP
 # =====================================================
@@ -44,43 +165,423 @@ REDIS_URL = os.getenv("BROKER_URL", "redis://localhost:6379")
 CHANNEL_NAME = "events"
 redis_client = None
 
-# Init Redis (Hanya jika bukan test, atau nanti di-override oleh test)
-if not os.getenv("PYTEST_CURRENT_TEST"):
+# Init Redis sync (Hanya jika bukan test, atau nanti di-override oleh test).
+# Mode async memakai async_redis_client saja.
+if AGGREGATOR_MODE != "async" and not os.getenv("PYTEST_CURRENT_TEST"):
     try:
-        redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        # Tanpa decode_responses: pesan bisa biner (msgpack / terkompresi)
+        redis_client = redis.Redis.from_url(REDIS_URL)
         redis_client.ping()
     except Exception as e:
         print(f"⚠️ Redis not connected: {e}")
 
+# (codec, kompresi) yang dipakai /publish; ditentukan saat startup
+publish_codec = (codec.MESSAGE_CODEC, codec.MESSAGE_COMPRESSION)
+
+# Client redis.asyncio dibuat di lifespan (butuh event loop) saat mode async
+async_redis_client = None
+
+def create_async_redis():
+    return redis.asyncio.Redis.from_url(REDIS_URL)
+
 # =====================================================
 # WORKER
 # =====================================================
-def redis_worker():
+dedup_filter = DedupFilter()
+# Dedup bersama antar replica di /publish (EDGE_DEDUP_TTL_SECONDS, default mati)
+edge_dedup = EdgeDedup()
+
+# Batcher yang sedang jalan (dibaca gauge queue depth saat scrape)
+active_batchers: List[Union[EventBatcher, AsyncEventBatcher]] = []
+
+def decode_message(data):
+    """unpack_message + metrics (waktu decode, pesan rusak)."""
+    started = time.perf_counter()
+    try:
+        events = unpack_message(data)
+    except Exception:
+        metrics.EVENTS_FAILED.inc("unknown", "decode")
+        raise
+    metrics.DECODE_SECONDS.observe(time.perf_counter() - started)
+    return events
+
+def _is_valid_event(event) -> bool:
+    return (
+        isinstance(event, dict)
+        and all(isinstance(event.get(k), str) and event[k] for k in ("topic", "event_id"))
+        and isinstance(event.get("payload"), (dict, type(None)))
+    )
+
+def valid_events(events):
+    """Buang event tanpa topic/event_id (atau payload bukan object) sebelum masuk batch."""
+    valid = [e for e in events if _is_valid_event(e)]
+    if len(valid) < len(events):
+        metrics.EVENTS_FAILED.inc("unknown", "invalid", amount=len(events) - len(valid))
+        print(f"❌ Dropping {len(events) - len(valid)} invalid events")
+    return valid
+
+def filter_known(events):
+    """Buang duplikat yang sudah dikenal DedupFilter, catat per topic."""
+    metrics.BATCH_SIZE.observe(len(events))
+    fresh = dedup_filter.filter(events)
+    if len(fresh) < len(events):
+        known = Counter(e["topic"] for e in events) - Counter(e["topic"] for e in fresh)
+        metrics.EVENTS_DEDUPLICATED.inc_many(metrics.count_by_topic(known.elements(), "filter"))
+    return fresh
+
+def count_failed(events, reason: str):
+    metrics.EVENTS_FAILED.inc_many(
+        metrics.count_by_topic((e["topic"] for e in events), reason)
+    )
+
+def persist_events(events):
+    """Duplikat yang sudah dikenal dibuang di memori, sisanya ke DB (satu transaksi)."""
+    fresh = filter_known(events)
+    try:
+        inserted = insert_events(fresh)
+    except Exception:
+        count_failed(fresh, "insert")
+        raise
+    dedup_filter.remember(fresh, inserted)
+    return inserted
+
+def decode_pubsub(message) -> List[Dict[str, Any]]:
+    """
+    Satu pesan bisa berisi satu event atau envelope batch; event rusak
+    dibuang di sini supaya tidak menggagalkan batch. Pesan yang tidak bisa
+    di-decode sudah tercatat (reason="decode") -> cukup di-log.
+    """
+    try:
+        return valid_events(decode_message(message["data"]))
+    except Exception as e:
+        print(f"❌ Dropping undecodable message on {message.get('channel')}: {e}")
+        return []
+
+def redis_worker(batcher: EventBatcher, channel: str = CHANNEL_NAME):
     if not redis_client: return
     pubsub = redis_client.pubsub()
-    pubsub.subscribe(CHANNEL_NAME)
+    pubsub.subscribe(channel)
     
     for message in pubsub.listen():
         if message["type"] == "message":
+            events = decode_pubsub(message)
             try:
-                event = json.loads(message["data"])
-                insert_event(event["topic"], event["event_id"])
-            except Exception:
-                pass
+                for i, event in enumerate(events):
+                    # Insert dikumpulkan per batch, bukan satu transaksi per event
+                    batcher.add(event)
+            except Exception as e:
+                count_failed(events[i:], "enqueue")
+                print(f"❌ Failed to enqueue {len(events) - i} events: {e}")
+
+def decode_entries(entries):
+    """Entry stream -> (event, semua entry id yang boleh di-ack setelah commit)."""
+    events, entry_ids = [], []
+    for entry_id, data in entries:
+        entry_ids.append(entry_id)
+        try:
+            # Event tanpa field wajib dibuang; entry-nya tetap di-ack
+            events.extend(valid_events(decode_message(data)))
+        except Exception as e:
+            # Pesan rusak tidak akan pernah berhasil -> tetap di-ack
+            print(f"❌ Dropping undecodable stream entry {entry_id}: {e}")
+    return events, entry_ids
 
-def start_worker_thread():
-    t = threading.Thread(target=redis_worker, daemon=True)
-    t.start()
+def process_stream_entries(transport: StreamTransport, entries):
+    """Decode -> satu transaksi insert -> ack. Kalau commit gagal, tidak di-ack."""
+    events, entry_ids = decode_entries(entries)
+    persist_events(events)
+    transport.ack(entry_ids)
+
+def stream_worker(consumer_name: str, stop_event: threading.Event, stream: str = CHANNEL_NAME):
+    if not redis_client: return
+    transport = StreamTransport(redis_client, stream=stream, consumer=consumer_name)
+    transport.ensure_group()
+
+    while not stop_event.is_set():
+        try:
+            # Entry milik consumer yang mati didahulukan, baru entry baru
+            entries = transport.reclaim() or transport.read()
+            if entries:
+                process_stream_entries(transport, entries)
+        except Exception as e:
+            print(f"❌ Stream worker {consumer_name} error: {e}")
+            time.sleep(1)
+
+def start_worker_threads(stop_event: threading.Event) -> List[EventBatcher]:
+    """
+    Satu consumer (atau STREAM_CONSUMERS consumer) per shard.
+    Satu shard selalu dibaca berurutan, jadi urutan event per topic terjaga.
+    Return batcher yang harus di-close saat shutdown.
+    """
+    batchers = []
+    for shard in consumer_shards():
+        channel = shard_channel(CHANNEL_NAME, shard)
+
+        if BROKER_TRANSPORT == "streams":
+            for i in range(STREAM_CONSUMERS):
+                t = threading.Thread(
+                    target=stream_worker,
+                    args=(f"{STREAM_CONSUMER}-{shard}-{i}", stop_event, channel),
+                    daemon=True,
+                )
+                t.start()
+            continue
+
+        batcher = EventBatcher(flush_fn=persist_events, name=channel)
+        batcher.start()
+        batchers.append(batcher)
+        t = threading.Thread(target=redis_worker, args=(batcher, channel), daemon=True)
+        t.start()
+    return batchers
+
+# =====================================================
+# WORKER (ASYNC MODE)
+# =====================================================
+async def persist_events_async(events):
+    fresh = filter_known(events)
+    try:
+        inserted = await insert_events_async(fresh)
+    except Exception:
+        count_failed(fresh, "insert")
+        raise
+    dedup_filter.remember(fresh, inserted)
+    return inserted
+
+async def async_redis_worker(client, batcher: AsyncEventBatcher, channel: str = CHANNEL_NAME):
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+
+    async for message in pubsub.listen():
+        if message["type"] == "message":
+            events = decode_pubsub(message)
+            try:
+                for i, event in enumerate(events):
+                    await batcher.add(event)
+            except Exception as e:
+                count_failed(events[i:], "enqueue")
+                print(f"❌ Failed to enqueue {len(events) - i} events: {e}")
+
+async def async_stream_worker(client, consumer_name: str, stream: str = CHANNEL_NAME):
+    transport = AsyncStreamTransport(client, stream=stream, consumer=consumer_name)
+    await transport.ensure_group()
+
+    while True:
+        try:
+            entries = await transport.reclaim() or await transport.read()
+            if entries:
+                events, entry_ids = decode_entries(entries)
+                await persist_events_async(events)
+                await transport.ack(entry_ids)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Stream worker {consumer_name} error: {e}")
+            await asyncio.sleep(1)
+
+def start_async_workers(client):
+    """Versi asyncio dari start_worker_threads: satu task per shard."""
+    tasks, batchers = [], []
+    for shard in consumer_shards():
+        channel = shard_channel(CHANNEL_NAME, shard)
+
+        if BROKER_TRANSPORT == "streams":
+            tasks.extend(
+                asyncio.create_task(
+                    async_stream_worker(client, f"{STREAM_CONSUMER}-{shard}-{i}", channel)
+                )
+                for i in range(STREAM_CONSUMERS)
+            )
+            continue
+
+        batcher = AsyncEventBatcher(flush_fn=persist_events_async, name=channel)
+        batcher.start()
+        batchers.append(batcher)
+        tasks.append(asyncio.create_task(async_redis_worker(client, batcher, channel)))
+    return tasks, batchers
+
+# =====================================================
+# METRICS (GAUGE DIHITUNG SAAT SCRAPE)
+# =====================================================
+def queue_depth():
+    return {(b.name,): b.pending() for b in active_batchers}
+
+def consumer_lag():
+    """
+    Streams: entry pending (terkirim, belum di-ack) dan belum terkirim ke
+    group. Pub/sub tidak punya backlog di broker, jadi tidak dilaporkan.
+    """
+    if BROKER_TRANSPORT != "streams" or not redis_client:
+        return {}
+    values = {}
+    for shard in consumer_shards():
+        stream = shard_channel(CHANNEL_NAME, shard)
+        for group in redis_client.xinfo_groups(stream):
+            name = group["name"]
+            if isinstance(name, bytes):
+                name = name.decode()
+            if name != STREAM_GROUP:
+                continue
+            values[(stream, "pending")] = group["pending"]
+            # Field "lag" baru ada sejak Redis 7
+            if group.get("lag") is not None:
+                values[(stream, "undelivered")] = group["lag"]
+    return values
+
+metrics.QUEUE_DEPTH.set_function(queue_depth)
+metrics.CONSUMER_LAG.set_function(consumer_lag)
 
 # =====================================================
 # LIFESPAN
 # =====================================================
+def refresh_codecs():
+    """Perbarui iklan codec replica ini, lalu pilih codec /publish dari irisan semua replica."""
+    global publish_codec
+    codec.advertise(redis_client, CHANNEL_NAME, STREAM_CONSUMER)
+    publish_codec = codec.resolve(redis_client, CHANNEL_NAME)
+
+async def refresh_codecs_async(client):
+    global publish_codec
+    await client.set(
+        codec.codecs_key(CHANNEL_NAME, STREAM_CONSUMER),
+        codec.advertisement(),
+        ex=codec.CODEC_ADVERTISE_TTL_SECONDS,
+    )
+    advertised = None
+    if codec.MESSAGE_CODEC == "auto":
+        keys = [key async for key in client.scan_iter(match=codec.codecs_pattern(CHANNEL_NAME))]
+        advertised = codec.common_codecs(await client.mget(keys)) if keys else None
+    publish_codec = codec.choose(advertised)
+
+async def codec_advertise_loop():
+    """Iklan ber-TTL di-refresh tiap TTL/3; replica yang mati hilang dari irisan."""
+    while True:
+        await asyncio.sleep(codec.CODEC_ADVERTISE_TTL_SECONDS / 3)
+        try:
+            if _is_async():
+                await refresh_codecs_async(async_redis_client)
+            else:
+                await run_in_threadpool(refresh_codecs)
+        except Exception as e:
+            print(f"⚠️ Codec advertisement failed: {e}")
+
 @asynccontextmanager
-async def lifespan(app: FastAPI):
+async def sync_lifespan():
     init_db()
     if redis_client:
-        start_worker_thread()
+        try:
+            refresh_codecs()
+        except Exception as e:
+            print(f"⚠️ Codec negotiation failed: {e}")
+    stop_event = threading.Event()
+    batchers = start_worker_threads(stop_event) if redis_client else []
+    active_batchers.extend(batchers)
     yield
+    stop_event.set()
+    # Flush batch parsial supaya tidak ada event yang hilang saat shutdown
+    for batcher in batchers:
+        batcher.close()
+    active_batchers.clear()
+
+@asynccontextmanager
+async def async_lifespan():
+    global async_redis_client
+    await init_db_async()
+
+    try:
+        client = create_async_redis()
+        await client.ping()
+        async_redis_client = client
+        await refresh_codecs_async(client)
+    except Exception as e:
+        print(f"⚠️ Redis (async) not connected: {e}")
+        async_redis_client = None
+
+    tasks, batchers = start_async_workers(async_redis_client) if async_redis_client else ([], [])
+    active_batchers.extend(batchers)
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for batcher in batchers:
+        await batcher.close()
+    active_batchers.clear()
+    if async_redis_client:
+        await async_redis_client.aclose()
+        async_redis_client = None
+
+async def archive_loop():
+    """Hanya jalan kalau ARCHIVE_DIR di-set. Job sync (file + DB) di threadpool, di dua mode."""
+    while True:
+        try:
+            await run_in_threadpool(archive_closed_ranges)
+        except Exception as e:
+            print(f"⚠️ Archive job failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+async def spool_forwarder():
+    """
+    Kuras spool ke broker dalam batch besar. Broker mati = batch yang sama
+    dicoba lagi setiap PUBLISH_SPOOL_RETRY_SECONDS; checkpoint baru maju
+    setelah kirim berhasil.
+    """
+    while True:
+        client = _broker_client()
+        if not client:
+            await asyncio.sleep(PUBLISH_SPOOL_RETRY_SECONDS)
+            continue
+        batch = await run_in_threadpool(publish_spool.read_batch, PUBLISH_SPOOL_BATCH_EVENTS)
+        if batch is None:
+            await run_in_threadpool(publish_spool.wait_for_data, PUBLISH_SPOOL_RETRY_SECONDS)
+            continue
+        try:
+            if batch.events:
+                # Replay setelah crash: klaim edge dedup lama mungkin sudah
+                # ada tanpa event-nya terkirim, jadi dedup diserahkan ke worker
+                await _forward(client, dedupe_events(batch.events), claim=not batch.replayed)
+            await run_in_threadpool(publish_spool.commit, batch.position)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            cause = e.__cause__ if isinstance(e, _ForwardError) else e
+            print(f"⚠️ Spool forward failed, retrying: {cause}")
+            await asyncio.sleep(PUBLISH_SPOOL_RETRY_SECONDS)
+
+async def partition_maintenance_loop():
+    """Hanya jalan kalau EVENTS_PARTITION_INTERVAL aktif; gagal = coba lagi periode berikutnya."""
+    while True:
+        try:
+            if _is_async():
+                await run_partition_maintenance_async()
+            else:
+                await run_in_threadpool(run_partition_maintenance)
+        except Exception as e:
+            print(f"⚠️ Partition maintenance failed: {e}")
+        await asyncio.sleep(PARTITION_MAINTENANCE_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ARCHIVE_DIR tanpa pyarrow: gagal saat startup, bukan saat query pertama
+    event_archive.check()
+    mode_lifespan = async_lifespan if AGGREGATOR_MODE == "async" else sync_lifespan
+    async with mode_lifespan():
+        jobs = []
+        if redis_client or async_redis_client:
+            jobs.append(asyncio.create_task(codec_advertise_loop()))
+        if publish_spool.enabled:
+            # Segment sisa proses sebelumnya langsung di-replay oleh forwarder
+            await run_in_threadpool(publish_spool.open)
+            jobs.append(asyncio.create_task(spool_forwarder()))
+        if event_partitions():
+            jobs.append(asyncio.create_task(partition_maintenance_loop()))
+        if event_archive.enabled:
+            jobs.append(asyncio.create_task(archive_loop()))
+        yield
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        if publish_spool.enabled:
+            publish_spool.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -88,41 +589,455 @@ app = FastAPI(lifespan=lifespan)
 # ENDPOINTS
 # =====================================================
 @app.get("/")
-def healthcheck():
+async def healthcheck():
     return {"status": "healthy"}
 
+def _ndjson_chunk(rows):
+    return "".join(json.dumps(jsonable_encoder(row)) + "\n" for row in rows)
+
+def _ndjson_lines(topic: Optional[str], after_id: Optional[int], fields: List[str]):
+    chunks = iter_events(topic, after_id, fields=fields)
+    if event_archive.enabled:
+        chunks = merge_chunks(chunks, event_archive.iter_rows(topic, after_id, fields))
+    for rows in chunks:
+        yield _ndjson_chunk(rows)
+
+async def _ndjson_lines_async(topic: Optional[str], after_id: Optional[int], fields: List[str]):
+    chunks = iter_events_async(topic, after_id, fields=fields)
+    if event_archive.enabled:
+        chunks = merge_chunks_async(chunks, event_archive.iter_rows(topic, after_id, fields))
+    async for rows in chunks:
+        yield _ndjson_chunk(rows)
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """`fields=source,payload` -> kolom tambahan; payload baru di-decode kalau diminta."""
+    requested = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(EXTRA_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields {unknown}; allowed: {list(EXTRA_FIELDS)}",
+        )
+    return requested
+
+def _is_async() -> bool:
+    return AGGREGATOR_MODE == "async"
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 @app.get("/events")
-def list_events(topic: Optional[str] = None):
-    return get_events(topic)
+async def list_events(
+    request: Request,
+    topic: Optional[str] = None,
+    limit: int = Query(EVENTS_PAGE_LIMIT, ge=1, le=EVENTS_MAX_LIMIT),
+    after_id: Optional[int] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = None,
+):
+    extra = _parse_fields(fields)
+
+    # NDJSON: seluruh hasil di-stream per chunk, memori konstan
+    if format == "ndjson":
+        lines = (
+            _ndjson_lines_async(topic, after_id, extra)
+            if _is_async()
+            else _ndjson_lines(topic, after_id, extra)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    # Cache: body JSON yang sudah di-encode + ETag, valid selama versi topic sama
+    key = ("events", topic, limit, after_id, tuple(extra))
+    entry, version = response_cache.lookup("events", key, topic)
+    if entry is None:
+        if _is_async():
+            events = await get_events_async(topic, limit=limit, after_id=after_id, fields=extra)
+        else:
+            events = await run_in_threadpool(
+                get_events, topic, limit=limit, after_id=after_id, fields=extra
+            )
+        if event_archive.enabled:
+            # Hari yang sudah dingin ada di Parquet; hasil tetap urut id
+            events = await run_in_threadpool(
+                event_archive.merge_page, events, topic, limit, after_id, extra
+            )
+        headers = {}
+        # Halaman penuh -> kemungkinan masih ada halaman berikutnya
+        if len(events) == limit:
+            headers["X-Next-After-Id"] = str(events[-1]["id"])
+        body = json.dumps(
+            jsonable_encoder(events), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        entry = response_cache.store(key, version, (body, headers), make_etag(body))
+
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return _not_modified(entry.etag)
+    body, headers = entry.value
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, "ETag": entry.etag, "Cache-Control": "no-cache"},
+    )
 
 @app.get("/stats")
-def statistics():
-    stats = get_stats()
+async def statistics():
+    # Hanya hasil DB yang di-cache; angka proses di bawah selalu live
+    entry, version = response_cache.lookup("stats", ("stats",))
+    if entry is None:
+        stats = await get_stats_async() if _is_async() else await run_in_threadpool(get_stats)
+        entry = response_cache.store(("stats",), version, stats)
+    stats = entry.value
+    dedup = dedup_filter.stats()
     return {
+        # Angka proses ini sejak start (per replica)
+        "received": dedup["hits"] + dedup["misses"],
+        "duplicates_dropped": dedup["hits"] + dedup["db_duplicates"],
+        # Angka dari DB (global, semua replica)
+        "unique_processed": sum(c for _, c in stats),
         "topics": len(stats),
         "details": {t: c for t, c in stats},
+        "uptime_seconds": round(time.monotonic() - STARTED_AT, 3),
+        "dedup_filter": dedup,
+        "response_cache": response_cache.stats(),
+        # Counter di atas sudah termasuk event yang diarsip
+        "archive": event_archive.stats(),
+        "publish_spool": publish_spool.stats(),
     }
 
+@app.get("/stats/timeseries")
+async def statistics_timeseries(
+    topic: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = Query("1m", pattern="^(1m|1h)$"),
+):
+    """
+    Jumlah event per bucket (berdasarkan timestamp event) dari tabel rollup.
+    Waktu tanpa timezone dianggap UTC; bucket kosong tidak dikembalikan.
+    """
+    step = BUCKET_GRAINS[bucket]
+    end = to_utc_naive(end or datetime.now(timezone.utc))
+    start = bucket_start(start or end - step * TIMESERIES_DEFAULT_BUCKETS, bucket)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="'from' must be before 'to'")
+    if (end - start) / step > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Range covers more than {TIMESERIES_MAX_BUCKETS} '{bucket}' buckets",
+        )
+
+    if _is_async():
+        points = await get_timeseries_async(bucket, start, end, topic)
+    else:
+        points = await run_in_threadpool(get_timeseries, bucket, start, end, topic)
+    return {"topic": topic, "bucket": bucket, "from": start, "to": end, "points": points}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Render di threadpool: gauge consumer lag memanggil Redis (sync)
+    body = await run_in_threadpool(metrics.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
+async def _persist_statuses(unique) -> Dict[tuple, str]:
+    """
+    Tulis langsung ke DB (tanpa broker) dan kembalikan status per key.
+    Deadline: statement_timeout di PostgreSQL + batas tunggu di sini.
+    """
+    statuses = {(e["topic"], e["event_id"]): "duplicate" for e in unique}
+    fresh = filter_known(unique)
+    try:
+        if _is_async():
+            pending = insert_events_keys_async(fresh, PUBLISH_ACK_TIMEOUT_MS)
+        else:
+            pending = run_in_threadpool(insert_events_keys, fresh, PUBLISH_ACK_TIMEOUT_MS)
+        # Sedikit kelonggaran supaya statement_timeout DB yang terpicu duluan
+        inserted = await asyncio.wait_for(pending, PUBLISH_ACK_TIMEOUT_MS / 1000 + 1)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="Persist deadline exceeded; the outcome of this batch is unknown",
+        )
+    except Exception as e:
+        print(f"❌ Write-through publish failed: {e}")
+        count_failed(fresh, "insert")
+        statuses.update(((e["topic"], e["event_id"]), "failed") for e in fresh)
+        return statuses
+
+    dedup_filter.remember(fresh, len(inserted))
+    statuses.update((key, "inserted") for key in inserted)
+    return statuses
+
 @app.post("/publish")
-def publish_event(event_data: Union[EventSchema, List[EventSchema]]):
+async def publish_event(
+    event_data: Union[EventSchema, List[EventSchema]],
+    ack: str = Query("broker", pattern="^(broker|persisted)$"),
+):
+    events = event_data if isinstance(event_data, list) else [event_data]
+
+    # model_dump(mode="json") mengurus datetime -> string isoformat
+    unique = dedupe_events(e.model_dump(mode="json") for e in events)
+    metrics.EVENTS_RECEIVED.inc_many(metrics.count_by_topic(e.topic for e in events))
+    if len(unique) < len(events):
+        dropped = Counter(e.topic for e in events) - Counter(e["topic"] for e in unique)
+        metrics.EVENTS_DEDUPLICATED.inc_many(metrics.count_by_topic(dropped.elements(), "request"))
+
+    # ack=persisted: tunggu commit dan laporkan status per event (urutan request)
+    if ack == "persisted":
+        statuses = await _persist_statuses(unique)
+        seen = set()
+        results = []
+        for e in events:
+            key = (e.topic, e.event_id)
+            status = "duplicate" if key in seen else statuses[key]
+            seen.add(key)
+            results.append({"topic": e.topic, "event_id": e.event_id, "status": status})
+        totals = Counter(r["status"] for r in results)
+        return {
+            "message": "Events persisted",
+            "received": len(events),
+            "inserted": totals["inserted"],
+            "duplicates": totals["duplicate"],
+            "failed": totals["failed"],
+            "results": results,
+        }
+
+    # Spool aktif: cukup durable di disk lokal, forwarder yang mengirim ke broker
+    if publish_spool.enabled:
+        if unique:
+            try:
+                await run_in_threadpool(publish_spool.append, unique)
+            except SpoolFull:
+                count_failed(unique, "spool_full")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Publish spool is full",
+                    headers={"Retry-After": str(max(1, int(PUBLISH_SPOOL_RETRY_SECONDS)))},
+                )
+        return {
+            "message": "Events accepted",
+            "received": len(events),
+            "spooled": len(unique),
+            "duplicates_in_request": len(events) - len(unique),
+        }
+
+    client = _broker_client()
     # Jika redis_client None (misal error koneksi), return 503
-    if not redis_client:
+    if not client:
         # Pengecualian: Jika testing tapi mock belum inject, kita skip error 
         # (tapi idealnya test pakai mock)
         return {"message": "Redis unavailable (Stored in memory only if mocked)"}
 
-    events = event_data if isinstance(event_data, list) else [event_data]
-    count = 0
+    try:
+        fresh = await _forward(client, unique)
+    except _ForwardError as e:
+        count_failed(e.events, "publish")
+        raise e.__cause__
+
+    return {
+        "message": "Events processed",
+        "received": len(events),
+        "published": len(fresh),
+        "duplicates_in_request": len(events) - len(unique),
+        "duplicates_in_window": len(unique) - len(fresh),
+    }
+
+def _broker_client():
+    return async_redis_client if _is_async() else redis_client
+
+class _ForwardError(Exception):
+    """Kirim ke broker gagal; `events` = event yang (sudah lolos edge dedup) gagal."""
+
+    def __init__(self, events):
+        super().__init__("publish failed")
+        self.events = events
 
-    for event in events:
-        # jsonable_encoder mengurus datetime -> string isoformat
-        payload = jsonable_encoder(event)
-        redis_client.publish(CHANNEL_NAME, json.dumps(payload))
-        count += 1
+async def _forward(client, unique, claim: bool = True):
+    """Edge dedup + kirim ke broker (satu round trip). Return event yang dikirim."""
+    codec_name, compression = publish_codec
+    claim = claim and edge_dedup.enabled
+
+    # Edge dedup: event yang sudah diterima replica mana pun dalam jendela
+    # TTL tidak diteruskan ke broker
+    fresh = unique
+    if claim:
+        if _is_async():
+            fresh = await edge_dedup.claim_async(client, unique)
+        else:
+            fresh = await run_in_threadpool(edge_dedup.claim, client, unique)
+        if len(fresh) < len(unique):
+            seen = Counter(e["topic"] for e in unique) - Counter(e["topic"] for e in fresh)
+            metrics.EVENTS_DEDUPLICATED.inc_many(metrics.count_by_topic(seen.elements(), "edge"))
+
+    # Routing per shard (hash topic), tiap shard jadi beberapa envelope;
+    # semuanya dikirim dalam satu round trip
+    batches = {
+        shard_channel(CHANNEL_NAME, shard): pack_events(group, codec_name=codec_name, compression=compression)
+        for shard, group in group_by_shard(fresh).items()
+    }
+    try:
+        if batches and _is_async():
+            await make_async_transport(client, CHANNEL_NAME).send_batches(batches)
+        elif batches:
+            await run_in_threadpool(make_transport(client, CHANNEL_NAME).send_batches, batches)
+    except Exception as e:
+        if claim:
+            await _release_claims(client, fresh)
+        raise _ForwardError(fresh) from e
+    metrics.EVENTS_PUBLISHED.inc_many(metrics.count_by_topic(e["topic"] for e in fresh))
+    return fresh
+
+async def _release_claims(client, events):
+    """Publish gagal: lepas klaim edge dedup supaya retry tidak dianggap duplikat."""
+    try:
+        if _is_async():
+            await edge_dedup.release_async(client, events)
+        else:
+            await run_in_threadpool(edge_dedup.release, client, events)
+    except Exception as e:
+        print(f"⚠️ Failed to release edge dedup claims: {e}")
 
-    return {"message": "Events processed", "received": count}
+async def _body_lines(request: Request):
+    """Body request -> baris (bytes) tanpa menampung seluruh body di memori."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+@app.post("/publish/stream")
+async def publish_stream(request: Request):
+    """
+    Body NDJSON (satu event per baris) dibaca bertahap. Setiap
+    PUBLISH_STREAM_CHUNK_SIZE baris divalidasi sekaligus lalu dikirim ke
+    broker (atau spool) sambil sisa body masih dibaca. Baris yang tidak
+    valid dilaporkan per baris, request tidak gagal 422.
+    """
+    client = _broker_client()
+    if not publish_spool.enabled and not client:
+        raise HTTPException(status_code=503, detail="Redis unavailable")
+
+    totals = Counter()
+    errors: List[str] = []
+    seen = set()
+    sending: Optional[asyncio.Task] = None
+
+    async def send(events):
+        try:
+            if publish_spool.enabled:
+                await run_in_threadpool(publish_spool.append, events)
+                totals["spooled"] += len(events)
+            else:
+                fresh = await _forward(client, events)
+                totals["published"] += len(fresh)
+                totals["duplicates_in_window"] += len(events) - len(fresh)
+        except Exception as e:
+            failed = e.events if isinstance(e, _ForwardError) else events
+            count_failed(failed, "spool_full" if isinstance(e, SpoolFull) else "publish")
+            totals["failed"] += len(failed)
+            print(f"⚠️ /publish/stream chunk failed: {e.__cause__ or e}")
+
+    async def flush(lines):
+        nonlocal sending
+        events, bad = await run_in_threadpool(validate_lines, lines)
+        totals["invalid"] += len(bad)
+        if bad:
+            metrics.EVENTS_FAILED.inc("unknown", "invalid", amount=len(bad))
+        errors.extend(f"line {n}: {message}" for n, message in bad[:PUBLISH_STREAM_MAX_ERRORS - len(errors)])
+
+        metrics.EVENTS_RECEIVED.inc_many(metrics.count_by_topic(e["topic"] for e in events))
+        unique = []
+        for e in events:
+            key = (e["topic"], e["event_id"])
+            if key not in seen:
+                seen.add(key)
+                unique.append(e)
+        if len(unique) < len(events):
+            dropped = Counter(e["topic"] for e in events) - Counter(e["topic"] for e in unique)
+            metrics.EVENTS_DEDUPLICATED.inc_many(metrics.count_by_topic(dropped.elements(), "request"))
+            totals["duplicates_in_request"] += len(events) - len(unique)
+
+        # Satu kiriman berjalan di belakang, chunk berikutnya sudah dibaca
+        if sending:
+            await sending
+        sending = asyncio.create_task(send(unique)) if unique else None
+
+    chunk = []
+    line_no = 0
+    try:
+        async for raw in _body_lines(request):
+            line_no += 1
+            if not raw.strip():
+                continue
+            totals["received"] += 1
+            chunk.append((line_no, raw))
+            if len(chunk) >= PUBLISH_STREAM_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+    finally:
+        # Chunk yang sudah divalidasi tetap dikirim walau body terputus
+        if sending:
+            await sending
+
+    result = {"message": "Events processed", "received": totals["received"]}
+    if publish_spool.enabled:
+        result["spooled"] = totals["spooled"]
+    else:
+        result["published"] = totals["published"]
+        result["duplicates_in_window"] = totals["duplicates_in_window"]
+    result.update(
+        duplicates_in_request=totals["duplicates_in_request"],
+        invalid=totals["invalid"],
+        failed=totals["failed"],
+        errors=errors,
+    )
+    return result
+
+@app.post("/publish/bulk")
+async def publish_bulk(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+):
+    """
+    Backfill: body NDJSON atau CSV di-stream dan dimuat per chunk langsung
+    ke DB (COPY + merge di PostgreSQL, executemany di SQLite), tanpa broker.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    parse = CsvRowParser() if format == "csv" else parse_ndjson_line
+
+    loader = BulkLoader()
+    chunk = []
+    try:
+        line_no = 0
+        async for raw in _body_lines(request):
+            line_no += 1
+            try:
+                line = raw.decode("utf-8").strip()
+                if not line:
+                    continue
+                event = parse(line)
+            except (BulkRowError, UnicodeDecodeError) as e:
+                loader.reject(line_no, e)
+                continue
+            if event is None:
+                continue  # header CSV
+            chunk.append(event)
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                await run_in_threadpool(loader.write, chunk)
+                chunk = []
+        await run_in_threadpool(loader.write, chunk)
+        return await run_in_threadpool(loader.finish)
+    except BulkFormatError as e:
+        loader.abort()
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        loader.abort()
+        raise
 
 if __name__ == "__main__":
     uvicorn.run("src.main:app", host="0.0.0.0", port=8080)
-    
-    
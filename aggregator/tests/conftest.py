@@ -2,8 +2,10 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import StaticPool
 
 import src.api.worker.processor.db as db
+from src.api.cache import response_cache
 from src.main import app
 
 # =====================================================
@@ -11,9 +13,12 @@ from src.main import app
 # =====================================================
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
+# StaticPool: endpoint sync jalan di threadpool, semua thread harus
+# memakai koneksi (dan database in-memory) yang sama
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
 )
 
 TestingSessionLocal = scoped_session(
@@ -36,6 +41,8 @@ def client():
 
     # 🔥 INIT TABLE - Pastikan table dibuat setiap kali
     db.Base.metadata.create_all(bind=engine)
+    # DB baru -> cache response dari test sebelumnya tidak berlaku
+    response_cache.clear()
     
     # Atau gunakan:
     # db.init_db()
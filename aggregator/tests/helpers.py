@@ -0,0 +1,19 @@
+# =====================================================
+# EVENT FACTORY (dipakai bersama oleh semua test)
+# =====================================================
+TIMESTAMP = "2024-01-01T00:00:00Z"
+
+
+def event(event_id, topic="test_topic", **fields):
+    """Event valid minimal; field lain (timestamp, payload, ...) lewat kwargs."""
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": TIMESTAMP,
+        "source": "test",
+        **fields,
+    }
+
+
+def events(*ids, topic="test_topic", **fields):
+    return [event(i, topic, **fields) for i in ids]
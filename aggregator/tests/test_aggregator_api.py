@@ -1,16 +1,13 @@
+import json
 from datetime import datetime
 
-# --- Helper Function ---
-def valid_event(event_id="evt1", topic="test_topic"):
-    return {
-        "topic": topic,
-        "event_id": event_id,
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "source": "test-source",
-        "payload": {
-            "data": {"value": 123}
-        }
-    }
+import fakeredis
+
+import src.api.worker.processor.db as db
+import src.main as main
+from src.api.worker.dedup import DedupFilter
+from src.broker.envelope import unpack_message
+from tests.helpers import event, events
 
 # --- 1. Basic Health Check ---
 def test_healthcheck(client):
@@ -21,7 +18,7 @@ def test_healthcheck(client):
 # --- 2. Validation Tests (Schema Check) ---
 
 def test_publish_invalid_timestamp(client):
-    invalid_event = valid_event()
+    invalid_event = event("evt1")
     invalid_event["timestamp"] = "bukan-tanggal-yang-benar"
     res = client.post("/publish", json=[invalid_event])
     assert res.status_code == 422
@@ -61,4 +58,118 @@ def test_publish_invalid_payload_type(client):
     """
     # Kita kirim string "Halo", bukan format JSON yang benar
     res = client.post("/publish", json="Halo ini bukan object")
-    assert res.status_code == 422
\ No newline at end of file
+    assert res.status_code == 422
+
+
+# --- 4. Batch Envelope ---
+def test_publish_batch_sends_one_envelope_without_duplicates(client, monkeypatch):
+    fake = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(main, "redis_client", fake)
+    pubsub = fake.pubsub()
+    pubsub.subscribe(main.CHANNEL_NAME)
+    pubsub.get_message(timeout=1)  # pesan konfirmasi subscribe
+
+    body = events("a", "b", "a")
+    res = client.post("/publish", json=body)
+
+    assert res.status_code == 200
+    assert res.json()["received"] == 3
+    assert res.json()["published"] == 2
+
+    message = pubsub.get_message(timeout=1)
+    assert [e["event_id"] for e in unpack_message(message["data"])] == ["a", "b"]
+    assert pubsub.get_message(timeout=0.1) is None
+
+
+# --- 5. Pagination & Streaming ---
+def seed_events(topic, n):
+    db.insert_events(events(*(f"p{i}" for i in range(n)), topic=topic))
+
+
+def test_events_keyset_pagination(client):
+    seed_events("paged", 5)
+
+    first = client.get("/events", params={"topic": "paged", "limit": 2})
+    assert [e["event_id"] for e in first.json()] == ["p0", "p1"]
+    cursor = first.headers["X-Next-After-Id"]
+
+    second = client.get("/events", params={"topic": "paged", "limit": 2, "after_id": cursor})
+    assert [e["event_id"] for e in second.json()] == ["p2", "p3"]
+
+    last = client.get("/events", params={"topic": "paged", "limit": 2, "after_id": second.headers["X-Next-After-Id"]})
+    assert [e["event_id"] for e in last.json()] == ["p4"]
+    assert "X-Next-After-Id" not in last.headers
+
+
+def test_events_ndjson_stream(client):
+    seed_events("streamed", 3)
+
+    res = client.get("/events", params={"topic": "streamed", "format": "ndjson"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["event_id"] for r in rows] == ["p0", "p1", "p2"]
+
+
+def test_events_payload_only_when_requested(client):
+    db.insert_events([event("w1", "with_payload", source="api-test", payload={"temperature": 21.5})])
+
+    plain = client.get("/events", params={"topic": "with_payload"}).json()[0]
+    assert "payload" not in plain
+
+    full = client.get("/events", params={"topic": "with_payload", "fields": "source,payload"}).json()[0]
+    assert full["payload"] == {"temperature": 21.5}
+    assert full["source"] == "api-test"
+
+    ndjson = client.get("/events", params={"topic": "with_payload", "fields": "payload", "format": "ndjson"})
+    assert json.loads(ndjson.text.splitlines()[0])["payload"] == {"temperature": 21.5}
+
+
+def test_events_rejects_unknown_fields(client):
+    assert client.get("/events", params={"fields": "password"}).status_code == 422
+
+
+# --- 6. Stats ---
+def test_stats_timeseries_reads_rollups(client):
+    db.insert_events([
+        event(f"t{i}", "ts_topic", timestamp=f"2024-02-02T09:0{i}:30Z") for i in range(3)
+    ] + [event("o1", "other_topic", timestamp="2024-02-02T09:00:10Z")])
+
+    res = client.get("/stats/timeseries", params={
+        "topic": "ts_topic", "from": "2024-02-02T09:00:00Z", "to": "2024-02-02T09:02:00Z",
+    })
+    assert res.status_code == 200
+    body = res.json()
+    assert body["bucket"] == "1m"
+    assert [(p["bucket_start"], p["count"]) for p in body["points"]] == [
+        ("2024-02-02T09:00:00", 1),
+        ("2024-02-02T09:01:00", 1),
+    ]
+
+    hourly = client.get("/stats/timeseries", params={
+        "bucket": "1h", "from": "2024-02-02T09:00:00Z", "to": "2024-02-02T10:00:00Z",
+    }).json()
+    assert {p["topic"]: p["count"] for p in hourly["points"]} == {"ts_topic": 3, "other_topic": 1}
+
+
+def test_stats_timeseries_validates_range(client):
+    assert client.get("/stats/timeseries", params={"bucket": "5m"}).status_code == 422
+    backwards = {"from": "2024-01-02T00:00:00Z", "to": "2024-01-01T00:00:00Z"}
+    assert client.get("/stats/timeseries", params=backwards).status_code == 422
+    too_long = {"from": "2020-01-01T00:00:00Z", "to": "2024-01-01T00:00:00Z"}
+    assert client.get("/stats/timeseries", params=too_long).status_code == 422
+
+
+def test_stats_reports_pipeline_figures(client, monkeypatch):
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter(capacity=100))
+    batch = events("s0", "s1", "s2", topic="stats_topic")
+    main.persist_events(batch)
+    main.persist_events(batch[:2])  # duplikat, ditangkap filter
+
+    body = client.get("/stats").json()
+    assert body["received"] == 5
+    assert body["duplicates_dropped"] == 2
+    assert body["unique_processed"] == 3
+    assert body["details"] == {"stats_topic": 3}
+    assert body["uptime_seconds"] >= 0
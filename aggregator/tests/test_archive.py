@@ -0,0 +1,198 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+pytest.importorskip("pyarrow")
+
+import src.api.worker.processor.archive as archive_mod
+import src.api.worker.processor.db as db
+from src.api.worker.processor.archive import EventArchive, archive_closed_ranges, merge_by_id
+from tests.helpers import event, events
+
+
+@pytest.fixture
+def archive(client, tmp_path, monkeypatch):
+    store = EventArchive(str(tmp_path / "archive"), row_group_rows=2)
+    monkeypatch.setattr(archive_mod, "event_archive", store)
+    monkeypatch.setattr("src.main.event_archive", store)
+    monkeypatch.setattr(db, "ARCHIVE_DIR", store.root)
+    return store
+
+
+def seed(topic, *ids, days_ago=0):
+    db.insert_events([event(i, topic, payload={"n": i}) for i in ids])
+    if days_ago:
+        stamp = datetime.utcnow() - timedelta(days=days_ago)
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("UPDATE processed_events SET timestamp = :t WHERE topic = :topic"),
+                {"t": stamp, "topic": topic},
+            )
+
+
+def hot_ids():
+    with db.engine.connect() as conn:
+        return [r[0] for r in conn.execute(text("SELECT id FROM processed_events ORDER BY id"))]
+
+
+def test_job_moves_closed_days_into_topic_day_files(archive):
+    seed("cold/topic", "a", "b", "c", days_ago=10)
+    seed("hot", "d")
+
+    report = archive_closed_ranges(archive)
+    assert report == {"files": 1, "rows": 3}
+    assert len(hot_ids()) == 1
+
+    [entry] = archive.files()
+    assert entry.topic == "cold/topic"
+    assert entry.day == (datetime.utcnow() - timedelta(days=10)).date()
+    assert "topic=cold%2Ftopic" in entry.path and f"day={entry.day.isoformat()}" in entry.path
+    # Sudah tidak ada lagi yang dingin
+    assert archive_closed_ranges(archive) == {"files": 0, "rows": 0}
+
+
+def test_events_reads_hot_and_archive_in_id_order(archive, client):
+    seed("t", "a", "b", "c", days_ago=10)
+    archive_closed_ranges(archive)
+    seed("t", "d", "e")
+
+    events = client.get("/events", params={"topic": "t", "fields": "payload"}).json()
+    assert [e["event_id"] for e in events] == ["a", "b", "c", "d", "e"]
+    assert events[0]["payload"] == {"n": "a"}
+    assert set(events[0]) == {"id", "topic", "event_id", "timestamp", "payload"}
+
+    page = client.get("/events", params={"topic": "t", "limit": 2})
+    assert [e["event_id"] for e in page.json()] == ["a", "b"]
+    after = page.headers["X-Next-After-Id"]
+    page = client.get("/events", params={"topic": "t", "limit": 2, "after_id": after})
+    assert [e["event_id"] for e in page.json()] == ["c", "d"]
+
+    lines = client.get("/events", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["event_id"] for line in lines] == ["a", "b", "c", "d", "e"]
+
+    stats = client.get("/stats").json()
+    assert stats["unique_processed"] == 5
+    assert stats["archive"]["files"] == 1
+
+
+def test_resent_archived_event_stays_duplicate(archive, client):
+    seed("t", "e1", days_ago=10)
+    archive_closed_ranges(archive)
+    assert hot_ids() == []
+
+    assert db.insert_events(events("e1", "e2", topic="t")) == 1
+    assert db.get_stats() == [("t", 2)]
+    stored = client.get("/events", params={"topic": "t"}).json()
+    assert [e["event_id"] for e in stored] == ["e1", "e2"]
+
+
+def test_stats_serve_summary_cached_by_job(archive, client, monkeypatch):
+    seed("t", "a", days_ago=10)
+    archive_closed_ranges(archive)
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("/stats must not walk the archive directory")
+
+    monkeypatch.setattr(archive, "files", no_scan)
+    summary = client.get("/stats").json()["archive"]
+    assert summary["files"] == 1 and summary["topics"] == 1
+
+
+def test_after_id_prunes_files_and_row_groups(archive, monkeypatch):
+    seed("x", *"abcdef", days_ago=10)
+    seed("y", "g", days_ago=9)
+    archive_closed_ranges(archive)
+    x_file, y_file = archive.files()
+
+    opened, groups = [], []
+    real_file = archive_mod.pq.ParquetFile
+
+    class Spy(real_file):
+        def __init__(self, path, **kwargs):
+            assert kwargs.get("memory_map") is True
+            opened.append(path)
+            super().__init__(path, **kwargs)
+
+        def read_row_group(self, i, columns=None, **kwargs):
+            groups.append(i)
+            assert "payload" not in columns
+            return super().read_row_group(i, columns=columns, **kwargs)
+
+    monkeypatch.setattr(archive_mod.pq, "ParquetFile", Spy)
+    rows = list(archive.iter_rows("x", after_id=x_file.min_id + 3))
+    assert [r["event_id"] for r in rows] == ["e", "f"]
+    # 6 row / 2 per row group: dua group pertama dilewati dari statistik
+    assert groups == [2]
+    assert opened == [x_file.path]
+
+    opened.clear()
+    assert [r["event_id"] for r in archive.iter_rows(after_id=x_file.max_id)] == ["g"]
+    assert opened == [y_file.path]
+
+
+def test_sqlite_partitions_are_archived_from_period_tables(tmp_path, monkeypatch):
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "read_engine", None)
+    monkeypatch.setattr(db, "SessionLocal", scoped_session(sessionmaker(bind=engine)))
+    monkeypatch.setattr(db, "EVENTS_PARTITION_INTERVAL", "day")
+    db.init_db()
+    db.insert_events(events("1", "2", topic="p"))
+
+    store = EventArchive(str(tmp_path / "archive"))
+    report = archive_closed_ranges(store, now=datetime.utcnow() + timedelta(days=30))
+    assert report["rows"] == 2
+    assert db.get_events("p") == []
+    assert [r["event_id"] for r in store.iter_rows("p")] == ["1", "2"]
+
+
+def test_merge_prefers_hot_copy_and_drops_repeats():
+    hot = [{"id": 2, "src": "hot"}, {"id": 4, "src": "hot"}]
+    cold = [{"id": 1, "src": "cold"}, {"id": 2, "src": "cold"}, {"id": 3, "src": "cold"}]
+    assert [(r["id"], r["src"]) for r in merge_by_id(hot, cold)] == [
+        (1, "cold"), (2, "hot"), (3, "cold"), (4, "hot")
+    ]
+
+
+def test_disabled_archive_is_inert(tmp_path):
+    store = EventArchive("")
+    assert store.files() == []
+    assert store.stats() == {"enabled": False}
+    assert archive_closed_ranges(store) == {}
+    assert EventArchive(str(tmp_path / "missing")).files() == []
+
+
+def test_legacy_sqlite_table_keeps_newest_row_hot(archive):
+    # Tabel lama tanpa AUTOINCREMENT: id terbesar yang dihapus dipakai ulang
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP TABLE processed_events"))
+        conn.execute(text(
+            "CREATE TABLE processed_events (id INTEGER PRIMARY KEY, topic VARCHAR NOT NULL, "
+            "event_id VARCHAR NOT NULL, timestamp DATETIME NOT NULL, source VARCHAR, "
+            "event_timestamp DATETIME, payload BLOB, UNIQUE (topic, event_id))"
+        ))
+    seed("t", "a", "b", days_ago=10)
+
+    assert archive_closed_ranges(archive)["rows"] == 1
+    assert len(hot_ids()) == 1
+
+
+def test_async_merge_interleaves_chunks():
+    import asyncio
+
+    from src.api.worker.processor.archive import merge_chunks_async
+
+    async def hot():
+        yield [{"id": 2}, {"id": 5}]
+        yield [{"id": 6}]
+
+    async def collect():
+        cold = iter([{"id": 1}, {"id": 2}, {"id": 3}, {"id": 7}])
+        return [chunk async for chunk in merge_chunks_async(hot(), cold, chunk_size=2)]
+
+    chunks = asyncio.run(collect())
+    assert [r["id"] for c in chunks for r in c] == [1, 2, 3, 5, 6, 7]
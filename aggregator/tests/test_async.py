@@ -0,0 +1,109 @@
+import asyncio
+import time
+from datetime import datetime
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import src.api.worker.processor.async_db as async_db
+import src.main as main
+from src.api.worker.dedup import DedupFilter
+
+
+@pytest.fixture
+def aiosqlite_db(monkeypatch):
+    """Engine aiosqlite in-memory untuk path async."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    monkeypatch.setattr(async_db, "async_engine", engine)
+    monkeypatch.setattr(
+        async_db,
+        "AsyncSessionLocal",
+        async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False),
+    )
+    return engine
+
+
+def test_async_db_insert_and_read(aiosqlite_db):
+    async def scenario():
+        await async_db.init_db_async()
+        inserted = await async_db.insert_events_async([
+            {"topic": "async_topic", "event_id": "a1"},
+            {"topic": "async_topic", "event_id": "a2"},
+            {"topic": "async_topic", "event_id": "a2"},
+        ])
+        again = await async_db.insert_events_async([{"topic": "async_topic", "event_id": "a1"}])
+        events = await async_db.get_events_async("async_topic", limit=10)
+        streamed = [row async for rows in async_db.iter_events_async("async_topic") for row in rows]
+        stats = await async_db.get_stats_async()
+        await aiosqlite_db.dispose()
+        return inserted, again, events, streamed, stats
+
+    inserted, again, events, streamed, stats = asyncio.run(scenario())
+
+    assert inserted == 2
+    assert again == 0
+    assert [e["event_id"] for e in events] == ["a1", "a2"]
+    assert [e["event_id"] for e in streamed] == ["a1", "a2"]
+    assert stats == [("async_topic", 2)]
+
+
+def test_async_rollups_and_payload(aiosqlite_db):
+    async def scenario():
+        await async_db.init_db_async()
+        await async_db.insert_events_async([
+            {"topic": "async_ts", "event_id": "1", "timestamp": "2024-01-01T00:00:10Z", "payload": {"v": 1}},
+            {"topic": "async_ts", "event_id": "2", "timestamp": "2024-01-01T00:00:50Z"},
+        ])
+        points = await async_db.get_timeseries_async(
+            "1m", datetime(2024, 1, 1), datetime(2024, 1, 1, 1), "async_ts"
+        )
+        events = await async_db.get_events_async("async_ts", fields=["payload"])
+        await aiosqlite_db.dispose()
+        return points, events
+
+    points, events = asyncio.run(scenario())
+
+    assert [(p["bucket_start"], p["count"]) for p in points] == [(datetime(2024, 1, 1), 2)]
+    assert [e["payload"] for e in events] == [{"v": 1}, None]
+
+
+def test_async_mode_publish_to_persist(aiosqlite_db, monkeypatch):
+    monkeypatch.setattr(main, "AGGREGATOR_MODE", "async")
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter(capacity=100))
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        main,
+        "create_async_redis",
+        lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+
+    body = [
+        {
+            "topic": "async_e2e",
+            "event_id": f"e{i}",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "source": "pytest",
+            "payload": {"data": {}},
+        }
+        for i in range(3)
+    ]
+
+    with TestClient(main.app) as client:
+        # Tunggu consumer task selesai subscribe
+        time.sleep(0.2)
+        res = client.post("/publish", json=body)
+        assert res.json()["published"] == 3
+
+        events = []
+        deadline = time.time() + 5
+        while len(events) < 3 and time.time() < deadline:
+            time.sleep(0.05)
+            events = client.get("/events", params={"topic": "async_e2e"}).json()
+
+        stats = client.get("/stats").json()
+
+    assert [e["event_id"] for e in events] == ["e0", "e1", "e2"]
+    assert stats["details"] == {"async_e2e": 3}
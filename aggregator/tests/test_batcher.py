@@ -0,0 +1,320 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import src.main as main
+from src.api import metrics
+from src.api.worker import batcher as batcher_mod
+from src.api.worker.batcher import AsyncEventBatcher, EventBatcher
+from src.broker.envelope import pack_events
+from tests.helpers import event
+
+
+def test_flush_when_batch_size_reached():
+    flushed = []
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=3, linger_ms=10_000)
+    batcher.start()
+
+    for i in range(3):
+        batcher.add(event(f"evt-{i}"))
+
+    deadline = time.time() + 2
+    while not flushed and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert len(flushed) == 1
+    assert [e["event_id"] for e in flushed[0]] == ["evt-0", "evt-1", "evt-2"]
+    batcher.close()
+
+
+def test_flush_after_linger_timeout():
+    flushed = []
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=100, linger_ms=20)
+    batcher.start()
+
+    batcher.add(event("evt-1"))
+
+    deadline = time.time() + 2
+    while not flushed and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert flushed == [[event("evt-1")]]
+    batcher.close()
+
+
+def test_close_flushes_partial_batch():
+    flushed = []
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=100, linger_ms=10_000)
+    batcher.start()
+
+    batcher.add(event("evt-1"))
+    batcher.add(event("evt-2"))
+    batcher.close()
+
+    assert sum(len(b) for b in flushed) == 2
+
+
+def test_batches_never_exceed_max_size():
+    flushed = []
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=4, linger_ms=10_000)
+
+    # Tanpa start(): semua event menumpuk, close() harus memecah jadi beberapa batch
+    for i in range(10):
+        batcher.add(event(f"evt-{i}"))
+    batcher.close()
+
+    assert [len(b) for b in flushed] == [4, 4, 2]
+
+
+def test_block_policy_holds_listener_until_writer_catches_up():
+    release = threading.Event()
+    flushed = []
+
+    def slow_flush(batch):
+        release.wait(2)
+        flushed.append(batch)
+
+    batcher = EventBatcher(flush_fn=slow_flush, max_size=2, linger_ms=0, max_pending=2, policy="block")
+    batcher.start()
+
+    done = threading.Event()
+
+    def listener():
+        for i in range(6):
+            batcher.add(event(f"evt-{i}"))
+        done.set()
+
+    threading.Thread(target=listener, daemon=True).start()
+    # Writer tertahan -> buffer penuh -> listener ikut tertahan
+    assert not done.wait(0.2)
+    assert batcher.pending() <= 2
+
+    release.set()
+    assert done.wait(2)
+    batcher.close()
+    assert sum(len(b) for b in flushed) == 6
+
+
+def test_shed_policy_drops_events_when_full():
+    flushed = []
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=2, max_pending=2, policy="shed")
+    before = metrics.EVENTS_FAILED.value("test_topic", "shed")
+
+    for i in range(5):
+        batcher.add(event(f"evt-{i}"))
+    batcher.close()
+
+    assert sum(len(b) for b in flushed) == 2
+    assert metrics.EVENTS_FAILED.value("test_topic", "shed") == before + 3
+
+
+def test_spill_policy_replays_overflow_on_close(tmp_path):
+    flushed = []
+    batcher = EventBatcher(
+        flush_fn=flushed.append, max_size=2, max_pending=2, policy="spill", spill_dir=str(tmp_path)
+    )
+
+    for i in range(5):
+        batcher.add(event(f"evt-{i}"))
+    assert batcher.has_spill()
+    batcher.close()
+
+    assert sorted(e["event_id"] for b in flushed for e in b) == [f"evt-{i}" for i in range(5)]
+    assert not batcher.has_spill()
+
+
+def test_failed_replay_keeps_spill_file(tmp_path):
+    calls = []
+
+    def failing_flush(batch):
+        calls.append(batch)
+        raise RuntimeError("db down")
+
+    batcher = EventBatcher(flush_fn=failing_flush, max_size=10, max_pending=10, policy="spill", spill_dir=str(tmp_path))
+    batcher._spill([event("evt-1")])
+
+    batcher.replay_spill()
+    assert batcher.has_spill()
+
+    batcher.flush_fn = lambda batch: None
+    batcher.replay_spill()
+    assert not batcher.has_spill()
+
+
+def test_failed_flush_is_spilled_and_replayed(tmp_path):
+    flushed = []
+    down = [True]
+
+    def flaky_flush(batch):
+        if down[0]:
+            raise RuntimeError("db down")
+        flushed.append(batch)
+
+    batcher = EventBatcher(flush_fn=flaky_flush, max_size=2, linger_ms=0, spill_dir=str(tmp_path))
+    failures = batcher_mod.FLUSH_FAILURES.value(batcher.name)
+    batcher.add(event("evt-1"))
+    batcher.add(event("evt-2"))
+    batcher.flush()
+
+    assert batcher.has_spill()
+    assert batcher_mod.FLUSH_FAILURES.value(batcher.name) == failures + 1
+    down[0] = False
+    batcher.close()
+    assert [e["event_id"] for b in flushed for e in b] == ["evt-1", "evt-2"]
+    assert not batcher.has_spill()
+
+
+def test_add_after_close_writes_outside_the_lock(tmp_path):
+    held = []
+    batcher = EventBatcher(flush_fn=lambda batch: None, spill_dir=str(tmp_path))
+
+    def check_lock(batch):
+        free = batcher._cond.acquire(blocking=False)
+        held.append(not free)
+        if free:
+            batcher._cond.release()
+
+    batcher.close()
+    batcher.flush_fn = check_lock
+    batcher.add(event("evt-1"))
+    assert held == [False]
+
+
+def test_async_batcher_sheds_when_full(tmp_path):
+    async def scenario():
+        flushed = []
+
+        async def record(batch):
+            flushed.append(batch)
+
+        batcher = AsyncEventBatcher(record, max_size=2, max_pending=2, policy="shed", spill_dir=str(tmp_path))
+        before = metrics.EVENTS_FAILED.value("test_topic", "shed")
+        for i in range(5):
+            await batcher.add(event(f"evt-{i}"))
+        assert batcher.pending() == 2
+        await batcher.close()
+        return flushed, metrics.EVENTS_FAILED.value("test_topic", "shed") - before
+
+    flushed, shed = asyncio.run(scenario())
+    assert sum(len(b) for b in flushed) == 2
+    assert shed == 3
+
+
+def test_async_batcher_blocks_until_writer_catches_up(tmp_path):
+    async def scenario():
+        flushed = []
+
+        async def slow(batch):
+            await asyncio.sleep(0.01)
+            flushed.append(batch)
+
+        batcher = AsyncEventBatcher(slow, max_size=2, linger_ms=0, max_pending=2, spill_dir=str(tmp_path))
+        batcher.start()
+        for i in range(6):
+            await batcher.add(event(f"evt-{i}"))
+            assert batcher.pending() <= 2
+        await batcher.close()
+        return flushed
+
+    assert sum(len(b) for b in asyncio.run(scenario())) == 6
+
+
+def test_async_failed_flush_is_spilled_and_replayed(tmp_path):
+    async def scenario():
+        flushed = []
+        down = [True]
+
+        async def flaky(batch):
+            if down[0]:
+                raise RuntimeError("db down")
+            flushed.append(batch)
+
+        batcher = AsyncEventBatcher(flaky, max_size=10, spill_dir=str(tmp_path))
+        await batcher.add(event("evt-1"))
+        await batcher.flush()
+        assert batcher.has_spill()
+        down[0] = False
+        await batcher.close()
+        return flushed, batcher.has_spill()
+
+    flushed, spilled = asyncio.run(scenario())
+    assert [e["event_id"] for b in flushed for e in b] == ["evt-1"]
+    assert not spilled
+
+
+def test_writer_pool_drains_queue():
+    flushed = []
+    lock = threading.Lock()
+
+    def record(batch):
+        with lock:
+            flushed.append(batch)
+
+    batcher = EventBatcher(flush_fn=record, max_size=5, linger_ms=5, writers=3)
+    batcher.start()
+    assert len(batcher._threads) == 3
+
+    for i in range(100):
+        batcher.add(event(f"evt-{i}"))
+    batcher.close()
+
+    ids = [e["event_id"] for b in flushed for e in b]
+    assert sorted(ids) == sorted(f"evt-{i}" for i in range(100))
+    assert all(len(b) <= 5 for b in flushed)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        EventBatcher(policy="drop-everything")
+
+
+class StubPubSub:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        for data in self.messages:
+            yield {"type": "message", "channel": "events", "data": data}
+
+
+class StubRedis:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def pubsub(self):
+        return StubPubSub(self.messages)
+
+
+def test_invalid_events_are_dropped_before_batching(monkeypatch):
+    events = [event("evt-1"), {"event_id": "bad"}, {"topic": "test_topic", "event_id": ""}, event("evt-2")]
+    flushed = []
+    monkeypatch.setattr(main, "redis_client", StubRedis(pack_events(events)))
+    before = metrics.EVENTS_FAILED.value("unknown", "invalid")
+    batcher = EventBatcher(flush_fn=flushed.append, max_size=100, linger_ms=10_000)
+    batcher.start()
+    main.redis_worker(batcher)
+    batcher.close()
+
+    assert [e["event_id"] for batch in flushed for e in batch] == ["evt-1", "evt-2"]
+    assert metrics.EVENTS_FAILED.value("unknown", "invalid") == before + 2
+
+
+def test_worker_counts_events_it_cannot_enqueue(monkeypatch):
+    messages = [b"\x01\x09\x00garbage"] + pack_events([event("evt-1"), event("evt-2")])
+    monkeypatch.setattr(main, "redis_client", StubRedis(messages))
+
+    class BrokenBatcher:
+        def add(self, event):
+            raise OSError("spill disk full")
+
+    decode_before = metrics.EVENTS_FAILED.value("unknown", "decode")
+    enqueue_before = metrics.EVENTS_FAILED.value("test_topic", "enqueue")
+    main.redis_worker(BrokenBatcher())
+
+    assert metrics.EVENTS_FAILED.value("unknown", "decode") == decode_before + 1
+    assert metrics.EVENTS_FAILED.value("test_topic", "enqueue") == enqueue_before + 2
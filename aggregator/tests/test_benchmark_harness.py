@@ -0,0 +1,49 @@
+import src.api.worker.processor.db as db
+import src.main as main
+from benchmarks import bench_pipeline
+
+
+def test_small_scenario_persists_every_unique_event(monkeypatch):
+    # Harness mengganti engine & redis global; kembalikan setelah test
+    monkeypatch.setattr(db, "engine", db.engine)
+    monkeypatch.setattr(db, "SessionLocal", db.SessionLocal)
+    monkeypatch.setattr(main, "redis_client", main.redis_client)
+    monkeypatch.setattr(main, "dedup_filter", main.dedup_filter)
+
+    result = bench_pipeline.run_scenario(
+        total=200, batch_size=50, duplicate_ratio=0.2, topic_count=3, timeout=10
+    )
+
+    assert result["stored"] == result["unique"] == 160
+    assert result["events_per_second"] > 0
+    assert 0 < result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+
+
+def test_compare_flags_throughput_regression_and_data_loss():
+    result = {
+        "name": "s",
+        "unique": 10,
+        "stored": 9,
+        "events_per_second": 50.0,
+        "latency_ms": {"p50": 1, "p95": 1, "p99": 1},
+    }
+    baseline = {"results": [dict(result, stored=10, events_per_second=100.0)]}
+
+    regressions = bench_pipeline.compare([result], baseline, tolerance=0.3)
+
+    assert any("throughput" in r for r in regressions)
+    assert any("data loss" in r for r in regressions)
+    assert bench_pipeline.compare([dict(result, stored=10, events_per_second=90.0)], baseline) == []
+
+
+def test_sqlite_benchmark_runs_both_profiles(monkeypatch):
+    from benchmarks import bench_sqlite
+
+    monkeypatch.setattr(db, "engine", db.engine)
+    monkeypatch.setattr(db, "read_engine", db.read_engine)
+    monkeypatch.setattr(db, "SessionLocal", db.SessionLocal)
+
+    for profile in bench_sqlite.PROFILES:
+        result = bench_sqlite.run_profile(profile, total=200, batch_size=50, readers=2)
+        assert result["stored"] == 200
+        assert result["errors"] == {"read": 0, "write": 0}
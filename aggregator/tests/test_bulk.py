@@ -0,0 +1,145 @@
+import json
+
+import src.main as main
+import src.api.worker.processor.db as db
+from src.api.worker.processor import bulk
+from tests.helpers import event
+
+
+def ndjson(events):
+    return "\n".join(json.dumps(e) for e in events) + "\n"
+
+
+def test_bulk_ndjson_loads_in_chunks_and_counts_duplicates(client, monkeypatch):
+    monkeypatch.setattr(main, "BULK_CHUNK_SIZE", 3)
+    db.insert_events([event("b0")])
+
+    events = [event(f"b{i}", payload={"i": i}) for i in range(7)] + [event("b1")]
+    res = client.post(
+        "/publish/bulk",
+        content=ndjson(events),
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    assert res.status_code == 200
+    assert res.json() == {
+        "received": 8, "inserted": 6, "duplicates": 2, "invalid": 0, "errors": [],
+    }
+    stored = db.get_events("test_topic", fields=["payload"])
+    assert len(stored) == 7
+    assert stored[-1]["payload"] == {"i": 6}
+    assert dict(db.get_stats())["test_topic"] == 7
+
+
+def test_bulk_reports_invalid_lines(client):
+    body = "\n".join([
+        json.dumps(event("b1", "bulk_invalid")),
+        "{not json",
+        json.dumps({"topic": "bulk_invalid", "event_id": "x"}),
+        "",
+        json.dumps(event("b2", "bulk_invalid", payload=[1, 2])),
+    ])
+    res = client.post("/publish/bulk", content=body)
+
+    body = res.json()
+    assert body["inserted"] == 1
+    assert body["invalid"] == 3
+    assert [e.split(":")[0] for e in body["errors"]] == ["line 2", "line 3", "line 5"]
+
+
+def test_bulk_csv(client):
+    body = (
+        "topic,event_id,timestamp,source,payload\n"
+        'bulk_csv,c1,2024-04-01T10:00:00Z,backfill,"{""v"": 1}"\n'
+        "bulk_csv,c2,2024-04-01T10:00:30Z,,\n"
+        "bulk_csv,c3,not-a-time,,\n"
+    )
+    res = client.post("/publish/bulk", content=body, headers={"content-type": "text/csv"})
+
+    assert res.json()["inserted"] == 2
+    assert res.json()["invalid"] == 1
+    rows = db.get_events("bulk_csv", fields=["source", "payload"])
+    assert [(r["source"], r["payload"]) for r in rows] == [("backfill", {"v": 1}), (None, None)]
+
+
+def test_bulk_csv_without_required_header_is_rejected(client):
+    res = client.post("/publish/bulk?format=csv", content="a,b,c\n1,2,3\n")
+    assert res.status_code == 422
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.log.append(("execute", sql))
+
+    def copy_expert(self, sql, file):
+        self.log.append(("copy", sql, file.read()))
+
+    def fetchall(self):
+        return [("pg_topic", 2)]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+    def close(self):
+        self.log.append(("close",))
+
+
+class FakePostgresEngine:
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def raw_connection(self):
+        return self.conn
+
+
+def test_postgres_path_copies_into_staging_then_merges():
+    engine = FakePostgresEngine()
+    loader = bulk.BulkLoader(engine)
+
+    loader.write([event("b1", "pg_topic", payload={"a": 1})])
+    loader.write([event("b2", "pg_topic")])
+    summary = loader.finish()
+
+    kinds = [entry[0] for entry in engine.conn.log]
+    assert kinds == ["execute", "copy", "copy", "execute", "commit", "execute", "commit", "close"]
+    create, first_copy = engine.conn.log[0][1], engine.conn.log[1]
+    assert "CREATE UNLOGGED TABLE bulk_staging_" in create
+    assert first_copy[1].startswith(f"COPY {loader.staging} ")
+    assert first_copy[2].startswith("pg_topic,b1,test,2024-01-01T00:00:00+00:00,\\x")
+    merge = engine.conn.log[3][1]
+    assert "ON CONFLICT ON CONSTRAINT uq_topic_event_id DO NOTHING" in merge
+    assert "INSERT INTO topic_buckets" in merge and "INSERT INTO topic_stats" in merge
+    assert summary == {"received": 2, "inserted": 2, "duplicates": 0, "invalid": 0, "errors": []}
+
+
+def test_postgres_path_rolls_back_on_abort():
+    engine = FakePostgresEngine()
+    loader = bulk.BulkLoader(engine)
+    loader.write([event("b1")])
+    loader.abort()
+
+    assert ("rollback",) in engine.conn.log
+    assert engine.conn.log[-1] == ("close",)
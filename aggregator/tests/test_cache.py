@@ -0,0 +1,91 @@
+import time
+
+import src.api.worker.processor.db as db
+from src.api.cache import ResponseCache, TopicVersions, etag_matches, response_cache
+from tests.helpers import events
+
+
+def seed(topic, *ids):
+    db.insert_events(events(*ids, topic=topic))
+
+
+def test_lru_evicts_oldest_and_ttl_expires():
+    versions = TopicVersions()
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, versions=versions)
+    for key in ("a", "b"):
+        _, version = cache.lookup("t", key)
+        cache.store(key, version, key.upper())
+    cache.lookup("t", "a")  # a jadi paling baru
+    cache.store("c", (0, 0), "C")
+    assert cache.lookup("t", "b")[0] is None
+    assert cache.lookup("t", "a")[0].value == "A"
+
+    short = ResponseCache(max_entries=2, ttl_seconds=0.01, versions=versions)
+    short.store("k", (0, 0), "v")
+    time.sleep(0.02)
+    assert short.lookup("t", "k")[0] is None
+
+
+def test_topic_version_bump_only_invalidates_that_topic():
+    versions = TopicVersions()
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, versions=versions)
+    for topic in ("x", "y"):
+        cache.store(topic, cache.lookup("t", topic, topic)[1], topic)
+    cache.store("all", cache.lookup("t", "all")[1], "all")
+
+    versions.bump(["x"])
+    assert cache.lookup("t", "x", "x")[0] is None
+    assert cache.lookup("t", "y", "y")[0].value == "y"
+    # Daftar tanpa filter topic ikut basi
+    assert cache.lookup("t", "all")[0] is None
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_events_served_from_cache_until_topic_is_written(client):
+    seed("hot", "1")
+    seed("cold", "1")
+    first = client.get("/events?topic=cold")
+    hits = response_cache.hits
+
+    seed("hot", "2")  # topic lain: entry "cold" tetap valid
+    again = client.get("/events?topic=cold")
+    assert response_cache.hits == hits + 1
+    assert again.json() == first.json()
+
+    seed("cold", "2")
+    fresh = client.get("/events?topic=cold")
+    assert [e["event_id"] for e in fresh.json()] == ["1", "2"]
+
+
+def test_events_etag_returns_304_until_data_changes(client):
+    seed("etag_topic", "1")
+    res = client.get("/events?topic=etag_topic")
+    etag = res.headers["etag"]
+
+    cached = client.get("/events?topic=etag_topic", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    seed("etag_topic", "2")
+    changed = client.get("/events?topic=etag_topic", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_stats_reports_cache_hit_ratio(client):
+    seed("stats_topic", "1")
+    client.get("/stats")
+    body = client.get("/stats").json()
+    assert body["details"] == {"stats_topic": 1}
+    assert body["response_cache"]["hits"] >= 1
+    assert 0 < body["response_cache"]["hit_ratio"] <= 1
+
+    seed("stats_topic", "2")
+    assert client.get("/stats").json()["details"] == {"stats_topic": 2}
@@ -0,0 +1,107 @@
+import json
+
+import fakeredis
+import pytest
+
+from src.broker import codec
+from src.broker.envelope import pack_events, unpack_message
+from publisher.src import main as publisher_main
+
+BIG_EVENT = {
+    "topic": "codec",
+    "event_id": "1",
+    "payload": {"data": {"text": "x" * 5000}},
+}
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_roundtrip(name, compression):
+    data = codec.encode(BIG_EVENT, name, compression)
+    plain = name != "msgpack" or codec.msgpack is None
+    assert (data[0] == codec.WIRE_VERSION) != (plain and compression == "none")
+    assert codec.decode(data) == BIG_EVENT
+    if compression != "none":
+        assert len(data) < len(json.dumps(BIG_EVENT))
+
+
+def test_small_payload_is_not_compressed():
+    data = codec.encode({"topic": "t", "event_id": "1"}, "msgpack", "zlib", min_bytes=1024)
+    assert data[2] == codec.COMPRESSION_NONE
+
+
+def test_json_without_compression_stays_plain_for_old_consumers(monkeypatch):
+    # Consumer lama (tanpa iklan) hanya bisa json.loads
+    monkeypatch.setattr(codec, "MESSAGE_CODEC", "auto")
+    event = {"topic": "t", "event_id": "1"}
+    assert json.loads(codec.encode(event, *codec.choose(None))) == event
+    assert json.loads(publisher_main.encode_message(event, *publisher_main.negotiate_codec(None))) == event
+
+
+def test_legacy_plain_json_still_decodes():
+    legacy = json.dumps({"topic": "t", "event_id": "1"})
+    assert codec.decode(legacy) == {"topic": "t", "event_id": "1"}
+    assert codec.decode(legacy.encode()) == {"topic": "t", "event_id": "1"}
+    assert unpack_message(legacy) == [{"topic": "t", "event_id": "1"}]
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_publisher_messages_decode_in_aggregator(name, compression):
+    data = publisher_main.encode_message(BIG_EVENT, name, compression)
+    assert codec.decode(data) == BIG_EVENT
+
+
+def test_negotiation_falls_back_to_json_without_advertisement():
+    assert codec.negotiate(None, "zstd") == ("json", "none")
+    assert publisher_main.negotiate_codec(None)[0] == "json"
+
+
+def test_negotiation_picks_common_codec_and_configured_compression():
+    assert codec.negotiate("json,zlib,msgpack,zstd") == ("msgpack", "none")
+    assert codec.negotiate("json,zlib,msgpack,zstd", "zlib") == ("msgpack", "zlib")
+    assert codec.negotiate(b"json,zlib", "zstd") == ("json", "zlib")
+
+
+@pytest.mark.parametrize("advertised", [None, "json", "json,zlib", "json,zlib,msgpack", "json,zlib,msgpack,zstd"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_publisher_negotiates_like_aggregator(advertised, compression):
+    assert publisher_main.negotiate_codec(advertised, compression) == codec.negotiate(advertised, compression)
+
+
+def test_advertisement_is_the_intersection_of_live_replicas():
+    client = fakeredis.FakeRedis()
+    assert codec.advertised_codecs(client, "events") is None
+
+    codec.advertise(client, "events", "new", ttl=60)
+    client.set(codec.codecs_key("events", "old"), "json,zlib", ex=60)
+
+    assert codec.advertised_codecs(client, "events") == "json,zlib"
+    assert 0 < client.ttl(codec.codecs_key("events", "new")) <= 60
+    # Replica lama berhenti -> iklannya kedaluwarsa, codec baru boleh dipakai
+    client.delete(codec.codecs_key("events", "old"))
+    assert codec.advertised_codecs(client, "events") == codec.common_codecs([codec.advertisement()])
+
+
+def test_advertise_then_publisher_negotiates(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    codec.advertise(client, "events", "a1", ttl=60)
+    client.set(codec.codecs_key("events", "a2"), "json,zlib,msgpack", ex=60)
+
+    advertised = publisher_main.advertised_codecs(client, "events")
+    assert advertised == codec.advertised_codecs(client, "events")
+    assert publisher_main.negotiate_codec(advertised, "zstd") == ("msgpack", "zlib")
+
+
+def test_binary_envelope_through_broker():
+    client = fakeredis.FakeRedis()  # tanpa decode_responses, seperti aggregator
+    pubsub = client.pubsub()
+    pubsub.subscribe("events")
+    pubsub.get_message(timeout=1)
+
+    events = [dict(BIG_EVENT, event_id=str(i)) for i in range(3)]
+    for message in pack_events(events, codec_name="msgpack", compression="zstd"):
+        client.publish("events", message)
+
+    received = unpack_message(pubsub.get_message(timeout=1)["data"])
+    assert received == events
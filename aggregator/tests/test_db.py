@@ -99,4 +99,137 @@ def test_get_events_nonexistent_topic():
     assert isinstance(events, list)
     
     # Verify list is empty
-    assert len(events) == 0
\ No newline at end of file
+    assert len(events) == 0
+
+
+def test_insert_events_batch_ignores_duplicates():
+    """Batch insert: duplikat di dalam batch maupun yang sudah ada di DB diabaikan"""
+    topic = "batch_insert"
+    db.insert_event(topic, "b0")
+
+    inserted = db.insert_events([
+        {"topic": topic, "event_id": "b0"},
+        {"topic": topic, "event_id": "b1"},
+        {"topic": topic, "event_id": "b2"},
+        {"topic": topic, "event_id": "b2"},
+    ])
+
+    assert inserted == 2
+    assert len(db.get_events(topic)) == 3
+
+
+def test_insert_event_is_idempotent():
+    assert db.insert_event("idem", "x1") is True
+    assert db.insert_event("idem", "x1") is False
+    assert len(db.get_events("idem")) == 1
+
+
+def test_stats_counters_follow_inserts():
+    before = dict(db.get_stats()).get("counter_test", 0)
+
+    db.insert_events([
+        {"topic": "counter_test", "event_id": "c1"},
+        {"topic": "counter_test", "event_id": "c2"},
+        {"topic": "counter_test", "event_id": "c2"},
+    ])
+    db.insert_event("counter_test", "c1")
+
+    assert dict(db.get_stats())["counter_test"] == before + 2
+
+
+def test_init_db_seeds_counters_from_existing_rows(db_session):
+    # Simulasi database lama: row ada, counter belum ada
+    db_session.add(ProcessedEvent(topic="legacy_topic", event_id="l1"))
+    db_session.query(db.TopicStat).delete()
+    db_session.commit()
+
+    db.init_db()
+
+    stats = dict(db.get_stats())
+    assert stats["legacy_topic"] == 1
+    assert sum(stats.values()) == db_session.query(ProcessedEvent).count()
+
+
+def test_payload_source_and_event_timestamp_are_stored():
+    payload = {"message": "hello " * 200, "n": 1}
+    db.insert_events([{
+        "topic": "payload_topic",
+        "event_id": "p1",
+        "timestamp": "2024-05-01T10:00:00Z",
+        "source": "sensor-7",
+        "payload": payload,
+    }])
+
+    # Default: kolom ringan saja, payload tidak dibaca
+    plain = db.get_events("payload_topic")[0]
+    assert "payload" not in plain and "source" not in plain
+
+    full = db.get_events("payload_topic", fields=["source", "event_timestamp", "payload"])[0]
+    assert full["source"] == "sensor-7"
+    assert full["payload"] == payload
+    assert full["event_timestamp"].replace(tzinfo=None).isoformat() == "2024-05-01T10:00:00"
+
+
+def test_large_payload_is_stored_compressed(db_session):
+    payload = {"message": "abc" * 1000}
+    db.insert_events([{"topic": "payload_blob", "event_id": "b1", "payload": payload}])
+
+    blob = db_session.query(ProcessedEvent.payload).filter_by(topic="payload_blob").scalar()
+    assert len(blob) < len(str(payload)) / 10
+    assert db.unpack_payload(blob) == payload
+
+
+def test_invalid_event_timestamp_is_stored_as_null():
+    db.insert_events([{"topic": "bad_ts", "event_id": "t1", "timestamp": "yesterday"}])
+    assert db.get_events("bad_ts", fields=["event_timestamp"])[0]["event_timestamp"] is None
+
+
+def test_init_db_adds_payload_columns_to_old_table():
+    from sqlalchemy import inspect, text
+
+    old_engine = create_engine("sqlite:///:memory:")
+    with old_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE processed_events (id INTEGER PRIMARY KEY, topic VARCHAR NOT NULL, "
+            "event_id VARCHAR NOT NULL, timestamp DATETIME NOT NULL)"
+        ))
+        db._add_missing_columns(conn)
+        columns = {c["name"] for c in inspect(conn).get_columns("processed_events")}
+
+    assert {"source", "event_timestamp", "payload"} <= columns
+
+
+def test_rollups_follow_event_timestamp_at_minute_and_hour_grain():
+    from datetime import datetime
+
+    db.insert_events([
+        {"topic": "rollup", "event_id": "r1", "timestamp": "2024-03-01T10:00:05Z"},
+        {"topic": "rollup", "event_id": "r2", "timestamp": "2024-03-01T10:00:55Z"},
+        {"topic": "rollup", "event_id": "r3", "timestamp": "2024-03-01T10:01:10+00:00"},
+        # Timezone lain dinormalisasi ke UTC
+        {"topic": "rollup", "event_id": "r4", "timestamp": "2024-03-01T12:30:00+02:00"},
+    ])
+    # Duplikat tidak menambah rollup
+    db.insert_events([{"topic": "rollup", "event_id": "r1", "timestamp": "2024-03-01T10:00:05Z"}])
+
+    start, end = datetime(2024, 3, 1, 10), datetime(2024, 3, 1, 11)
+    minutes = db.get_timeseries("1m", start, end, "rollup")
+    assert [(p["bucket_start"].minute, p["count"]) for p in minutes] == [(0, 2), (1, 1), (30, 1)]
+
+    hours = db.get_timeseries("1h", start, end, "rollup")
+    assert [(p["bucket_start"].hour, p["count"]) for p in hours] == [(10, 4)]
+
+
+def test_init_db_seeds_rollups_from_existing_rows(db_session):
+    from datetime import datetime
+
+    db_session.add(ProcessedEvent(
+        topic="legacy_rollup", event_id="l1", event_timestamp=datetime(2023, 1, 1, 8, 15)
+    ))
+    db_session.query(db.TopicBucket).delete()
+    db_session.commit()
+
+    db.init_db()
+
+    hours = db.get_timeseries("1h", datetime(2023, 1, 1), datetime(2023, 1, 2), "legacy_rollup")
+    assert [(p["bucket_start"].hour, p["count"]) for p in hours] == [(8, 1)]
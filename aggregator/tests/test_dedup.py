@@ -0,0 +1,58 @@
+from src.api.worker.dedup import DedupFilter
+from tests.helpers import event
+
+
+def test_known_events_are_filtered_after_commit():
+    f = DedupFilter(capacity=10)
+
+    fresh = f.filter([event("1"), event("2")])
+    assert len(fresh) == 2
+    f.remember(fresh, inserted=2)
+
+    assert f.filter([event("1"), event("3")]) == [event("3")]
+    stats = f.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+
+
+def test_same_event_id_on_other_topic_is_not_a_duplicate():
+    f = DedupFilter(capacity=10)
+    f.remember([event("1", topic="a")], inserted=1)
+
+    assert f.filter([event("1", topic="b")]) == [event("1", topic="b")]
+
+
+def test_capacity_is_bounded_with_lru_eviction():
+    f = DedupFilter(capacity=2)
+    f.remember([event("1"), event("2")], inserted=2)
+    f.filter([event("1")])  # "1" jadi paling baru dipakai
+    f.remember([event("3")], inserted=1)
+
+    assert f.stats()["size"] == 2
+    assert f.stats()["evictions"] == 1
+    # "2" yang dibuang, bukan "1"
+    assert f.filter([event("1"), event("2")]) == [event("2")]
+
+
+def test_db_duplicates_counted_from_insert_result():
+    f = DedupFilter(capacity=10)
+    f.remember([event("1"), event("2")], inserted=1)
+    assert f.stats()["db_duplicates"] == 1
+
+
+def test_worker_persist_skips_db_for_known_duplicates(monkeypatch):
+    import src.main as main
+
+    calls = []
+
+    def fake_insert(events):
+        calls.append(list(events))
+        return len(events)
+
+    monkeypatch.setattr(main, "insert_events", fake_insert)
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter(capacity=10))
+
+    main.persist_events([event("a"), event("b")])
+    main.persist_events([event("a"), event("b"), event("c")])
+
+    assert calls[1] == [event("c")]
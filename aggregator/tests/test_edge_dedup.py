@@ -0,0 +1,101 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+import src.main as main
+from src.api import metrics
+from src.broker.edge_dedup import EdgeDedup, claim_key
+from tests.helpers import event
+
+
+def test_claim_is_set_nx_with_ttl():
+    client = fakeredis.FakeRedis()
+    dedup = EdgeDedup(ttl_seconds=60)
+
+    assert dedup.claim(client, [event("1"), event("2")]) == [event("1"), event("2")]
+    assert dedup.claim(client, [event("2"), event("3")]) == [event("3")]
+    assert 0 < client.ttl(claim_key(dedup.prefix, event("1"))) <= 60
+
+    # Topic dengan ":" tidak bertabrakan dengan topic lain
+    assert dedup.claim(client, [{"topic": "a:b", "event_id": "c"}, {"topic": "a", "event_id": "b:c"}]) != []
+    assert len(dedup.claim(client, [{"topic": "a", "event_id": "b:c"}])) == 0
+
+
+def test_release_allows_retry():
+    client = fakeredis.FakeRedis()
+    dedup = EdgeDedup(ttl_seconds=60)
+    dedup.claim(client, [event("1")])
+    dedup.release(client, [event("1")])
+    assert dedup.claim(client, [event("1")]) == [event("1")]
+
+
+def test_async_claim():
+    async def run():
+        client = fakeredis.FakeAsyncRedis()
+        dedup = EdgeDedup(ttl_seconds=60)
+        first = await dedup.claim_async(client, [event("1")])
+        second = await dedup.claim_async(client, [event("1"), event("2")])
+        await dedup.release_async(client, second)
+        third = await dedup.claim_async(client, [event("2")])
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == [event("1")]
+    assert second == [event("2")]
+    assert third == [event("2")]
+
+
+def test_publish_drops_events_claimed_by_another_replica(client, monkeypatch):
+    server = fakeredis.FakeServer()
+    broker = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(main, "redis_client", broker)
+    monkeypatch.setattr(main, "edge_dedup", EdgeDedup(ttl_seconds=60))
+    pubsub = broker.pubsub()
+    pubsub.subscribe(main.CHANNEL_NAME)
+    pubsub.get_message(timeout=1)
+
+    # Replica lain sudah menerima event "a"
+    EdgeDedup(ttl_seconds=60).claim(fakeredis.FakeRedis(server=server), [event("a")])
+    before = metrics.EVENTS_DEDUPLICATED.value("test_topic", "edge")
+
+    body = client.post("/publish", json=[event("a"), event("b")]).json()
+    assert (body["published"], body["duplicates_in_window"]) == (1, 1)
+    assert metrics.EVENTS_DEDUPLICATED.value("test_topic", "edge") == before + 1
+
+    body = client.post("/publish", json=[event("a"), event("b")]).json()
+    assert (body["published"], body["duplicates_in_window"]) == (0, 2)
+
+    assert pubsub.get_message(timeout=1) is not None
+    assert pubsub.get_message(timeout=0.1) is None
+
+
+def test_failed_publish_releases_claims(client, monkeypatch):
+    broker = fakeredis.FakeRedis()
+    dedup = EdgeDedup(ttl_seconds=60)
+    monkeypatch.setattr(main, "redis_client", broker)
+    monkeypatch.setattr(main, "edge_dedup", dedup)
+
+    class BrokenTransport:
+        def send_batches(self, batches):
+            raise ConnectionError("broker down")
+
+    monkeypatch.setattr(main, "make_transport", lambda client, channel: BrokenTransport())
+    with pytest.raises(ConnectionError):
+        client.post("/publish", json=event("retry"))
+    assert not broker.exists(claim_key(dedup.prefix, event("retry")))
+
+
+def test_publisher_uses_the_same_claims():
+    from tests.test_publisher import EventPublisher
+
+    server = fakeredis.FakeServer()
+    pub = EventPublisher("http://test", edge_dedup_ttl=60)
+    pub.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    assert len(pub.publish_batch([("test_topic", "p1"), ("test_topic", "p2")])) == 2
+    assert pub.publish_batch([("test_topic", "p1")]) == []
+    assert pub.publish("test_topic", "p2") is None
+    # Aggregator melihat klaim yang sama
+    claimed = EdgeDedup(ttl_seconds=60).claim(fakeredis.FakeRedis(server=server), [event("p1")])
+    assert claimed == []
@@ -0,0 +1,107 @@
+import fakeredis
+import pytest
+
+import src.main as main
+from src.api import metrics
+from src.broker.envelope import pack_events
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("demo_total", "Demo counter.", ["topic"]))
+    histogram = registry.register(metrics.Histogram("demo_seconds", "Demo histogram.", buckets=(0.1, 1)))
+
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc_many({("b",): 5})
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{topic="a"} 3' in text
+    assert 'demo_total{topic="b"} 5' in text
+    # Bucket kumulatif, +Inf = count
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+    assert "demo_seconds_sum 3.55" in text
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("escape_total", "Escaping.", ["topic"])
+    counter.inc('a"b\\c\nd')
+    assert 'escape_total{topic="a\\"b\\\\c\\nd"} 1' in counter.render()
+
+
+def test_topic_labels_are_capped():
+    labels = metrics._TopicLabels(limit=2)
+    assert [labels(t) for t in ["a", "b", "c", "a"]] == ["a", "b", metrics.OTHER_TOPIC, "a"]
+
+
+def test_gauge_callback_failure_does_not_break_scrape():
+    gauge = metrics.Gauge("broken_gauge", "Broken.")
+
+    def boom():
+        raise RuntimeError("redis down")
+
+    gauge.set_function(boom)
+    assert gauge.render() == ["# HELP broken_gauge Broken.", "# TYPE broken_gauge gauge"]
+
+
+def test_metrics_endpoint_counts_publish(client, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", fakeredis.FakeRedis())
+    before = metrics.EVENTS_DEDUPLICATED.value("metrics_topic", "request")
+
+    event = {
+        "topic": "metrics_topic",
+        "event_id": "m-1",
+        "timestamp": "2024-01-01T00:00:00Z",
+        "source": "test",
+    }
+    client.post("/publish", json=[event, event])
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'aggregator_events_received_total{topic="metrics_topic"}' in response.text
+    assert 'aggregator_events_published_total{topic="metrics_topic"}' in response.text
+    assert metrics.EVENTS_DEDUPLICATED.value("metrics_topic", "request") == before + 1
+
+
+def test_pipeline_records_insert_dedup_and_decode_failures(client, monkeypatch):
+    topic = "metrics_pipeline"
+    monkeypatch.setattr(main, "dedup_filter", main.DedupFilter())
+    inserted_before = metrics.EVENTS_INSERTED.value(topic)
+    filtered_before = metrics.EVENTS_DEDUPLICATED.value(topic, "filter")
+    failed_before = metrics.EVENTS_FAILED.value("unknown", "decode")
+    inserts_before, _ = metrics.DB_INSERT_SECONDS.snapshot()
+
+    events = [{"topic": topic, "event_id": str(i)} for i in range(3)]
+    main.persist_events(events)
+    main.persist_events(events)
+
+    assert metrics.EVENTS_INSERTED.value(topic) == inserted_before + 3
+    assert metrics.EVENTS_DEDUPLICATED.value(topic, "filter") == filtered_before + 3
+    assert metrics.DB_INSERT_SECONDS.snapshot()[0] == inserts_before + 1
+
+    with pytest.raises(Exception):
+        main.decode_message(b"\x01\x09\x00garbage")
+    assert metrics.EVENTS_FAILED.value("unknown", "decode") == failed_before + 1
+
+
+def test_consumer_lag_reports_stream_backlog(monkeypatch):
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(main, "redis_client", fake)
+    monkeypatch.setattr(main, "BROKER_TRANSPORT", "streams")
+
+    transport = main.StreamTransport(fake, stream="events", consumer="c1", block_ms=10, count=1)
+    transport.ensure_group()
+    transport.send(pack_events([{"topic": "t", "event_id": str(i)} for i in range(2)], max_events=1))
+    transport.read()
+
+    lag = main.consumer_lag()
+    assert lag[("events", "pending")] == 1
+    assert lag[("events", "undelivered")] == 1
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import src.api.worker.processor.db as db
+from src.api.worker.processor.bulk import merge_sql
+from src.api.worker.processor.partitions import TimePartitions, next_period, period_start
+from tests.helpers import events
+
+
+@pytest.fixture
+def partitioned_db(monkeypatch):
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "read_engine", None)
+    monkeypatch.setattr(db, "SessionLocal", scoped_session(sessionmaker(bind=engine)))
+    monkeypatch.setattr(db, "EVENTS_PARTITION_INTERVAL", "day")
+    monkeypatch.setattr(db, "EVENTS_PARTITION_PREMAKE", 2)
+    monkeypatch.setattr(db, "EVENTS_RETENTION_DAYS", 7)
+    monkeypatch.setattr(db, "EVENTS_DEDUP_WINDOW_DAYS", 7)
+    db.init_db()
+    yield engine
+    engine.dispose()
+
+
+def test_period_boundaries():
+    value = datetime(2024, 12, 18, 13, 45)
+    assert period_start(value, "day") == datetime(2024, 12, 18)
+    assert period_start(value, "week") == datetime(2024, 12, 16)
+    assert period_start(value, "month") == datetime(2024, 12, 1)
+    assert next_period(datetime(2024, 12, 1), "month") == datetime(2025, 1, 1)
+    with pytest.raises(ValueError):
+        period_start(value, "year")
+
+
+def test_postgresql_ddl_uses_native_range_partitions():
+    partitions = TimePartitions(db.ProcessedEvent.__table__, "day")
+    dialect = postgresql.dialect()
+    parent = partitions.parent_ddl(dialect)[0]
+    assert "PARTITION BY RANGE (timestamp)" in parent
+    assert "PRIMARY KEY (id, timestamp)" in parent
+    assert partitions.partition_ddl(dialect, datetime(2024, 12, 18)) == [
+        "CREATE TABLE IF NOT EXISTS processed_events_p20241218 PARTITION OF processed_events "
+        "FOR VALUES FROM ('2024-12-18 00:00:00') TO ('2024-12-19 00:00:00')"
+    ]
+    assert "JOIN src USING (topic, event_id)" in merge_sql("staging", partitioned=True)
+
+
+def test_init_creates_view_over_current_and_upcoming_partitions(partitioned_db):
+    today = period_start(datetime.utcnow(), "day")
+    names = [f"processed_events_p{today + timedelta(days=i):%Y%m%d}" for i in range(3)]
+    tables = inspect(partitioned_db).get_table_names()
+    assert set(names) <= set(tables)
+    assert "processed_events" in inspect(partitioned_db).get_view_names()
+    assert "event_keys" in tables
+
+
+def test_insert_dedups_through_event_keys(partitioned_db):
+    assert db.insert_events_keys(events("a", "b", "a")) == [("test_topic", "a"), ("test_topic", "b")]
+    assert db.insert_events(events("b", "c")) == 1
+
+    rows = db.get_events("test_topic")
+    assert [r["event_id"] for r in rows] == ["a", "b", "c"]
+    assert [r["id"] for r in rows] == sorted({r["id"] for r in rows})
+    assert db.get_stats() == [("test_topic", 3)]
+
+
+def test_retention_drops_whole_partitions_and_keys(partitioned_db, monkeypatch):
+    db.insert_events(events("old"))
+    later = datetime.utcnow() + timedelta(days=10)
+
+    report = db.run_partition_maintenance(now=later)
+    today = period_start(datetime.utcnow(), "day")
+    assert f"processed_events_p{today:%Y%m%d}" in report["dropped"]
+    assert report["keys_pruned"] == 1
+    assert db.get_events("test_topic") == []
+    # Partisi untuk periode "later" sudah disiapkan
+    with partitioned_db.connect() as conn:
+        assert f"processed_events_p{period_start(later, 'day'):%Y%m%d}" in db.event_partitions().partitions(conn)
+
+
+def test_dedup_window_outlives_retention(partitioned_db, monkeypatch):
+    monkeypatch.setattr(db, "EVENTS_DEDUP_WINDOW_DAYS", 30)
+    db.insert_events(events("kept-key"))
+    db.run_partition_maintenance(now=datetime.utcnow() + timedelta(days=10))
+    # Row sudah dibuang, tapi key masih dalam jendela -> tetap duplikat
+    assert db.insert_events(events("kept-key")) == 0
+
+
+def test_pruned_keys_are_forgotten_by_dedup_filter(partitioned_db):
+    from src.api.worker.dedup import DedupFilter
+
+    dedup_filter = DedupFilter()
+    dedup_filter.remember(events("gone"), db.insert_events(events("gone")))
+    db.run_partition_maintenance(now=datetime.utcnow() + timedelta(days=10))
+
+    assert dedup_filter.stats()["size"] == 0
+    # Key sudah dipangkas dari event_keys -> keputusan kembali ke DB
+    assert dedup_filter.filter(events("gone")) == events("gone")
+
+
+def test_detach_keeps_the_table(partitioned_db, monkeypatch):
+    monkeypatch.setattr(db, "EVENTS_RETENTION_MODE", "detach")
+    db.insert_events(events("archived"))
+    report = db.run_partition_maintenance(now=datetime.utcnow() + timedelta(days=10))
+    name = report["dropped"][0]
+    with partitioned_db.connect() as conn:
+        count = conn.execute(text(f"SELECT count(*) FROM {name}_detached")).scalar()
+    assert count == 1
+    assert db.get_events("test_topic") == []
+
+
+def test_refuses_to_partition_an_existing_plain_table(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    db.Base.metadata.tables["processed_events"].create(engine)
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "EVENTS_PARTITION_INTERVAL", "day")
+    with pytest.raises(RuntimeError, match="plain table"):
+        db.init_db()
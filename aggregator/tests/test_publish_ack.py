@@ -0,0 +1,67 @@
+import src.main as main
+import src.api.worker.processor.db as db
+from src.api.worker.dedup import DedupFilter
+from tests.helpers import event
+
+
+def statuses(response):
+    return [(r["event_id"], r["status"]) for r in response.json()["results"]]
+
+
+def test_persisted_ack_reports_status_per_event_without_redis(client, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter())
+
+    res = client.post("/publish?ack=persisted", json=[event("a"), event("b"), event("a")])
+    assert res.status_code == 200
+    body = res.json()
+    assert statuses(res) == [("a", "inserted"), ("b", "inserted"), ("a", "duplicate")]
+    assert (body["received"], body["inserted"], body["duplicates"], body["failed"]) == (3, 2, 1, 0)
+    # Sudah commit saat response diterima
+    assert [e["event_id"] for e in db.get_events("test_topic")] == ["a", "b"]
+
+
+def test_persisted_ack_detects_duplicates_already_stored(client, monkeypatch):
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter())
+    db.insert_events([event("old")])
+
+    res = client.post("/publish?ack=persisted", json=[event("old"), event("new")])
+    assert statuses(res) == [("old", "duplicate"), ("new", "inserted")]
+
+    # Kedua kalinya ditolak oleh filter di memori, hasilnya tetap sama
+    res = client.post("/publish?ack=persisted", json=event("new"))
+    assert statuses(res) == [("new", "duplicate")]
+
+
+def test_persisted_ack_marks_events_failed_on_db_error(client, monkeypatch):
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter())
+
+    def broken(events, timeout_ms=None):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(main, "insert_events_keys", broken)
+    res = client.post("/publish?ack=persisted", json=[event("x"), event("y")])
+    assert res.status_code == 200
+    assert statuses(res) == [("x", "failed"), ("y", "failed")]
+    assert res.json()["failed"] == 2
+
+
+def test_persisted_ack_returns_504_when_outcome_unknown(client, monkeypatch):
+    import time
+
+    monkeypatch.setattr(main, "dedup_filter", DedupFilter())
+    monkeypatch.setattr(main, "PUBLISH_ACK_TIMEOUT_MS", 0)
+    monkeypatch.setattr(main, "insert_events_keys", lambda events, timeout_ms=None: time.sleep(1.5))
+
+    res = client.post("/publish?ack=persisted", json=event("slow"))
+    assert res.status_code == 504
+
+
+def test_unknown_ack_mode_is_rejected(client):
+    assert client.post("/publish?ack=eventually", json=event("a")).status_code == 422
+
+
+def test_statement_timeout_only_on_postgresql():
+    assert db.statement_timeout_sql("postgresql", 250) == "SET LOCAL statement_timeout = 250"
+    assert db.statement_timeout_sql("sqlite", 250) is None
+    assert db.statement_timeout_sql("postgresql", None) is None
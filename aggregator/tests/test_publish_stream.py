@@ -0,0 +1,109 @@
+import json
+
+import fakeredis
+import pytest
+
+import src.main as main
+from src.broker.envelope import unpack_message
+from src.broker.spool import PublishSpool
+from tests.helpers import event
+
+
+def line(event_id, topic="test_topic", **extra):
+    return json.dumps(event(event_id, topic, **extra))
+
+
+def ndjson(*lines):
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_validate_lines_reports_each_bad_line():
+    without_source = {k: v for k, v in event("1").items() if k != "source"}
+    lines = [
+        json.dumps(without_source),
+        '{"topic": "t"',
+        json.dumps({"topic": "t", "event_id": "x"}),
+        # Dua objek di satu baris tidak boleh menggeser index baris lain
+        '{"topic": "t"},{"event_id": "y"}',
+        line("2", timestamp="not-a-time"),
+        line("3", payload={"k": 1}),
+    ]
+    events, errors = main.validate_lines(list(enumerate((l.encode() for l in lines), start=1)))
+
+    assert [e["event_id"] for e in events] == ["1", "3"]
+    assert events[0]["timestamp"] == "2024-01-01T00:00:00Z"
+    assert events[0]["source"] == "unknown"
+    assert events[1]["payload"] == {"k": 1}
+    assert [n for n, _ in errors] == [2, 3, 4, 5]
+    assert errors[0][1].startswith("invalid JSON")
+    assert errors[1][1].startswith("timestamp:")
+
+
+def test_clean_chunk_is_validated_in_one_call(monkeypatch):
+    calls = []
+    adapter = main.EVENT_LIST_ADAPTER
+
+    class Spy:
+        def validate_python(self, items):
+            calls.append(len(items))
+            return adapter.validate_python(items)
+
+        def dump_python(self, *args, **kwargs):
+            return adapter.dump_python(*args, **kwargs)
+
+    monkeypatch.setattr(main, "EVENT_LIST_ADAPTER", Spy())
+    events, errors = main.validate_lines([(i, line(str(i)).encode()) for i in range(50)])
+    assert len(events) == 50 and errors == []
+    assert calls == [50]
+
+
+@pytest.fixture
+def broker(client, monkeypatch):
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(main, "redis_client", server)
+    pubsub = server.pubsub()
+    pubsub.subscribe(main.CHANNEL_NAME)
+    pubsub.get_message(timeout=1)
+    return pubsub
+
+
+def messages(pubsub):
+    out = []
+    while True:
+        message = pubsub.get_message(timeout=0.1)
+        if message is None:
+            return out
+        if message["type"] == "message":
+            out.append([e["event_id"] for e in unpack_message(message["data"])])
+
+
+def test_stream_forwards_per_chunk_and_reports_lines(client, broker, monkeypatch):
+    monkeypatch.setattr(main, "PUBLISH_STREAM_CHUNK_SIZE", 2)
+    body = ndjson(line("1"), line("2"), "", "garbage", line("3"), line("1"), line("4"))
+    res = client.post("/publish/stream", content=body, headers={"content-type": "application/x-ndjson"})
+
+    assert res.status_code == 200
+    data = res.json()
+    assert data["received"] == 6
+    assert data["published"] == 4
+    assert data["duplicates_in_request"] == 1
+    assert data["invalid"] == 1
+    assert len(data["errors"]) == 1 and data["errors"][0].startswith("line 4: invalid JSON")
+    # Satu pesan broker per chunk, dikirim sebelum body selesai diproses
+    assert messages(broker) == [["1", "2"], ["3"], ["4"]]
+
+
+def test_stream_goes_through_spool_when_enabled(tmp_path, request, monkeypatch):
+    spool = PublishSpool(str(tmp_path / "spool"), fsync_ms=0)
+    monkeypatch.setattr(main, "publish_spool", spool)
+    monkeypatch.setattr(main, "redis_client", None)
+    client = request.getfixturevalue("client")
+
+    res = client.post("/publish/stream", content=ndjson(line("a"), line("b")))
+    assert res.json()["spooled"] == 2
+    assert [e["event_id"] for e in spool.read_batch().events] == ["a", "b"]
+
+
+def test_stream_without_broker_is_503(client, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", None)
+    assert client.post("/publish/stream", content=ndjson(line("1"))).status_code == 503
@@ -1,6 +1,8 @@
 import os
 import sys
 
+import pytest
+
 # =====================================================
 # FIX PATH AGAR PUBLISHER BISA DIIMPORT
 # =====================================================
@@ -31,3 +33,183 @@ def test_payload_contains_data_dict():
     )
     assert isinstance(event["payload"]["data"], dict)
 
+
+def test_publish_batch_uses_envelope_understood_by_aggregator():
+    import fakeredis
+    from src.broker.envelope import unpack_message
+
+    pub = EventPublisher("http://test")
+    pub.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    pubsub = pub.redis_client.pubsub()
+    pubsub.subscribe(pub.channel_name)
+    pubsub.get_message(timeout=1)
+
+    sent = pub.publish_batch([("unit", 1), ("unit", 2), ("unit", 1)], source="tester")
+    assert len(sent) == 2
+
+    message = pubsub.get_message(timeout=1)
+    events = unpack_message(message["data"])
+    assert [(e["topic"], e["event_id"]) for e in events] == [("unit", "1"), ("unit", "2")]
+
+
+# =====================================================
+# AUTO-BATCHING PRODUCER
+# =====================================================
+def subscribed_publisher(server=None):
+    import fakeredis
+
+    pub = EventPublisher("http://test")
+    pub.redis_client = fakeredis.FakeRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+    pubsub = pub.redis_client.pubsub()
+    pubsub.subscribe(pub.channel_name)
+    pubsub.get_message(timeout=1)
+    return pub, pubsub
+
+
+def received(pubsub):
+    from src.broker.envelope import unpack_message
+
+    messages = []
+    while True:
+        message = pubsub.get_message(timeout=0.1)
+        if message is None:
+            return messages
+        messages.append([e["event_id"] for e in unpack_message(message["data"])])
+
+
+def test_producer_sends_full_batch_as_one_envelope():
+    pub, pubsub = subscribed_publisher()
+    with pub.producer(batch_size=3, linger_ms=60000) as producer:
+        futures = [producer.send("unit", i) for i in range(3)]
+        assert [f.result(timeout=2)["event_id"] for f in futures] == ["0", "1", "2"]
+
+    assert received(pubsub) == [["0", "1", "2"]]
+    stats = producer.stats.snapshot()
+    assert (stats["batches"], stats["events"], stats["batch_size"]["max"]) == (1, 3, 3)
+
+
+def test_producer_sends_partial_batch_after_linger():
+    pub, pubsub = subscribed_publisher()
+    producer = pub.producer(batch_size=100, linger_ms=10)
+    future = producer.send("unit", "solo")
+    assert future.result(timeout=2)["event_id"] == "solo"
+    producer.close()
+    assert received(pubsub) == [["solo"]]
+
+
+def test_producer_flush_and_close_drain_everything():
+    pub, pubsub = subscribed_publisher()
+    producer = pub.producer(batch_size=2, linger_ms=60000)
+    futures = [producer.send("unit", i) for i in range(5)]
+
+    assert producer.flush(timeout=2)
+    assert all(f.done() for f in futures)
+    assert producer.pending() == 0
+    assert received(pubsub) == [["0", "1"], ["2", "3"], ["4"]]
+
+    producer.close()
+    with pytest.raises(RuntimeError):
+        producer.send("unit", "late")
+
+
+def test_producer_failed_send_fails_the_futures():
+    class BrokenRedis:
+        def pipeline(self, transaction=False):
+            raise ConnectionError("redis down")
+
+    pub = EventPublisher("http://test")
+    pub.redis_client = BrokenRedis()
+    with pub.producer(batch_size=2, linger_ms=60000) as producer:
+        futures = [producer.send("unit", i) for i in range(2)]
+        with pytest.raises(ConnectionError):
+            futures[0].result(timeout=2)
+    assert producer.stats.snapshot()["errors"] == 1
+
+
+def test_async_producer_batches_on_the_event_loop():
+    import asyncio
+
+    import fakeredis
+    from publisher.src.main import AsyncBatchingProducer
+
+    server = fakeredis.FakeServer()
+    pub, pubsub = subscribed_publisher(server)
+
+    async def run():
+        client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        async with AsyncBatchingProducer(pub, client=client, batch_size=2, linger_ms=60000) as producer:
+            futures = [await producer.send("unit", i) for i in range(3)]
+            sent = await asyncio.gather(*futures[:2])
+            await producer.flush()
+            assert futures[2].done()
+        return [e["event_id"] for e in sent], producer.stats.snapshot()
+
+    ids, stats = asyncio.run(run())
+    assert ids == ["0", "1"]
+    assert stats["batches"] == 2
+    assert received(pubsub) == [["0", "1"], ["2"]]
+
+
+# =====================================================
+# LOAD GENERATOR
+# =====================================================
+def loadgen_config(*args):
+    from publisher.src import loadgen
+
+    return loadgen.parse_args(["--seed", "7", *args])
+
+
+def test_zipf_sampler_prefers_low_ranks_and_uniform_at_zero():
+    import random
+    from collections import Counter
+
+    from publisher.src.loadgen import ZipfSampler
+
+    skewed_sampler = ZipfSampler(10, 1.5, random.Random(1))
+    skewed = Counter(skewed_sampler() for _ in range(5000))
+    assert skewed[0] > skewed[1] > skewed[5]
+    uniform_sampler = ZipfSampler(10, 0, random.Random(1))
+    uniform = Counter(uniform_sampler() for _ in range(5000))
+    assert min(uniform.values()) > 350
+
+
+def test_event_factory_duplicate_ratio_and_payload_size():
+    from publisher.src.loadgen import EventFactory
+
+    factory = EventFactory(loadgen_config("--duplicate-ratio", "0.3", "--payload-bytes", "64"), seed=3)
+    events = factory.batch(2000)
+    keys = [(e["topic"], e["event_id"]) for e in events]
+    assert 0.25 < 1 - len(set(keys)) / len(keys) < 0.35
+    assert factory.duplicates == len(keys) - len(set(keys))
+    assert len(events[0]["payload"]["data"]) == 64
+
+
+def test_run_worker_reports_acked_events_through_the_broker():
+    import queue
+
+    from publisher.src.loadgen import run_worker
+
+    pub, pubsub = subscribed_publisher()
+    results = queue.Queue()
+    config = loadgen_config("--rate", "0", "--duration", "0", "--count", "50", "--batch-size", "20")
+    run_worker(config, 0, results, publisher=pub)
+
+    kind, _, sent, errors, counts, generated, _ = results.get_nowait()
+    assert (kind, sent, errors, generated) == ("done", 50, 0, 50)
+    assert sum(counts.values()) == 50
+    assert sum(len(batch) for batch in received(pubsub)) == 50
+
+
+def test_latency_histogram_merges_fixed_buckets():
+    from publisher.src.loadgen import LatencyHistogram
+
+    histogram = LatencyHistogram()
+    histogram.record(1.0, 98)
+    other = LatencyHistogram()
+    other.record(100.0, 2)
+    histogram.merge(other.counts)
+    assert histogram.count == 100
+    assert len(histogram.counts) == 2
+    assert 1.0 <= histogram.percentile(50) < 1.1
+    assert 100.0 <= histogram.percentile(99) < 110.0
+    assert LatencyHistogram().percentile(99) == 0.0
@@ -0,0 +1,84 @@
+import fakeredis
+
+import src.main as main
+from src.broker import sharding
+from src.broker.envelope import unpack_message
+from publisher.src import main as publisher_main
+
+
+def test_shard_hash_is_stable_and_in_range():
+    assert sharding.shard_for("orders", 8) == sharding.shard_for("orders", 8)
+    assert all(0 <= sharding.shard_for(f"t{i}", 8) < 8 for i in range(100))
+    # Nilai tetap (CRC32), tidak tergantung PYTHONHASHSEED
+    assert sharding.shard_for("orders", 8) == 0xE52FFDEE % 8
+
+
+def test_publisher_and_aggregator_agree_on_shard():
+    topics = [f"topic-{i}" for i in range(200)] + ["ünïcode", ""]
+    for n in (1, 2, 3, 8, 16):
+        for topic in topics:
+            assert publisher_main.shard_for(topic, n) == sharding.shard_for(topic, n)
+
+
+def test_single_shard_keeps_legacy_channel_name():
+    assert sharding.shard_channel("events", 0, 1) == "events"
+    assert sharding.shard_channel("events", 3, 4) == "events:3"
+
+
+def test_group_by_shard_preserves_order_within_topic():
+    events = [{"topic": t, "event_id": str(i)} for i, t in enumerate("abcabcabc")]
+    groups = sharding.group_by_shard(events, 4)
+
+    for group in groups.values():
+        for topic in "abc":
+            ids = [e["event_id"] for e in group if e["topic"] == topic]
+            assert ids == sorted(ids, key=int)
+    assert sum(len(g) for g in groups.values()) == len(events)
+
+
+def test_publisher_routes_topic_to_shard_channel():
+    pub = publisher_main.EventPublisher("http://test")
+    pub.shard_count = 4
+    pub.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+    channel = pub.channel_for("orders")
+    shard = sharding.shard_for("orders", 4)
+    assert channel == sharding.shard_channel(main.CHANNEL_NAME, shard, 4)
+
+    pubsub = pub.redis_client.pubsub()
+    pubsub.subscribe(channel)
+    pubsub.get_message(timeout=1)
+
+    pub.publish_batch([("orders", 1), ("orders", 2)])
+    message = pubsub.get_message(timeout=1)
+    assert [e["event_id"] for e in unpack_message(message["data"])] == ["1", "2"]
+
+
+def test_publish_endpoint_splits_batch_across_shards(client, monkeypatch):
+    from datetime import datetime
+
+    monkeypatch.setattr(sharding, "SHARD_COUNT", 4)
+    fake = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(main, "redis_client", fake)
+
+    topics = ["orders", "payments", "users", "audit"]
+    pubsub = fake.pubsub()
+    channels = {sharding.shard_channel(main.CHANNEL_NAME, sharding.shard_for(t)) for t in topics}
+    pubsub.subscribe(*channels)
+    for _ in channels:
+        pubsub.get_message(timeout=1)
+
+    body = [
+        {"topic": t, "event_id": "1", "timestamp": datetime.utcnow().isoformat(), "source": "s"}
+        for t in topics
+    ]
+    assert client.post("/publish", json=body).status_code == 200
+
+    received = {}
+    while (message := pubsub.get_message(timeout=0.2)) is not None:
+        for event in unpack_message(message["data"]):
+            received[event["topic"]] = message["channel"]
+
+    assert received == {
+        t: sharding.shard_channel(main.CHANNEL_NAME, sharding.shard_for(t)) for t in topics
+    }
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import src.main as main
+from src.broker import spool as spool_mod
+from src.broker.envelope import unpack_message
+from src.broker.spool import PublishSpool, SpoolFull
+from tests.helpers import event
+
+
+def drain(spool):
+    out = []
+    while True:
+        batch = spool.read_batch(1000)
+        if batch is None:
+            return out
+        out.extend(e["event_id"] for e in batch.events)
+        spool.commit(batch.position)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = PublishSpool(str(tmp_path / "spool"), segment_bytes=200, fsync_ms=0)
+    spool.open()
+    yield spool
+    spool.close()
+
+
+def test_append_read_commit_rolls_and_deletes_segments(spool):
+    for i in range(6):
+        spool.append([event(str(i))])
+    segments = [n for n in os.listdir(spool.directory) if n.startswith("segment-")]
+    assert len(segments) > 1
+
+    batch = spool.read_batch(4)
+    assert [e["event_id"] for e in batch.events] == ["0", "1", "2", "3"]
+    assert not batch.replayed
+    # Belum di-commit -> dibaca ulang dari posisi yang sama
+    assert spool.read_batch(4).events == batch.events
+
+    spool.commit(batch.position)
+    assert drain(spool) == ["4", "5"]
+    assert spool.read_batch() is None
+    # Hanya segment aktif yang tersisa
+    assert len([n for n in os.listdir(spool.directory) if n.startswith("segment-")]) == 1
+
+
+def test_checkpoint_is_durable_before_segments_are_deleted(spool, monkeypatch):
+    for i in range(6):
+        spool.append([event(str(i))])
+    batch = spool.read_batch(4)
+
+    calls = []
+    real_fsync, real_remove = os.fsync, os.remove
+    monkeypatch.setattr(spool_mod.os, "fsync", lambda fd: (calls.append("fsync"), real_fsync(fd)))
+    monkeypatch.setattr(spool_mod.os, "remove", lambda path: (calls.append("remove"), real_remove(path)))
+    spool.commit(batch.position)
+
+    # fsync checkpoint.tmp + fsync direktori (rename) sebelum segment pertama dihapus
+    assert calls[:3] == ["fsync", "fsync", "remove"]
+
+
+def test_reopen_replays_unforwarded_records_and_skips_torn_tail(tmp_path):
+    directory = str(tmp_path / "spool")
+    first = PublishSpool(directory, fsync_ms=0)
+    first.open()
+    first.append([event("a"), event("b")])
+    first.commit(first.read_batch().position)
+    first.append([event("c")])
+    first.close()
+    # Crash di tengah menulis record: header utuh, body terpotong
+    segment = sorted(n for n in os.listdir(directory) if n.startswith("segment-"))[-1]
+    with open(os.path.join(directory, segment), "ab") as f:
+        f.write(spool_mod.RECORD_HEADER.pack(100, 0) + b"{trunc")
+
+    second = PublishSpool(directory, fsync_ms=0)
+    second.open()
+    try:
+        before = spool_mod.SPOOL_CORRUPT.value()
+        batch = second.read_batch()
+        assert [e["event_id"] for e in batch.events] == ["c"]
+        assert batch.replayed
+        assert spool_mod.SPOOL_CORRUPT.value() == before + 1
+        second.commit(batch.position)
+
+        second.append([event("d")])
+        batch = second.read_batch()
+        assert [e["event_id"] for e in batch.events] == ["d"]
+        assert not batch.replayed
+    finally:
+        second.close()
+
+
+def test_group_commit_shares_fsyncs(tmp_path, monkeypatch):
+    spool = PublishSpool(str(tmp_path / "spool"), fsync_ms=20)
+    spool.open()
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(spool_mod.os, "fsync", lambda fd: (calls.append(fd), real_fsync(fd)))
+
+    threads = [threading.Thread(target=spool.append, args=([event(str(i))],)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(drain(spool)) == 20
+    assert len(calls) < 10
+    spool.close()
+
+
+def test_full_spool_rejects(tmp_path):
+    spool = PublishSpool(str(tmp_path / "spool"), max_bytes=100, fsync_ms=0)
+    spool.open()
+    spool.append([event("1")])
+    with pytest.raises(SpoolFull):
+        spool.append([event("2"), event("3")])
+    spool.close()
+
+
+@pytest.fixture
+def spooled_client(request, tmp_path, monkeypatch):
+    spool = PublishSpool(str(tmp_path / "spool"), fsync_ms=0)
+    monkeypatch.setattr(main, "publish_spool", spool)
+    monkeypatch.setattr(main, "PUBLISH_SPOOL_RETRY_SECONDS", 0.02)
+    # Broker mati saat start; lifespan tetap membuka spool
+    monkeypatch.setattr(main, "redis_client", None)
+    return request.getfixturevalue("client"), spool
+
+
+def test_publish_returns_from_spool_and_forwarder_drains_later(spooled_client, monkeypatch):
+    client, spool = spooled_client
+
+    response = client.post("/publish", json=[event("1"), event("2"), event("1")])
+    assert response.status_code == 200
+    assert response.json()["spooled"] == 2
+    assert client.get("/stats").json()["publish_spool"]["pending_bytes"] > 0
+
+    # Broker kembali: forwarder mengirim isi spool
+    broker = fakeredis.FakeRedis()
+    pubsub = broker.pubsub()
+    pubsub.subscribe(main.CHANNEL_NAME)
+    pubsub.get_message(timeout=1)
+    monkeypatch.setattr(main, "redis_client", broker)
+
+    received = []
+    deadline = time.monotonic() + 5
+    while len(received) < 2 and time.monotonic() < deadline:
+        message = pubsub.get_message(timeout=0.1)
+        if message and message["type"] == "message":
+            received.extend(e["event_id"] for e in unpack_message(message["data"]))
+    assert sorted(received) == ["1", "2"]
+
+    deadline = time.monotonic() + 5
+    while spool.stats()["pending_bytes"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert spool.stats()["pending_bytes"] == 0
+
+
+def test_publish_503_when_spool_full(spooled_client):
+    client, spool = spooled_client
+    spool.max_bytes = 10
+    response = client.post("/publish", json=event("1"))
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
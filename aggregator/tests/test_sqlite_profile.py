@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import src.api.worker.processor.db as db
+
+
+@pytest.fixture
+def tuned_db(tmp_path, monkeypatch):
+    engine, read_engine = db.create_engines(f"sqlite:///{tmp_path / 'tuned.db'}", "tuned")
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "read_engine", read_engine)
+    monkeypatch.setattr(
+        db, "SessionLocal", scoped_session(sessionmaker(autoflush=False, bind=engine))
+    )
+    db.init_db()
+    yield engine, read_engine
+    engine.dispose()
+    read_engine.dispose()
+
+
+def test_default_profile_keeps_single_engine():
+    engine, read_engine = db.create_engines("sqlite:///./whatever.db", "default")
+    assert read_engine is None
+    engine.dispose()
+
+
+def test_tuned_profile_only_applies_to_sqlite_files():
+    assert db.create_engines("sqlite:///:memory:", "tuned")[1] is None
+    assert db.is_sqlite_file("sqlite:////var/lib/agg/events.db")
+    assert not db.is_sqlite_file("postgresql://u:p@db/x")
+
+
+def test_tuned_writer_uses_wal_and_a_single_connection(tuned_db):
+    engine, _ = tuned_db
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # synchronous=NORMAL -> 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == db.SQLITE_BUSY_TIMEOUT_MS
+    assert engine.pool.size() == 1
+
+
+def test_tuned_reads_go_through_read_only_pool(tuned_db):
+    _, read_engine = tuned_db
+    db.insert_events([{"topic": "tuned", "event_id": "1"}, {"topic": "tuned", "event_id": "2"}])
+
+    assert [e["event_id"] for e in db.get_events("tuned")] == ["1", "2"]
+    assert dict(db.get_stats())["tuned"] == 2
+
+    with read_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM processed_events"))
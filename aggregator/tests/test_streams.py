@@ -0,0 +1,90 @@
+import time
+
+import fakeredis
+import pytest
+
+import src.main as main
+from src.broker.envelope import pack_events
+from src.broker.transport import StreamTransport
+from tests.helpers import events
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def make_consumer(client, name, **kwargs):
+    transport = StreamTransport(client, stream="events", consumer=name, block_ms=10, **kwargs)
+    transport.ensure_group()
+    return transport
+
+
+def test_consumers_in_group_share_entries(fake_redis):
+    c1 = make_consumer(fake_redis, "c1", count=2)
+    c2 = make_consumer(fake_redis, "c2", count=2)
+    c1.send([pack_events([e])[0] for e in events("s0", "s1", "s2", "s3")])
+
+    first = c1.read()
+    second = c2.read()
+
+    assert len(first) == 2 and len(second) == 2
+    assert {i for i, _ in first}.isdisjoint({i for i, _ in second})
+
+
+def test_entries_acked_only_after_commit(fake_redis, monkeypatch):
+    consumer = make_consumer(fake_redis, "c1", claim_idle_ms=0)
+    consumer.send(pack_events(events("s0", "s1", "s2")))
+
+    def failing_insert(events):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(main, "insert_events", failing_insert)
+    with pytest.raises(RuntimeError):
+        main.process_stream_entries(consumer, consumer.read())
+    assert fake_redis.xpending("events", "aggregator")["pending"] == 1
+
+    inserted = []
+
+    def recording_insert(events):
+        inserted.extend(events)
+        return len(events)
+
+    monkeypatch.setattr(main, "insert_events", recording_insert)
+    main.process_stream_entries(consumer, consumer.reclaim(force=True))
+    assert fake_redis.xpending("events", "aggregator")["pending"] == 0
+    assert [e["event_id"] for e in inserted] == ["s0", "s1", "s2"]
+
+
+def test_pending_entries_of_dead_consumer_are_reclaimed(fake_redis):
+    dead = make_consumer(fake_redis, "dead")
+    alive = make_consumer(fake_redis, "alive", claim_idle_ms=20)
+    dead.send(pack_events(events("s0")))
+
+    assert len(dead.read()) == 1  # dibaca tapi tidak pernah di-ack
+    time.sleep(0.05)
+
+    claimed = alive.reclaim(force=True)
+    assert len(claimed) == 1
+    alive.ack([entry_id for entry_id, _ in claimed])
+    assert fake_redis.xpending("events", "aggregator")["pending"] == 0
+
+
+
+def test_invalid_entries_are_acked_not_retried(fake_redis, monkeypatch):
+    consumer = make_consumer(fake_redis, "c1", claim_idle_ms=0)
+    consumer.send([pack_events([{"event_id": "bad"}])[0]] + pack_events(events("s0")))
+
+    inserted = []
+
+    def recording_insert(events):
+        inserted.extend(events)
+        return len(events)
+
+    monkeypatch.setattr(main, "insert_events", recording_insert)
+    monkeypatch.setattr(main, "dedup_filter", main.DedupFilter())
+    main.process_stream_entries(consumer, consumer.read())
+
+    assert [e["event_id"] for e in inserted] == ["s0"]
+    assert fake_redis.xpending("events", "aggregator")["pending"] == 0
+    assert consumer.reclaim(force=True) == []
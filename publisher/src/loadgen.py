@@ -0,0 +1,353 @@
+"""
+Load generator untuk EventPublisher / endpoint /publish.
+
+Beberapa proses worker mengirim event dengan rate target (atau open
+loop sampai jenuh kalau --rate 0). Topic dan key duplikat dipilih dengan
+distribusi Zipf. Setiap detik dicetak rate yang tercapai dan
+percentile latency.
+
+    python src/loadgen.py --rate 5000 --duration 30 --processes 4
+    python src/loadgen.py --rate 0 --mode http --url http://localhost:8080 --batch-size 100
+"""
+import argparse
+import bisect
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    from .main import EventPublisher
+except ImportError:  # dijalankan langsung: python src/loadgen.py
+    from main import EventPublisher
+
+# Key terakhir yang bisa dipilih ulang sebagai duplikat (per worker)
+RECENT_KEYS = 10000
+REPORT_INTERVAL = 1.0
+# Histogram latency: bucket log, 8 bucket per kelipatan 2 (error relatif <~9%)
+LATENCY_MIN_MS = 0.01
+LATENCY_BUCKETS_PER_DOUBLING = 8
+
+
+# =====================================================
+# DISTRIBUSI
+# =====================================================
+class ZipfSampler:
+    """Index 0..n-1 dengan peluang ~ 1/(rank+1)^s (s=0 -> uniform)."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        total = 0.0
+        self.cumulative = []
+        for rank in range(1, max(1, n) + 1):
+            total += 1 / rank ** s
+            self.cumulative.append(total)
+
+    def __call__(self, limit=None):
+        cumulative = self.cumulative
+        if limit is not None:
+            cumulative = cumulative[:max(1, limit)]
+        x = self.rng.random() * cumulative[-1]
+        return min(bisect.bisect_left(cumulative, x), len(cumulative) - 1)
+
+
+class EventFactory:
+    """Membuat event: topic Zipf, duplicate_ratio diambil dari key terakhir."""
+
+    def __init__(self, config, worker_id=0, seed=None):
+        self.rng = random.Random(seed)
+        self.config = config
+        self.worker_id = worker_id
+        self.topics = [f"load_topic_{i}" for i in range(config.topics)]
+        self.topic_sampler = ZipfSampler(config.topics, config.topic_skew, self.rng)
+        # Key duplikat: rank 0 = key paling baru (skew tinggi = key panas)
+        self.key_sampler = ZipfSampler(RECENT_KEYS, config.key_skew, self.rng)
+        self.recent = []
+        self.filler = "x" * max(0, config.payload_bytes)
+        self.duplicates = 0
+
+    def __call__(self):
+        if self.recent and self.rng.random() < self.config.duplicate_ratio:
+            self.duplicates += 1
+            rank = self.key_sampler(len(self.recent))
+            topic, event_id = self.recent[-1 - rank]
+        else:
+            topic = self.topics[self.topic_sampler()]
+            event_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+            self.recent.append((topic, event_id))
+            if len(self.recent) > RECENT_KEYS * 2:
+                del self.recent[:RECENT_KEYS]
+        return {
+            "topic": topic,
+            "event_id": event_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "source": f"loadgen-{self.worker_id}",
+            "payload": {"data": self.filler},
+        }
+
+    def batch(self, n):
+        return [self() for _ in range(n)]
+
+
+class LatencyHistogram:
+    """
+    Histogram latency bucket tetap (log). Ukurannya tidak tumbuh dengan
+    jumlah event, jadi yang dikirim lewat queue hanya `counts`
+    ({index bucket: jumlah}).
+    """
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    @staticmethod
+    def bucket(latency_ms):
+        if latency_ms <= LATENCY_MIN_MS:
+            return 0
+        return 1 + int(math.log2(latency_ms / LATENCY_MIN_MS) * LATENCY_BUCKETS_PER_DOUBLING)
+
+    @staticmethod
+    def upper_bound(index):
+        return LATENCY_MIN_MS * 2 ** (index / LATENCY_BUCKETS_PER_DOUBLING)
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def record(self, latency_ms, n=1):
+        index = self.bucket(latency_ms)
+        self.counts[index] = self.counts.get(index, 0) + n
+
+    def merge(self, counts):
+        for index, n in counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+
+    def percentile(self, p):
+        """Batas atas bucket tempat kumulatif mencapai p%."""
+        total = self.count
+        if not total:
+            return 0.0
+        rank = min(total - 1, int(total * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return self.upper_bound(index)
+        return self.upper_bound(max(self.counts))
+
+
+# =====================================================
+# WORKER
+# =====================================================
+class Window:
+    """Hitungan per interval laporan (diakses thread flusher producer juga)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.errors = 0
+        self.latencies = LatencyHistogram()
+
+    def record(self, n, latency_ms, ok=True):
+        with self.lock:
+            if ok:
+                self.sent += n
+                self.latencies.record(latency_ms, n)
+            else:
+                self.errors += n
+
+    def drain(self):
+        """(sent, errors, counts histogram) lalu reset."""
+        with self.lock:
+            out = (self.sent, self.errors, self.latencies.counts)
+            self.sent, self.errors, self.latencies = 0, 0, LatencyHistogram()
+        return out
+
+
+class BrokerSender:
+    """Langsung ke Redis lewat BatchingProducer (latency = send -> pipeline selesai)."""
+
+    def __init__(self, config, window, publisher=None):
+        self.publisher = publisher or EventPublisher(config.broker_url)
+        if not self.publisher.redis_client:
+            raise RuntimeError("Redis not connected")
+        self.window = window
+        self.producer = self.publisher.producer(
+            batch_size=config.batch_size, linger_ms=config.linger_ms
+        )
+
+    def send(self, events):
+        started = time.perf_counter()
+        for event in events:
+            self.producer.send_event(event).add_done_callback(
+                lambda f: self.window.record(
+                    1, (time.perf_counter() - started) * 1000, f.exception() is None
+                )
+            )
+
+    def close(self):
+        self.producer.close()
+
+
+class HttpSender:
+    """POST /publish (list body); latency = satu request."""
+
+    def __init__(self, config, window):
+        import requests
+
+        self.session = requests.Session()
+        self.url = config.url.rstrip("/") + "/publish"
+        self.window = window
+
+    def send(self, events):
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=events, timeout=30)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        self.window.record(len(events), (time.perf_counter() - started) * 1000, ok)
+
+    def close(self):
+        self.session.close()
+
+
+def run_worker(config, worker_id, results, publisher=None):
+    """
+    Satu proses load. Kirim ("tick", sent, errors, counts) ke `results`
+    setiap REPORT_INTERVAL dan ("done", ...) di akhir.
+    """
+    window = Window()
+    factory = EventFactory(config, worker_id, seed=None if config.seed is None else config.seed + worker_id)
+    if config.mode == "http":
+        sender = HttpSender(config, window)
+    else:
+        sender = BrokerSender(config, window, publisher)
+
+    # Rate per proses; interval antar kiriman (satu kiriman = batch_size event di mode http)
+    chunk = config.batch_size if config.mode == "http" else 1
+    rate = config.rate / config.processes if config.rate else 0
+    interval = chunk / rate if rate else 0
+    limit = config.count // config.processes + (worker_id < config.count % config.processes) if config.count else None
+
+    started = time.perf_counter()
+    deadline = started + config.duration if config.duration else None
+    next_send = next_report = started
+    generated = 0
+    while limit is None or generated < limit:
+        now = time.perf_counter()
+        if deadline is not None and now >= deadline:
+            break
+        if now >= next_report + REPORT_INTERVAL:
+            next_report += REPORT_INTERVAL
+            results.put(("tick", worker_id, *window.drain()))
+        if interval:
+            # Rate tetap: kalau tertinggal, jangan "mengejar" lebih dari 1 detik
+            next_send = max(next_send + interval, now - 1)
+            if next_send > now:
+                time.sleep(next_send - now)
+        n = chunk if limit is None else min(chunk, limit - generated)
+        sender.send(factory.batch(n))
+        generated += n
+
+    sender.close()
+    results.put(("done", worker_id, *window.drain(), generated, factory.duplicates))
+
+
+# =====================================================
+# CLI
+# =====================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Event load generator")
+    parser.add_argument("--rate", type=float, default=1000, help="event/s total (0 = open loop, secepatnya)")
+    parser.add_argument("--duration", type=float, default=10, help="detik (0 = sampai --count)")
+    parser.add_argument("--count", type=int, default=0, help="total event (0 = sampai --duration)")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--mode", choices=["broker", "http"], default="broker")
+    parser.add_argument("--broker-url", default=None, help="default: BROKER_URL")
+    parser.add_argument("--url", default=os.getenv("AGGREGATOR_URL", "http://localhost:8080"))
+    parser.add_argument("--batch-size", type=int, default=100, help="event per pipeline / request")
+    parser.add_argument("--linger-ms", type=float, default=5)
+    parser.add_argument("--topics", type=int, default=10)
+    parser.add_argument("--topic-skew", type=float, default=1.0, help="eksponen Zipf topic (0 = uniform)")
+    parser.add_argument("--key-skew", type=float, default=1.0, help="eksponen Zipf pemilihan key duplikat")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--payload-bytes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    config = parser.parse_args(argv)
+    if not config.duration and not config.count:
+        parser.error("set --duration or --count")
+    config.processes = max(1, config.processes)
+    config.batch_size = max(1, config.batch_size)
+    return config
+
+
+def format_line(elapsed, sent, errors, latencies, seconds):
+    return (
+        f"{elapsed:>7.1f}s {sent / seconds if seconds else 0:>10.0f} ev/s "
+        f"p50 {latencies.percentile(50):>8.2f} ms  p95 {latencies.percentile(95):>8.2f} ms  "
+        f"p99 {latencies.percentile(99):>8.2f} ms  errors {errors}"
+    )
+
+
+def main_cli(argv=None):
+    config = parse_args(argv)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(config, i, results), daemon=True)
+        for i in range(config.processes)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+
+    print(f"🚀 {config.mode} load: rate={config.rate or 'open-loop'} ev/s, processes={config.processes}")
+    totals = {"sent": 0, "errors": 0, "generated": 0, "duplicates": 0}
+    all_latencies = LatencyHistogram()
+    window = {"sent": 0, "errors": 0, "latencies": LatencyHistogram()}
+    done = 0
+    last_report = started
+    while True:
+        try:
+            kind, _, sent, errors, counts, *rest = results.get(timeout=0.1)
+            window["sent"] += sent
+            window["errors"] += errors
+            window["latencies"].merge(counts)
+            if kind == "done":
+                done += 1
+                totals["generated"] += rest[0]
+                totals["duplicates"] += rest[1]
+        except queue.Empty:
+            if not any(w.is_alive() for w in workers) and results.empty():
+                break
+
+        now = time.perf_counter()
+        if now - last_report >= REPORT_INTERVAL or done == len(workers):
+            print(format_line(now - started, window["sent"], window["errors"], window["latencies"], now - last_report))
+            totals["sent"] += window["sent"]
+            totals["errors"] += window["errors"]
+            all_latencies.merge(window["latencies"].counts)
+            window = {"sent": 0, "errors": 0, "latencies": LatencyHistogram()}
+            last_report = now
+        if done == len(workers):
+            break
+
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    print("-" * 80)
+    print(f"generated {totals['generated']} events ({totals['duplicates']} duplicates), acked {totals['sent']}")
+    print("total  " + format_line(elapsed, totals["sent"], totals["errors"], all_latencies, elapsed))
+    if done < len(workers):
+        print(f"❌ {len(workers) - done} worker(s) exited early")
+        return 1
+    return 0 if totals["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,28 +1,168 @@
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import os
 import random
+import threading
 import time
 import uuid
+import zlib
+from collections import deque
+from concurrent.futures import Future
+
+# Codec cepat opsional (harus cocok dengan src/broker/codec.py di aggregator)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Jumlah event maksimum per envelope (harus cocok dengan aggregator)
+ENVELOPE_MAX_EVENTS = int(os.getenv("PUBLISH_ENVELOPE_SIZE", "500"))
+# "pubsub" atau "streams" (harus sama dengan BROKER_TRANSPORT di aggregator)
+BROKER_TRANSPORT = os.getenv("BROKER_TRANSPORT", "pubsub")
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "1000000"))
+# Jumlah shard channel (harus sama dengan SHARD_COUNT di aggregator)
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+
+
+# json | orjson | msgpack | auto (negosiasi dengan aggregator)
+MESSAGE_CODEC = os.getenv("MESSAGE_CODEC", "json")
+# none | zlib | zstd
+MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "none")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Edge dedup (SET NX EX) sebelum kirim; key & TTL harus sama dengan aggregator
+EDGE_DEDUP_TTL_SECONDS = int(os.getenv("EDGE_DEDUP_TTL_SECONDS", "0"))
+EDGE_DEDUP_PREFIX = os.getenv("EDGE_DEDUP_PREFIX", "events:seen")
+
+# Ukuran connection pool Redis (per EventPublisher / producer async)
+PUBLISH_POOL_SIZE = int(os.getenv("PUBLISH_POOL_SIZE", "10"))
+# Producer auto-batching: kirim saat batch penuh ATAU event tertua
+# sudah menunggu PRODUCER_LINGER_MS (mirip batch.size / linger.ms Kafka)
+PRODUCER_BATCH_SIZE = int(os.getenv("PRODUCER_BATCH_SIZE", "500"))
+PRODUCER_LINGER_MS = float(os.getenv("PRODUCER_LINGER_MS", "5"))
+# Batas event yang belum terkirim; send() menunggu kalau penuh
+PRODUCER_MAX_PENDING = int(os.getenv("PRODUCER_MAX_PENDING", "100000"))
+
+
+def encode_message(obj, codec="json", compression="none"):
+    """
+    Header 3 byte [versi=1, format, kompresi] + body.
+    format: 1=JSON, 2=msgpack. kompresi: 0=none, 1=zlib, 2=zstd.
+    JSON tanpa kompresi dikirim polos (tanpa header) untuk consumer lama.
+    """
+    if codec == "msgpack" and msgpack is not None:
+        fmt, body = 2, msgpack.packb(obj)
+    elif orjson is not None:
+        fmt, body = 1, orjson.dumps(obj)
+    else:
+        fmt, body = 1, json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    comp = 0
+    if len(body) >= COMPRESS_MIN_BYTES:
+        if compression == "zstd" and zstandard is not None:
+            comp, body = 2, zstandard.ZstdCompressor().compress(body)
+        elif compression in ("zlib", "zstd"):
+            comp, body = 1, zlib.compress(body)
+    if fmt == 1 and comp == 0:
+        return body
+    return bytes((1, fmt, comp)) + body
+
+
+def supported_codecs():
+    """Codec yang bisa di-ENCODE publisher ini (json & zlib selalu ada)."""
+    codecs = ["json", "zlib"]
+    if msgpack is not None:
+        codecs.append("msgpack")
+    if zstandard is not None:
+        codecs.append("zstd")
+    return codecs
+
+
+def advertised_codecs(client, channel="events"):
+    """Irisan iklan semua replica aggregator ("<channel>:codecs:<replica>"); None kalau kosong."""
+    keys = list(client.scan_iter(match=f"{channel}:codecs:*"))
+    common = None
+    for value in client.mget(keys) if keys else []:
+        if value is None:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode()
+        common = set(value.split(",")) if common is None else common & set(value.split(","))
+    return None if common is None else ",".join(sorted(common | {"json"}))
+
+
+def negotiate_codec(advertised, compression=None):
+    """
+    Aturan sama dengan codec.negotiate di aggregator (image publisher tidak
+    membawa package aggregator): codec terbaik milik kedua sisi, kompresi
+    hanya yang dikonfigurasi, zstd turun ke zlib kalau perlu.
+    """
+    compression = compression or MESSAGE_COMPRESSION
+    if isinstance(advertised, bytes):
+        advertised = advertised.decode()
+    both = set((advertised or "json").split(",")) & set(supported_codecs())
+    codec = "msgpack" if "msgpack" in both else "json"
+    if compression == "zstd" and "zstd" in both:
+        return codec, "zstd"
+    if compression in ("zstd", "zlib") and "zlib" in both:
+        return codec, "zlib"
+    return codec, "none"
+
+
+def claim_key(event, prefix=EDGE_DEDUP_PREFIX):
+    """Key klaim (topic, event_id) -- format sama dengan aggregator."""
+    return f"{prefix}:" + json.dumps([event["topic"], event["event_id"]], separators=(",", ":"))
+
+
+def shard_for(topic, shard_count=SHARD_COUNT):
+    """CRC32 dari topic (UTF-8) -- hash yang sama dengan aggregator."""
+    return zlib.crc32(topic.encode("utf-8")) % shard_count
 
 # =====================================================
 # CLASS EVENT PUBLISHER
 # =====================================================
 class EventPublisher:
-    def __init__(self, broker_url=None):
+    def __init__(self, broker_url=None, pool_size=PUBLISH_POOL_SIZE, edge_dedup_ttl=EDGE_DEDUP_TTL_SECONDS):
         # Konfigurasi koneksi Redis
         self.broker_url = broker_url or os.getenv("BROKER_URL", "redis://localhost:6379")
         self.channel_name = "events"
+        self.transport = BROKER_TRANSPORT
+        self.shard_count = SHARD_COUNT
+        self.codec, self.compression = MESSAGE_CODEC, MESSAGE_COMPRESSION
+        self.pool_size = pool_size
+        self.edge_dedup_ttl = edge_dedup_ttl
         
         try:
-            self.redis_client = redis.Redis.from_url(
-                self.broker_url,
-                decode_responses=True
+            # BlockingConnectionPool: thread ke-(pool_size+1) menunggu koneksi
+            # bebas, bukan membuka koneksi baru tanpa batas
+            self.redis_client = redis.Redis(
+                connection_pool=redis.BlockingConnectionPool.from_url(
+                    self.broker_url,
+                    max_connections=pool_size,
+                    decode_responses=True,
+                )
             )
             self.redis_client.ping()
         except Exception as e:
             self.redis_client = None
 
+        if self.redis_client and MESSAGE_CODEC == "auto":
+            # Tiap replica aggregator mengiklankan codec yang bisa dia baca
+            advertised = advertised_codecs(self.redis_client, self.channel_name)
+            self.codec, self.compression = negotiate_codec(advertised)
+
     def generate_event(self, topic, event_id, source="publisher"):
         """Membuat struktur data event"""
         return {
@@ -46,16 +186,125 @@ class EventPublisher:
         event = self.generate_event(topic, event_id, source)
         
         try:
-            # Kirim ke Redis Channel
-            self.redis_client.publish(
-                self.channel_name,
-                json.dumps(event)
-            )
+            if not self._claim([event]):
+                return None  # sudah dikirim dalam jendela edge dedup
+        except Exception as e:
+            print(f"❌ Publish failed: {e}")
+            return None
+
+        try:
+            # Kirim ke Redis (channel pub/sub atau stream milik shard topic)
+            self._send({self.channel_for(topic): [self._encode(event)]})
             return event
         except Exception as e:
             print(f"❌ Publish failed: {e}")
+            self._release([event])
             return None
 
+    def publish_batch(self, items, source="publisher"):
+        """
+        Kirim banyak event sekaligus.
+        `items` berisi pasangan (topic, event_id); pasangan yang berulang
+        hanya dikirim sekali. Event dibungkus envelope {"type": "batch"}
+        dan semua envelope dikirim dalam satu pipeline Redis.
+        """
+        if not self.redis_client:
+            return []
+
+        seen = set()
+        events = []
+        for topic, event_id in items:
+            key = (topic, str(event_id))
+            if key in seen:
+                continue
+            seen.add(key)
+            events.append(self.generate_event(topic, event_id, source))
+
+        if not events:
+            return []
+
+        try:
+            events = self._claim(events)
+        except Exception as e:
+            print(f"❌ Batch publish failed: {e}")
+            return []
+        if not events:
+            return []
+
+        try:
+            self._send(self.pack(events))
+            return events
+        except Exception as e:
+            print(f"❌ Batch publish failed: {e}")
+            self._release(events)
+            return []
+
+    def _claim(self, events):
+        """Edge dedup: hanya event yang belum terlihat dalam jendela TTL (satu pipeline)."""
+        if self.edge_dedup_ttl <= 0:
+            return events
+        pipe = self.redis_client.pipeline(transaction=False)
+        for event in events:
+            pipe.set(claim_key(event), 1, nx=True, ex=self.edge_dedup_ttl)
+        return [e for e, ok in zip(events, pipe.execute()) if ok]
+
+    def _release(self, events):
+        if self.edge_dedup_ttl <= 0 or not events:
+            return
+        try:
+            self.redis_client.delete(*(claim_key(e) for e in events))
+        except Exception:
+            pass
+
+    def producer(self, **options):
+        """BatchingProducer di atas client publisher ini (lihat class di bawah)."""
+        return BatchingProducer(self, **options)
+
+    def pack(self, events):
+        """Event -> {channel: [pesan]}; satu envelope per ENVELOPE_MAX_EVENTS event."""
+        by_channel = {}
+        for event in events:
+            by_channel.setdefault(self.channel_for(event["topic"]), []).append(event)
+
+        batches = {}
+        for channel, group in by_channel.items():
+            if len(group) == 1:
+                batches[channel] = [self._encode(group[0])]
+            else:
+                batches[channel] = [
+                    self._encode({"type": "batch", "events": group[i:i + ENVELOPE_MAX_EVENTS]})
+                    for i in range(0, len(group), ENVELOPE_MAX_EVENTS)
+                ]
+        return batches
+
+    def _encode(self, obj):
+        return encode_message(obj, self.codec, self.compression)
+
+    def channel_for(self, topic):
+        """Channel/stream shard untuk topic ("events" kalau hanya 1 shard)."""
+        if self.shard_count == 1:
+            return self.channel_name
+        return f"{self.channel_name}:{shard_for(topic, self.shard_count)}"
+
+    def _send(self, batches):
+        """Kirim {channel: [pesan]} dalam satu pipeline Redis."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_commands(pipe, batches)
+        pipe.execute()
+
+    def _queue_commands(self, pipe, batches):
+        for channel, messages in batches.items():
+            for message in messages:
+                if self.transport == "streams":
+                    pipe.xadd(
+                        channel,
+                        {"data": message},
+                        maxlen=STREAM_MAXLEN,
+                        approximate=True,
+                    )
+                else:
+                    pipe.publish(channel, message)
+
     def simulate_events(self, count=10, delay=0.1):
         """Method ini tetap dibiarkan ada (jangan dihapus) jaga-jaga kalau diminta dosen."""
         topics = ["user_signup", "order_created", "payment_failed"]
@@ -68,6 +317,331 @@ class EventPublisher:
             time.sleep(delay)
         return published_count
 
+# =====================================================
+# AUTO-BATCHING PRODUCER
+# =====================================================
+class ProducerStats:
+    """Ukuran batch & latency kirim (sampel terakhir), aman dipakai lintas thread."""
+
+    SAMPLES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.events = 0
+        self.errors = 0
+        self._batch_sizes = deque(maxlen=self.SAMPLES)
+        self._send_ms = deque(maxlen=self.SAMPLES)
+        self._event_ms = deque(maxlen=self.SAMPLES)
+
+    def record(self, size, send_seconds, event_seconds, ok=True):
+        with self._lock:
+            self.batches += 1
+            self.events += size
+            self.errors += 0 if ok else 1
+            self._batch_sizes.append(size)
+            self._send_ms.append(send_seconds * 1000)
+            self._event_ms.extend(s * 1000 for s in event_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "events": self.events,
+                "errors": self.errors,
+                "batch_size": _summary(self._batch_sizes),
+                # Durasi satu pipeline ke Redis
+                "send_ms": _summary(self._send_ms),
+                # Dari send() sampai future selesai (termasuk linger)
+                "event_latency_ms": _summary(self._event_ms),
+            }
+
+
+def _summary(samples):
+    values = sorted(samples)
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+
+    def pct(p):
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(pct(50), 3),
+        "p99": round(pct(99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class BatchingProducer:
+    """
+    Producer dengan auto-batching (thread).
+
+    send() hanya memasukkan event ke antrian dan mengembalikan Future.
+    Thread flusher mengirim satu pipeline saat batch mencapai batch_size
+    atau event tertua sudah menunggu linger_ms. flush() menunggu semua
+    event yang sudah di-send terkirim; close() = flush + hentikan thread.
+    Tidak ada retry: kalau pipeline gagal, Future semua event di batch itu
+    selesai dengan exception.
+    """
+
+    def __init__(
+        self,
+        publisher,
+        batch_size=PRODUCER_BATCH_SIZE,
+        linger_ms=PRODUCER_LINGER_MS,
+        max_pending=PRODUCER_MAX_PENDING,
+    ):
+        self.publisher = publisher
+        self.batch_size = max(1, batch_size)
+        self.linger = linger_ms / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.stats = ProducerStats()
+
+        # (event, future, waktu send) -- urutan dipertahankan
+        self._pending = deque()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, name="producer-flusher", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(self, topic, event_id, source="publisher"):
+        return self.send_event(self.publisher.generate_event(topic, event_id, source))
+
+    def send_event(self, event):
+        future = Future()
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError("producer is closed")
+            self._pending.append((event, future, time.perf_counter()))
+            self._cond.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Kirim semua yang sudah di-send sekarang juga dan tunggu selesai."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending) + self._in_flight
+
+    # -------------------------------------------------
+    # INTERNAL
+    # -------------------------------------------------
+    def _take_batch(self):
+        """Tunggu sampai ada batch yang siap dikirim (None = berhenti)."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    age = time.perf_counter() - self._pending[0][2]
+                    if (
+                        len(self._pending) >= self.batch_size
+                        or age >= self.linger
+                        or self._flush_requested
+                        or self._closed
+                    ):
+                        break
+                    self._cond.wait(self.linger - age)
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+
+            n = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(n)]
+            self._in_flight += n
+            if not self._pending:
+                self._flush_requested = False
+            self._cond.notify_all()  # ada ruang lagi untuk send()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            error = None
+            try:
+                self.publisher._send(self.publisher.pack([event for event, _, _ in batch]))
+            except Exception as e:
+                error = e
+            _complete(batch, error, started, self.stats)
+            with self._cond:
+                self._in_flight -= len(batch)
+                self._cond.notify_all()
+
+
+def _complete(batch, error, started, stats):
+    done = time.perf_counter()
+    stats.record(len(batch), done - started, [done - queued for _, _, queued in batch], error is None)
+    for event, future, _ in batch:
+        if future.done():  # dibatalkan pemanggil
+            continue
+        if error is None:
+            future.set_result(event)
+        else:
+            future.set_exception(error)
+
+
+class AsyncBatchingProducer:
+    """
+    Versi asyncio dari BatchingProducer (redis.asyncio, satu task flusher).
+
+    `publisher` dipakai untuk format event, codec, dan routing shard;
+    koneksi Redis-nya sendiri berupa pool async berukuran pool_size.
+    Harus dibuat dan dipakai di dalam event loop yang sama.
+    """
+
+    def __init__(
+        self,
+        publisher,
+        client=None,
+        batch_size=PRODUCER_BATCH_SIZE,
+        linger_ms=PRODUCER_LINGER_MS,
+        max_pending=PRODUCER_MAX_PENDING,
+        pool_size=PUBLISH_POOL_SIZE,
+    ):
+        self.publisher = publisher
+        self.client = client or aioredis.Redis(
+            connection_pool=aioredis.BlockingConnectionPool.from_url(
+                publisher.broker_url,
+                max_connections=pool_size,
+                decode_responses=True,
+            )
+        )
+        self._owns_client = client is None
+        self.batch_size = max(1, batch_size)
+        self.linger = linger_ms / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.stats = ProducerStats()
+
+        self._pending = deque()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = asyncio.Condition()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def send(self, topic, event_id, source="publisher"):
+        return await self.send_event(self.publisher.generate_event(topic, event_id, source))
+
+    async def send_event(self, event):
+        """Masukkan ke antrian; return asyncio.Future (await untuk tunggu terkirim)."""
+        future = asyncio.get_running_loop().create_future()
+        async with self._cond:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                await self._cond.wait()
+            if self._closed:
+                raise RuntimeError("producer is closed")
+            self._pending.append((event, future, time.perf_counter()))
+            self._cond.notify_all()
+        return future
+
+    async def flush(self):
+        async with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            await self._cond.wait_for(lambda: not self._pending and not self._in_flight)
+
+    async def close(self):
+        await self.flush()
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        await self._task
+        if self._owns_client:
+            await self.client.aclose()
+
+    def pending(self):
+        return len(self._pending) + self._in_flight
+
+    async def _take_batch(self):
+        async with self._cond:
+            while True:
+                if self._pending:
+                    age = time.perf_counter() - self._pending[0][2]
+                    if (
+                        len(self._pending) >= self.batch_size
+                        or age >= self.linger
+                        or self._flush_requested
+                        or self._closed
+                    ):
+                        break
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), self.linger - age)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    await self._cond.wait()
+
+            n = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(n)]
+            self._in_flight += n
+            if not self._pending:
+                self._flush_requested = False
+            self._cond.notify_all()
+            return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            error = None
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                self.publisher._queue_commands(
+                    pipe, self.publisher.pack([event for event, _, _ in batch])
+                )
+                await pipe.execute()
+            except Exception as e:
+                error = e
+            _complete(batch, error, started, self.stats)
+            async with self._cond:
+                self._in_flight -= len(batch)
+                self._cond.notify_all()
+
+
 # =====================================================
 # MAIN (BAGIAN INI YANG KITA UBAH MANUAL)
 # =====================================================